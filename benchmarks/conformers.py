@@ -0,0 +1,170 @@
+"""Per-record cost of type conformance on wide nested schemas, SDK against compiled conformers.
+
+    poetry run python benchmarks/conformers.py --records 20000
+"""
+
+import argparse
+import copy
+import logging
+import sys
+import time
+
+from singer_sdk.helpers._typing import TypeConformanceLevel, conform_record_data_types
+
+from tap_airbyte.conformers import compile_conformer
+
+logger = logging.getLogger("benchmark")
+
+
+def nullable(*types):
+    return {"type": [*types, "null"]}
+
+
+def user_schema():
+    """A GitHub user, as nested in most GitHub payloads."""
+    return {
+        "type": ["object", "null"],
+        "properties": {
+            "login": nullable("string"),
+            "id": nullable("integer"),
+            "node_id": nullable("string"),
+            "avatar_url": nullable("string"),
+            "html_url": nullable("string"),
+            "type": nullable("string"),
+            "site_admin": nullable("boolean"),
+        },
+    }
+
+
+def github_issue():
+    """Schema and record shaped like a GitHub issue."""
+    schema = {
+        "type": "object",
+        "properties": {
+            **{name: nullable("string") for name in ("url", "repository_url", "html_url", "node_id", "title", "state", "body", "created_at", "updated_at", "closed_at", "author_association")},
+            "id": nullable("integer"),
+            "number": nullable("integer"),
+            "comments": nullable("integer"),
+            "locked": nullable("boolean"),
+            "draft": nullable("boolean"),
+            "user": user_schema(),
+            "assignees": {"type": ["array", "null"], "items": user_schema()},
+            "labels": {
+                "type": ["array", "null"],
+                "items": {
+                    "type": ["object", "null"],
+                    "properties": {
+                        "id": nullable("integer"),
+                        "name": nullable("string"),
+                        "color": nullable("string"),
+                        "default": nullable("boolean"),
+                    },
+                },
+            },
+            "reactions": {
+                "type": ["object", "null"],
+                "properties": {name: nullable("integer") for name in ("total_count", "+1", "-1", "laugh", "hooray", "confused", "heart", "rocket", "eyes")},
+            },
+        },
+    }
+    user = {"login": "octocat", "id": 1, "node_id": "MDQ6VXNlcjE=", "avatar_url": "https://a", "html_url": "https://h", "type": "User", "site_admin": False}
+    record = {
+        **{name: f"{name} value" for name in ("url", "repository_url", "html_url", "node_id", "title", "state", "body", "author_association")},
+        "created_at": "2024-01-01T00:00:00Z",
+        "updated_at": "2024-01-02T00:00:00Z",
+        "closed_at": None,
+        "id": 1,
+        "number": 1347,
+        "comments": 3,
+        "locked": False,
+        "draft": None,
+        "user": user,
+        "assignees": [user, user],
+        "labels": [{"id": i, "name": f"label {i}", "color": "f29513", "default": i == 0} for i in range(4)],
+        "reactions": {"total_count": 5, "+1": 3, "-1": 0, "laugh": 0, "hooray": 1, "confused": 0, "heart": 1, "rocket": 0, "eyes": 0},
+    }
+    return schema, record
+
+
+def stripe_charge():
+    """Schema and record shaped like a Stripe charge, wide with open metadata."""
+    address = {"type": ["object", "null"], "properties": {name: nullable("string") for name in ("city", "country", "line1", "line2", "postal_code", "state")}}
+    schema = {
+        "type": "object",
+        "properties": {
+            **{name: nullable("string") for name in ("id", "object", "balance_transaction", "currency", "customer", "description", "invoice", "payment_intent", "payment_method", "receipt_email", "receipt_url", "status", "statement_descriptor")},
+            **{name: nullable("integer") for name in ("amount", "amount_captured", "amount_refunded", "application_fee_amount", "created")},
+            **{name: nullable("boolean") for name in ("captured", "disputed", "livemode", "paid", "refunded")},
+            "metadata": {"type": ["object", "null"], "properties": {}, "additionalProperties": True},
+            "billing_details": {
+                "type": ["object", "null"],
+                "properties": {"address": address, "email": nullable("string"), "name": nullable("string"), "phone": nullable("string")},
+            },
+            "outcome": {
+                "type": ["object", "null"],
+                "properties": {name: nullable("string") for name in ("network_status", "reason", "risk_level", "seller_message", "type")} | {"risk_score": nullable("integer")},
+            },
+            "payment_method_details": {
+                "type": ["object", "null"],
+                "properties": {
+                    "type": nullable("string"),
+                    "card": {
+                        "type": ["object", "null"],
+                        "properties": {
+                            **{name: nullable("string") for name in ("brand", "country", "fingerprint", "funding", "last4", "network")},
+                            "exp_month": nullable("integer"),
+                            "exp_year": nullable("integer"),
+                            "checks": {"type": ["object", "null"], "properties": {name: nullable("string") for name in ("address_line1_check", "address_postal_code_check", "cvc_check")}},
+                        },
+                    },
+                },
+            },
+            "refunds": {
+                "type": ["object", "null"],
+                "properties": {
+                    "object": nullable("string"),
+                    "has_more": nullable("boolean"),
+                    "data": {"type": ["array", "null"], "items": {"type": ["object", "null"], "properties": {"id": nullable("string"), "amount": nullable("integer"), "status": nullable("string")}}},
+                },
+            },
+        },
+    }
+    record = {
+        **{name: f"{name}_1234" for name in ("id", "object", "balance_transaction", "currency", "customer", "description", "invoice", "payment_intent", "payment_method", "receipt_email", "receipt_url", "status", "statement_descriptor")},
+        **{name: 1000 for name in ("amount", "amount_captured", "amount_refunded", "application_fee_amount", "created")},
+        **{name: False for name in ("captured", "disputed", "livemode", "paid", "refunded")},
+        "metadata": {"order_id": "6735", "channel": "web"},
+        "billing_details": {"address": {"city": "SF", "country": "US", "line1": "1 Main St", "line2": None, "postal_code": "94111", "state": "CA"}, "email": "a@b.c", "name": "A B", "phone": None},
+        "outcome": {"network_status": "approved_by_network", "reason": None, "risk_level": "normal", "seller_message": "ok", "type": "authorized", "risk_score": 32},
+        "payment_method_details": {"type": "card", "card": {"brand": "visa", "country": "US", "fingerprint": "f", "funding": "credit", "last4": "4242", "network": "visa", "exp_month": 8, "exp_year": 2030, "checks": {"address_line1_check": None, "address_postal_code_check": "pass", "cvc_check": "pass"}}},
+        "refunds": {"object": "list", "has_more": False, "data": [{"id": "re_1", "amount": 100, "status": "succeeded"}]},
+    }
+    return schema, record
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the type conformance of Airbyte records.")
+    parser.add_argument("--records", type=int, default=20_000)
+    args = parser.parse_args()
+
+    for name, payload in (("github issue", github_issue), ("stripe charge", stripe_charge)):
+        schema, record = payload()
+        records = [copy.deepcopy(record) for _ in range(args.records)]
+        conform = compile_conformer(schema)
+        if conform is None:
+            sys.exit(f"{name} schema did not compile")
+        started = time.perf_counter()
+        expected = [
+            conform_record_data_types(name, r, schema, TypeConformanceLevel.RECURSIVE, logger) for r in records
+        ]
+        generic = (time.perf_counter() - started) / args.records
+        started = time.perf_counter()
+        conformed = [conform(r)[0] for r in records]
+        compiled = (time.perf_counter() - started) / args.records
+        if conformed != expected:
+            sys.exit(f"{name} records differ between the conformers")
+        print(f"{name:<14} sdk {generic * 1e6:>7.1f} µs/record  compiled {compiled * 1e6:>7.1f} µs/record  {generic / compiled:0.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Throughput of the decode pipeline against the number of worker processes.
+
+    poetry run python benchmarks/decode_pipeline.py --records 500000 --workers 0 1 2 4
+"""
+
+import argparse
+import io
+import os
+import time
+
+import orjson
+
+from tap_airbyte.pipeline import SINGER_LINES, DecodePipeline, StreamSpec
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "id": {"type": "integer"},
+        "email": {"type": ["null", "string"]},
+        "created_at": {"type": ["null", "string"], "format": "date-time"},
+        "score": {"type": ["null", "number"]},
+        "active": {"type": ["null", "boolean"]},
+        "tags": {"type": ["null", "array"], "items": {"type": "string"}},
+        "address": {
+            "type": ["null", "object"],
+            "properties": {
+                "street": {"type": ["null", "string"]},
+                "city": {"type": ["null", "string"]},
+                "zip": {"type": ["null", "string"]},
+            },
+        },
+    },
+}
+
+
+def synthetic_feed(records: int) -> bytes:
+    """Build Airbyte RECORD lines for a moderately wide, nested stream."""
+    return b"".join(
+        orjson.dumps(
+            {
+                "type": "RECORD",
+                "record": {
+                    "stream": "users",
+                    "data": {
+                        "id": i,
+                        "email": f"user{i}@example.com",
+                        "created_at": "2024-01-01T00:00:00+00:00",
+                        "score": i / 7,
+                        "active": i % 2 == 0,
+                        "tags": ["a", "b", "c"],
+                        "address": {"street": f"{i} Main St", "city": "Springfield", "zip": "12345"},
+                    },
+                    "emitted_at": 1700000000000,
+                },
+            },
+            option=orjson.OPT_APPEND_NEWLINE,
+        )
+        for i in range(records)
+    )
+
+
+def run(feed: bytes, workers: int, chunk_size: int) -> float:
+    """Decode and encode the whole feed, returning records per second."""
+    count = 0
+    started = time.perf_counter()
+    with DecodePipeline({"users": StreamSpec(SCHEMA)}, workers=workers, chunk_size=chunk_size) as pipeline:
+        for item in pipeline.decode(io.BytesIO(feed)):
+            if item[0] == SINGER_LINES:
+                count += item[3]
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Airbyte decode pipeline.")
+    parser.add_argument("--records", type=int, default=200_000)
+    parser.add_argument("--chunk-size", type=int, default=1024 * 1024)
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=sorted({0, 1, 2, 4, os.cpu_count() or 1})
+    )
+    args = parser.parse_args()
+
+    feed = synthetic_feed(args.records)
+    print(f"{args.records} records, {len(feed) / 1024 / 1024:0.1f} MiB")
+    baseline = None
+    for workers in args.workers:
+        rate = run(feed, workers, args.chunk_size)
+        baseline = baseline or rate
+        print(f"workers={workers:<3} {rate:>12,.0f} records/s  {rate / baseline:0.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Lines per second read from a pipe, readline loop against the chunked line reader.
+
+    poetry run python benchmarks/line_reader.py --records 1000000
+"""
+
+import argparse
+import io
+import subprocess
+import sys
+import time
+from tempfile import NamedTemporaryFile
+
+import orjson
+
+from tap_airbyte.pipeline import enlarge_pipe, iter_line_chunks
+
+
+def synthetic_feed(records: int, pad: int) -> bytes:
+    """Build Airbyte RECORD lines, padded to make them wider."""
+    return b"".join(
+        orjson.dumps(
+            {
+                "type": "RECORD",
+                "record": {
+                    "stream": "users",
+                    "data": {"id": i, "email": f"user{i}@example.com", "pad": "x" * pad},
+                    "emitted_at": 1700000000000,
+                },
+            },
+            option=orjson.OPT_APPEND_NEWLINE,
+        )
+        for i in range(records)
+    )
+
+
+def chunked_lines(path: str, chunk_size: int) -> int:
+    """Read the feed through a pipe the way the tap reads it, splitting lines on the reader."""
+    lines = 0
+    with subprocess.Popen(["cat", path], stdout=subprocess.PIPE) as proc:
+        enlarge_pipe(proc.stdout, chunk_size)
+        for chunk in iter_line_chunks(proc.stdout, chunk_size):
+            for _ in io.BytesIO(chunk):
+                lines += 1
+    return lines
+
+
+def chunked_batches(path: str, chunk_size: int) -> int:
+    """Read the feed through a pipe in batches of lines, as handed to the decode workers."""
+    lines = 0
+    with subprocess.Popen(["cat", path], stdout=subprocess.PIPE) as proc:
+        enlarge_pipe(proc.stdout, chunk_size)
+        for chunk in iter_line_chunks(proc.stdout, chunk_size):
+            lines += chunk.count(b"\n")
+    return lines
+
+
+def readline_loop(path: str, chunk_size: int) -> int:
+    """Read the feed through a pipe one readline and poll per message, as the tap used to."""
+    lines = 0
+    with subprocess.Popen(["cat", path], stdout=subprocess.PIPE) as proc:
+        while True:
+            line = proc.stdout.readline()
+            if not line and proc.poll() is not None:
+                break
+            if line:
+                lines += 1
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark reading Airbyte output line by line.")
+    parser.add_argument("--records", type=int, default=1_000_000)
+    parser.add_argument("--pad", type=int, default=100, help="Extra bytes per record")
+    parser.add_argument("--chunk-size", type=int, default=1024 * 1024)
+    args = parser.parse_args()
+
+    with NamedTemporaryFile(suffix=".jsonl") as feed:
+        feed.write(synthetic_feed(args.records, args.pad))
+        feed.flush()
+        print(f"{args.records} records, {feed.tell() / 1024 / 1024:0.1f} MiB")
+        baseline = None
+        readers = (("readline", readline_loop), ("chunked", chunked_lines), ("batches", chunked_batches))
+        for name, reader in readers:
+            started = time.perf_counter()
+            lines = reader(feed.name, args.chunk_size)
+            rate = lines / (time.perf_counter() - started)
+            if lines != args.records:
+                sys.exit(f"{name} read {lines} lines instead of {args.records}")
+            baseline = baseline or rate
+            print(f"{name:<10} {rate:>14,.0f} lines/s  {rate / baseline:0.2f}x")
+
+
+if __name__ == "__main__":
+    main()
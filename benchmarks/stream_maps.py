@@ -0,0 +1,70 @@
+"""Records per second through flattening, SDK record by record against batch stream maps.
+
+    poetry run python benchmarks/stream_maps.py --records 50000
+"""
+
+import argparse
+import copy
+import sys
+import time
+
+from singer_sdk.helpers._flattening import FlatteningOptions
+from singer_sdk.mapper import SameRecordTransform
+
+from tap_airbyte.mapping import BatchStreamMap
+
+
+def nested_payload():
+    """Schema and record shaped like a nested API payload."""
+    address = {"type": ["object", "null"], "properties": {name: {"type": ["string", "null"]} for name in ("city", "country", "line1", "postal_code")}}
+    schema = {
+        "type": "object",
+        "properties": {
+            **{f"field_{i}": {"type": ["string", "null"]} for i in range(20)},
+            "id": {"type": "integer"},
+            "customer": {
+                "type": ["object", "null"],
+                "properties": {"id": {"type": "string"}, "email": {"type": "string"}, "address": address, "shipping": address},
+            },
+            "metadata": {"type": ["object", "null"], "properties": {}, "additionalProperties": True},
+            "items": {"type": ["array", "null"], "items": {"type": "object"}},
+        },
+    }
+    place = {"city": "SF", "country": "US", "line1": "1 Main St", "postal_code": "94111"}
+    record = {
+        **{f"field_{i}": f"value {i}" for i in range(20)},
+        "id": 1,
+        "customer": {"id": "cus_1", "email": "a@b.c", "address": place, "shipping": dict(place)},
+        "metadata": {"order_id": "6735", "channel": "web"},
+        "items": [{"sku": "a", "quantity": 1}],
+    }
+    return schema, record
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark flattening.")
+    parser.add_argument("--records", type=int, default=50_000)
+    parser.add_argument("--max-depth", type=int, default=2)
+    args = parser.parse_args()
+
+    schema, record = nested_payload()
+    options = FlatteningOptions(enabled=True, max_level=args.max_depth)
+    stream_maps = {
+        "flattening": SameRecordTransform("orders", schema, ["id"], flattening_options=options),
+    }
+    for name, stream_map in stream_maps.items():
+        records = [copy.deepcopy(record) for _ in range(args.records)]
+        started = time.perf_counter()
+        expected = [stream_map.transform(r) for r in records]
+        sdk = args.records / (time.perf_counter() - started)
+        batch_map = BatchStreamMap(stream_map)
+        started = time.perf_counter()
+        mapped = batch_map.transform_batch(records)
+        batched = args.records / (time.perf_counter() - started)
+        if mapped != expected:
+            sys.exit(f"{name} records differ between the SDK and the batch stream map")
+        print(f"{name:<18} sdk {sdk:>10,.0f} records/s  batch {batched:>10,.0f} records/s  {batched / sdk:0.1f}x")
+
+
+if __name__ == "__main__":
+    main()
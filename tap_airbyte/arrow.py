@@ -0,0 +1,219 @@
+"""Arrow schemas of Airbyte streams and the columnar batch files written with them"""
+
+from __future__ import annotations
+
+import typing as t
+from pathlib import Path
+
+import orjson
+
+from tap_airbyte.batches import BatchFileWriter, SealedFile
+from tap_airbyte.writer import default
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover, optional
+    pa = None  # type: ignore
+    pq = None  # type: ignore
+
+ARROW_FORMATS = ("parquet", "arrow")
+DEFAULT_ROW_GROUP_SIZE = 10000
+# Codecs the batch compressions map to inside the files, the Arrow IPC format has no gzip
+PARQUET_CODECS = {"gzip": "gzip", "zstd": "zstd", "none": "none"}
+IPC_CODECS = {"zstd": "zstd", "none": None}
+
+Converter = t.Callable[[t.Any], t.Any]
+
+
+def require_pyarrow() -> None:
+    """Raise if pyarrow is not installed."""
+    if pa is None:
+        raise RuntimeError(
+            "Writing parquet or arrow batch files requires the arrow extra: pip install tap-airbyte[arrow]"
+        )
+
+
+def _json_text(value: t.Any) -> t.Any:
+    if value is None or isinstance(value, str):
+        return value
+    return orjson.dumps(value, default=default).decode()
+
+
+def _text(value: t.Any) -> t.Any:
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list)):
+        return _json_text(value)
+    return str(value).lower() if isinstance(value, bool) else str(value)
+
+
+def _struct_converter(converters: t.Dict[str, Converter]) -> Converter:
+    def convert(value: t.Any) -> t.Any:
+        if not isinstance(value, dict):
+            return value
+        converted = dict(value)
+        for name, converter in converters.items():
+            if name in converted:
+                converted[name] = converter(converted[name])
+        return converted
+
+    return convert
+
+
+def _list_converter(converter: Converter) -> Converter:
+    def convert(value: t.Any) -> t.Any:
+        if not isinstance(value, list):
+            return value
+        return [converter(item) for item in value]
+
+    return convert
+
+
+def _arrow_type(schema: t.Dict[str, t.Any], coerce: bool) -> t.Tuple[t.Any, t.Optional[Converter]]:
+    """Get the Arrow type of a JSON schema and the converter its values need, None if none.
+
+    Values without a single JSON type, and objects or arrays without a schema of their
+    members, are kept as JSON text. With `coerce`, values of string columns that are not
+    strings are converted too.
+    """
+    types = schema.get("type", [])
+    if isinstance(types, str):
+        types = [types]
+    kinds = {kind for kind in types if kind != "null"}
+    if kinds == {"integer", "number"}:
+        kinds = {"number"}
+    if len(kinds) != 1 or "anyOf" in schema or "oneOf" in schema:
+        return pa.string(), _json_text
+    kind = kinds.pop()
+    if kind == "integer":
+        return pa.int64(), None
+    if kind == "number":
+        return pa.float64(), None
+    if kind == "boolean":
+        return pa.bool_(), None
+    if kind == "string":
+        return pa.string(), _text if coerce else None
+    if kind == "object" and schema.get("properties"):
+        fields, converters = [], {}
+        for name, prop in schema["properties"].items():
+            arrow_type, converter = _arrow_type(prop, coerce)
+            fields.append(pa.field(name, arrow_type))
+            if converter is not None:
+                converters[name] = converter
+        return pa.struct(fields), _struct_converter(converters) if converters else None
+    if kind == "array" and isinstance(schema.get("items"), dict):
+        arrow_type, converter = _arrow_type(schema["items"], coerce)
+        return pa.list_(arrow_type), _list_converter(converter) if converter is not None else None
+    return pa.string(), _json_text
+
+
+def arrow_schema(
+    json_schema: t.Dict[str, t.Any], coerce: bool = False
+) -> t.Tuple[t.Any, t.Optional[Converter]]:
+    """Get the Arrow schema of a stream's JSON schema, and the converter of its records, None if none."""
+    require_pyarrow()
+    arrow_type, converter = _arrow_type({**json_schema, "type": "object"}, coerce)
+    if not pa.types.is_struct(arrow_type):
+        return pa.schema([]), None
+    return pa.schema([arrow_type.field(i) for i in range(arrow_type.num_fields)]), converter
+
+
+class ArrowBatchFileWriter(BatchFileWriter):
+    """Writes the records of a stream into rotating Parquet or Arrow IPC files.
+
+    Records are buffered until `row_group_size` of them are converted into an Arrow
+    record batch, written as a row group of the open file, so memory is bounded by the
+    row group size rather than the file size. The Arrow schema is derived once from the
+    stream's JSON schema.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        stream_name: str,
+        json_schema: t.Dict[str, t.Any],
+        format: str = "parquet",
+        row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+        **kwargs: t.Any,
+    ) -> None:
+        require_pyarrow()
+        super().__init__(directory, stream_name, **kwargs)
+        codecs = PARQUET_CODECS if format == "parquet" else IPC_CODECS
+        if self.compression not in codecs:
+            raise ValueError(f"{format} batch files cannot be compressed with {self.compression}")
+        self.format = format
+        self.codec = codecs[self.compression]
+        self.row_group_size = max(1, row_group_size)
+        self.schema, self._convert = arrow_schema(json_schema)
+        # Only used if a row group does not fit the schema as it is
+        self._coerce = arrow_schema(json_schema, coerce=True)[1]
+        self._rows: t.List[t.Dict[str, t.Any]] = []
+        self._writer: t.Any = None
+
+    def _suffix(self) -> str:
+        # Compressed inside the file
+        return ""
+
+    def _open_file(self, path: Path) -> t.BinaryIO:
+        sink = pa.OSFile(str(path), "wb")
+        if self.format == "parquet":
+            level = self.level if self.codec != "none" else None
+            self._writer = pq.ParquetWriter(sink, self.schema, compression=self.codec, compression_level=level)
+        else:
+            options = pa.ipc.IpcWriteOptions(compression=self.codec)
+            self._writer = pa.ipc.new_file(sink, self.schema, options=options)
+        return sink
+
+    def write_record(self, record: t.Dict[str, t.Any]) -> t.List[SealedFile]:
+        """Write a record, getting the file it filled up if any."""
+        if self._file is None:
+            self._open()
+        self._rows.append(record)
+        self.records += 1
+        if len(self._rows) >= self.row_group_size:
+            self._write_row_group()
+        if (self.max_records and self.records >= self.max_records) or (
+            self.max_bytes and self.bytes >= self.max_bytes
+        ):
+            return [self.seal()]  # type: ignore[list-item]
+        return []
+
+    def write(self, lines: bytes, count: int) -> t.List[SealedFile]:
+        """Write `count` JSON lines, getting the files that filled up on the way."""
+        sealed = []
+        for line in lines.splitlines()[:count]:
+            sealed.extend(self.write_record(orjson.loads(line)))
+        return sealed
+
+    def _write_row_group(self) -> None:
+        rows, self._rows = self._rows, []
+        if not rows:
+            return
+        try:
+            converted = rows if self._convert is None else [self._convert(row) for row in rows]
+            batch = pa.RecordBatch.from_pylist(converted, schema=self.schema)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            converted = rows if self._coerce is None else [self._coerce(row) for row in rows]
+            batch = pa.RecordBatch.from_pylist(converted, schema=self.schema)
+        self._writer.write_batch(batch)
+        # Arrow buffer bytes, the uncompressed size of the records in the file
+        self.bytes += batch.nbytes
+
+    def seal(self) -> t.Optional[SealedFile]:
+        """Close the open file and give it its final name, None if there is no file open."""
+        if self._file is None:
+            return None
+        self._write_row_group()
+        self._writer.close()
+        self._writer = None
+        return super().seal()
+
+    def abort(self) -> None:
+        """Close and remove the open file, which no BATCH message will ever point to."""
+        self._rows = []
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        super().abort()
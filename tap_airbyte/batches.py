@@ -0,0 +1,167 @@
+"""Rotating batch files the reader writes the records of streams into, for Singer BATCH messages"""
+
+from __future__ import annotations
+
+import gzip
+import os
+import typing as t
+from pathlib import Path
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+from uuid import uuid4
+
+import orjson
+
+from tap_airbyte.writer import default
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover, optional
+    zstandard = None  # type: ignore
+
+DEFAULT_BATCH_FILE_RECORDS = 10000
+BATCH_COMPRESSIONS = ("gzip", "zstd", "none")
+# Levels used when no compression level is configured
+DEFAULT_COMPRESSION_LEVELS = {"gzip": 6, "zstd": 3}
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "zstd": ".zst", "none": ""}
+# Suffix of files that are still being written
+PARTIAL_SUFFIX = ".part"
+
+
+class SealedFile(t.NamedTuple):
+    """A complete batch file, ready to be announced in a BATCH message."""
+
+    url: str
+    records: int
+
+
+def local_batch_root(root: str) -> Path:
+    """Get the local directory of a batch storage root given as a path or a file:// URL."""
+    parsed = urlparse(root)
+    if parsed.scheme == "file":
+        return Path(url2pathname(parsed.path))
+    if parsed.scheme and len(parsed.scheme) > 1:
+        raise ValueError(f"Batch files can only be written to a local directory, not {root}")
+    return Path(root).expanduser()
+
+
+def open_compressed(path: Path, compression: str, level: t.Optional[int] = None) -> t.BinaryIO:
+    """Open a file for writing through the given compression."""
+    if level is None:
+        level = DEFAULT_COMPRESSION_LEVELS.get(compression)
+    if compression == "gzip":
+        return gzip.GzipFile(path, "wb", compresslevel=level)  # type: ignore[return-value]
+    if compression == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Writing zstd batch files requires the zstd extra: pip install tap-airbyte[zstd]")
+        return zstandard.ZstdCompressor(level=level).stream_writer(open(path, "wb"), closefd=True)
+    return open(path, "wb")
+
+
+def _line_end(lines: bytes, count: int) -> int:
+    """Get the position just past the `count`th line of `lines`."""
+    end = 0
+    for _ in range(count):
+        end = lines.index(b"\n", end) + 1
+    return end
+
+
+class BatchFileWriter:
+    """Writes the JSON lines of a stream's records into rotating compressed files.
+
+    A file is written under a temporary name and renamed once sealed, so a file a
+    BATCH message points to is always complete. Files are sealed once they hold
+    `max_records` records or `max_bytes` bytes of uncompressed lines, and whenever
+    the tap seals them ahead of a STATE message.
+    """
+
+    format = "jsonl"
+
+    def __init__(
+        self,
+        directory: Path,
+        stream_name: str,
+        prefix: str = "",
+        compression: str = "gzip",
+        level: t.Optional[int] = None,
+        max_records: int = DEFAULT_BATCH_FILE_RECORDS,
+        max_bytes: int = 0,
+        sync_id: t.Optional[str] = None,
+    ) -> None:
+        self.directory = directory
+        self.stream_name = stream_name
+        self.prefix = prefix
+        self.compression = compression
+        self.level = level
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.sync_id = sync_id or uuid4().hex
+        self.files = 0
+        # Records and uncompressed bytes in the open file
+        self.records = 0
+        self.bytes = 0
+        self._path: t.Optional[Path] = None
+        self._file: t.Optional[t.BinaryIO] = None
+
+    @property
+    def encoding(self) -> t.Dict[str, str]:
+        """Get the encoding of the files, as announced in BATCH messages."""
+        return {"format": self.format, "compression": self.compression}
+
+    def _open(self) -> None:
+        self.files += 1
+        name = self.stream_name.replace(os.sep, "_")
+        self._path = self.directory / f"{self.prefix}{name}-{self.sync_id}-{self.files}.{self.format}{self._suffix()}"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._file = self._open_file(self._path.with_name(self._path.name + PARTIAL_SUFFIX))
+
+    def _suffix(self) -> str:
+        return COMPRESSION_SUFFIXES.get(self.compression, "")
+
+    def _open_file(self, path: Path) -> t.BinaryIO:
+        return open_compressed(path, self.compression, self.level)
+
+    def write_record(self, record: t.Dict[str, t.Any]) -> t.List[SealedFile]:
+        """Write a record, getting the file it filled up if any."""
+        return self.write(orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE, default=default), 1)
+
+    def write(self, lines: bytes, count: int) -> t.List[SealedFile]:
+        """Write `count` JSON lines, getting the files that filled up on the way."""
+        sealed = []
+        while count:
+            if self._file is None:
+                self._open()
+            room = self.max_records - self.records if self.max_records else count
+            part, part_count = lines, count
+            if count > room:
+                end = _line_end(lines, room)
+                part, part_count, lines = lines[:end], room, lines[end:]
+            self._file.write(part)  # type: ignore[union-attr]
+            self.records += part_count
+            self.bytes += len(part)
+            count -= part_count
+            if (self.max_records and self.records >= self.max_records) or (
+                self.max_bytes and self.bytes >= self.max_bytes
+            ):
+                sealed.append(self.seal())
+        return sealed  # type: ignore[return-value]
+
+    def seal(self) -> t.Optional[SealedFile]:
+        """Close the open file and give it its final name, None if there is no file open."""
+        if self._file is None or self._path is None:
+            return None
+        self._file.close()
+        self._path.with_name(self._path.name + PARTIAL_SUFFIX).replace(self._path)
+        sealed = SealedFile(self._path.resolve().as_uri(), self.records)
+        self._file = self._path = None
+        self.records = self.bytes = 0
+        return sealed
+
+    def abort(self) -> None:
+        """Close and remove the open file, which no BATCH message will ever point to."""
+        if self._file is None or self._path is None:
+            return
+        self._file.close()
+        self._path.with_name(self._path.name + PARTIAL_SUFFIX).unlink(missing_ok=True)
+        self._file = self._path = None
+        self.records = self.bytes = 0
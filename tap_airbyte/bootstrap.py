@@ -0,0 +1,42 @@
+"""Timings of the startup phases of the tap"""
+
+from __future__ import annotations
+
+import time
+import typing as t
+from contextlib import contextmanager
+from threading import Lock
+
+
+class PhaseTimings:
+    """Wall clock seconds spent in each startup phase.
+
+    Phases may run at the same time, so their sum can exceed the elapsed time, which is
+    what tells how much of the startup overlapped.
+    """
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.phases: t.Dict[str, float] = {}
+        self._lock = Lock()
+
+    @contextmanager
+    def phase(self, name: str) -> t.Iterator[None]:
+        """Measure a phase, adding up repeated runs of the same phase."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def elapsed(self) -> float:
+        """Get the seconds elapsed since the timings were started."""
+        return time.perf_counter() - self.started
+
+    def summary(self) -> str:
+        """Describe the time spent per phase."""
+        with self._lock:
+            phases = ", ".join(f"{name} {seconds:0.2f}s" for name, seconds in self.phases.items())
+        return f"{phases or 'no phases'} ({self.elapsed():0.2f}s elapsed)"
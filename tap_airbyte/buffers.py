@@ -0,0 +1,316 @@
+"""Bounded record buffers between the Airbyte reader loop and the Singer stream consumers"""
+
+from __future__ import annotations
+
+import logging
+import time
+import typing as t
+from collections import deque
+from queue import Empty
+from threading import Condition
+
+from tap_airbyte.spill import SpilledBatch, SpillFile
+
+# Minimum number of seconds between two backpressure log lines for the same stream
+BACKPRESSURE_LOG_INTERVAL = 30.0
+# Records and approximate bytes staged by the producer before they are handed over at once
+DEFAULT_BATCH_RECORDS = 256
+BATCH_MAX_BYTES = 1024 * 1024
+
+
+class MemoryBudget:
+    """Record and byte limits shared by every stream buffer of a sync. 0 means unbounded."""
+
+    def __init__(self, max_records: int = 0, max_bytes: int = 0) -> None:
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.records = 0
+        self.bytes = 0
+        # Guards the accounting of the budget and of every buffer drawing from it
+        self.space = Condition()
+
+    def exhausted(self) -> bool:
+        """Check if the budget is used up. Must be called with `space` held."""
+        return bool(
+            (self.max_records and self.records >= self.max_records)
+            or (self.max_bytes and self.bytes >= self.max_bytes)
+        )
+
+    def wait_for_space(self, buffers: t.Iterable["StreamBuffer"]) -> None:
+        """Block until none of the buffers drawing from this budget is full."""
+        buffers = list(buffers)
+        with self.space:
+            while any(stream_buffer.full() for stream_buffer in buffers):
+                self.space.wait()
+
+
+class StreamBuffer:
+    """FIFO of records for a single stream, bounded by record count and approximate size.
+
+    The producer blocks in `put` while this buffer or the shared budget is full. The
+    producer is the loop reading the connector's stdout, so blocking it lets the OS pipe
+    fill up which in turn throttles the Airbyte source. Sizes are the length of the raw
+    Airbyte message and are only an approximation of the memory held by the record.
+
+    Limits do not apply while the buffer is `awaiting_consumer`, a stream queued for a
+    free consumer must not stall the streams that keep the consumers busy. The consumer
+    iterates `drain` until the producer calls `finish`, no polling involved.
+
+    Records move in batches, so the locks are taken once per batch on both sides. The
+    producer stages records with `add`, which hands them over every `batch_size` records,
+    and calls `flush` whenever it is about to wait on the source. The consumer takes a
+    whole batch at a time and releases its space once done with it. Staged records are
+    not counted against the limits yet.
+
+    With a `spill` file, a batch that would block the producer is written to disk instead,
+    and only its place is queued. The consumer reads batches back as it reaches them, so
+    records keep their order and a slow consumer neither grows the memory held nor stalls
+    the other streams, until the spill file is out of room.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        budget: t.Optional[MemoryBudget] = None,
+        max_records: int = 0,
+        max_bytes: int = 0,
+        logger: t.Optional[logging.Logger] = None,
+        batch_size: int = DEFAULT_BATCH_RECORDS,
+        spill: t.Optional[SpillFile] = None,
+    ) -> None:
+        self.name = name
+        self.budget = budget or MemoryBudget()
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.batch_size = max(min(batch_size, max_records or batch_size), 1)
+        self.records = 0
+        self.bytes = 0
+        # Records ever accepted, the count a consumer has processed once the buffer is drained
+        self.accepted = 0
+        self.closed = False
+        self.finished = False
+        self.awaiting_consumer = False
+        # Without blocking, batches are always accepted and the producer waits for space itself
+        self.blocking = True
+        self.stalls = 0
+        self.stall_seconds = 0.0
+        self.spill = spill
+        # Records ever written to the spill file
+        self.spilled = 0
+        self.logger = logger or logging.getLogger(__name__)
+        # Batches of records, or of where they were spilled, along with their size and
+        # the number of records held in memory
+        self._items: t.Deque[t.Tuple[t.Any, int, int]] = deque()
+        # Records added by the producer but not handed over yet
+        self._staged: t.List[t.Any] = []
+        self._staged_bytes = 0
+        self._not_empty = Condition()
+        self._last_report = float("-inf")
+        self._last_spill_report = float("-inf")
+
+    def _full(self) -> bool:
+        # An empty buffer always admits a record, so one oversized record or a slow
+        # stream holding the whole global budget can never deadlock the others
+        if not self.records or self.awaiting_consumer:
+            return False
+        return bool(
+            (self.max_records and self.records >= self.max_records)
+            or (self.max_bytes and self.bytes >= self.max_bytes)
+            or self.budget.exhausted()
+        )
+
+    def _spills(self) -> bool:
+        return self.spill is not None and self.spill.has_room()
+
+    def full(self) -> bool:
+        """Check if the buffer would block the producer. Must be called with `budget.space` held."""
+        return self._full() and not self.closed and not self._spills()
+
+    def _report_stall(self) -> None:
+        now = time.monotonic()
+        if now - self._last_report < BACKPRESSURE_LOG_INTERVAL:
+            return
+        self._last_report = now
+        self.logger.info(
+            "Backpressure on stream '%s': %d records (~%d bytes) buffered for this stream,"
+            " %d records (~%d bytes) overall. Pausing reads from the Airbyte source.",
+            self.name,
+            self.records,
+            self.bytes,
+            self.budget.records,
+            self.budget.bytes,
+        )
+
+    def add(self, record: t.Any, nbytes: int = 0) -> bool:
+        """Stage a record, handing the staged batch over once it is large enough.
+
+        Returns False if the buffer was finished already and the record not staged.
+        """
+        if self.finished:
+            return False
+        self._staged.append(record)
+        self._staged_bytes += nbytes
+        if len(self._staged) >= self.batch_size or self._staged_bytes >= BATCH_MAX_BYTES:
+            self.flush()
+        return True
+
+    def flush(self) -> bool:
+        """Hand the staged records over to the consumer, see `put_batch`."""
+        if not self._staged:
+            return True
+        records, nbytes = self._staged, self._staged_bytes
+        self._staged = []
+        self._staged_bytes = 0
+        return self.put_batch(records, nbytes)
+
+    def put(self, record: t.Any, nbytes: int = 0) -> bool:
+        """Add a single record to the buffer, see `put_batch`."""
+        return self.put_batch([record], nbytes)
+
+    def put_batch(self, records: t.List[t.Any], nbytes: int = 0) -> bool:
+        """Add a batch of records to the buffer, blocking while it or the shared budget is full.
+
+        Returns False if the records were not accepted because the buffer was closed or
+        finished already.
+        """
+        space = self.budget.space
+        with space:
+            spill = self._full() and not self.closed and self._spills()
+            if self.blocking and self.full():
+                self._report_stall()
+                started = time.perf_counter()
+                while self.full():
+                    space.wait(timeout=1.0)
+                self.stalls += 1
+                self.stall_seconds += time.perf_counter() - started
+            if self.closed or self.finished:
+                # The consumer is gone or about to be, nobody is left to deliver these records to
+                return False
+            self.accepted += len(records)
+            if not spill:
+                self.records += len(records)
+                self.bytes += nbytes
+                self.budget.records += len(records)
+                self.budget.bytes += nbytes
+        entry = (records, nbytes, len(records))
+        if spill:
+            self._report_spill()
+            try:
+                entry = (self.spill.write(records), 0, 0)  # type: ignore[union-attr]
+            except ValueError:
+                # Closed along with the buffer meanwhile
+                return False
+            self.spilled += len(records)
+        with self._not_empty:
+            self._items.append(entry)
+            self._not_empty.notify()
+        return True
+
+    def _report_spill(self) -> None:
+        now = time.monotonic()
+        if now - self._last_spill_report < BACKPRESSURE_LOG_INTERVAL:
+            return
+        self._last_spill_report = now
+        self.logger.info(
+            "Stream '%s' is behind: %d records (~%d bytes) buffered in memory, spilling records to"
+            " disk with %d records (%d bytes) spilled already.",
+            self.name,
+            self.records,
+            self.bytes,
+            self.spill.records,  # type: ignore[union-attr]
+            self.spill.bytes,  # type: ignore[union-attr]
+        )
+
+    def _load(self, records: t.Any) -> t.List[t.Any]:
+        """Get a batch of records, reading it back if it was spilled."""
+        if isinstance(records, SpilledBatch):
+            return self.spill.read(records)  # type: ignore[union-attr]
+        return records
+
+    def get(self, timeout: t.Optional[float] = None) -> t.Any:
+        """Remove and return the oldest record, raising `queue.Empty` after `timeout`."""
+        with self._not_empty:
+            if not self._not_empty.wait_for(lambda: self._items, timeout):
+                raise Empty
+            records, nbytes, held = self._items.popleft()
+            records = self._load(records)
+            if len(records) > 1:
+                # Accounts the batch's size evenly to its records
+                share = nbytes // len(records)
+                self._items.appendleft((records[1:], nbytes - share, held - 1 if held else 0))
+                nbytes = share
+        self._release(1 if held else 0, nbytes)
+        return records[0]
+
+    def _release(self, records: int, nbytes: int) -> None:
+        space = self.budget.space
+        with space:
+            self.records -= records
+            self.bytes -= nbytes
+            self.budget.records -= records
+            self.budget.bytes -= nbytes
+            space.notify_all()
+
+    def drain(self) -> t.Iterator[t.Any]:
+        """Yield records as they arrive until the buffer is finished and empty, or closed."""
+        for records in self.drain_batches():
+            yield from records
+
+    def drain_batches(self) -> t.Iterator[t.List[t.Any]]:
+        """Yield batches of records as they arrive until the buffer is finished and empty, or closed.
+
+        A batch is only released from the limits once the next one is asked for.
+        """
+        with self.budget.space:
+            self.awaiting_consumer = False
+        while True:
+            with self._not_empty:
+                self._not_empty.wait_for(lambda: self._items or self.finished or self.closed)
+                if not self._items:
+                    if self.spill is not None:
+                        self.spill.close()
+                    return
+                records, nbytes, held = self._items.popleft()
+            try:
+                # Read back outside the lock, the producer keeps queueing meanwhile
+                records = self._load(records)
+            except ValueError:
+                if self.closed:
+                    # The spill file was closed along with the buffer
+                    return
+                raise
+            try:
+                yield records
+            finally:
+                self._release(held, nbytes)
+
+    def finish(self) -> None:
+        """Hand over the staged records and signal that no more records will be added."""
+        self.flush()
+        with self._not_empty:
+            self.finished = True
+            self._not_empty.notify_all()
+
+    def empty(self) -> bool:
+        """Check if the buffer holds no records."""
+        return not self._items
+
+    def qsize(self) -> int:
+        """Get the number of buffered records."""
+        return sum(
+            records.count if isinstance(records, SpilledBatch) else len(records)
+            for records, _, _ in list(self._items)
+        )
+
+    def close(self) -> None:
+        """Stop accepting records and release anything still buffered."""
+        with self._not_empty:
+            dropped = list(self._items)
+            self._items.clear()
+            self.closed = True
+            if self.spill is not None:
+                self.spill.close()
+            self._not_empty.notify_all()
+        with self.budget.space:
+            self.closed = True
+        self._release(sum(held for _, _, held in dropped), sum(nbytes for _, nbytes, _ in dropped))
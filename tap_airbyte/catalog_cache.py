@@ -0,0 +1,71 @@
+"""On-disk cache of discovered Airbyte catalogs"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import time
+import typing as t
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+
+import orjson
+
+DEFAULT_CATALOG_CACHE_DIR = Path(__file__).parent.resolve() / ".catalog-cache"
+
+
+class CatalogCache:
+    """Catalogs keyed by connector image, tag and a hash of the connector config.
+
+    Every entry is a JSON file holding the catalog and the time it was discovered. Files
+    are replaced atomically, so concurrent taps sharing a cache directory never read a
+    partially written entry.
+    """
+
+    def __init__(self, directory: t.Union[str, Path] = DEFAULT_CATALOG_CACHE_DIR) -> None:
+        self.directory = Path(directory)
+
+    @staticmethod
+    def key(image: str, tag: str, airbyte_config: t.Dict[str, t.Any]) -> str:
+        """Get the cache key of a connector image, tag and config."""
+        config_hash = hashlib.sha256(orjson.dumps(airbyte_config, option=orjson.OPT_SORT_KEYS))
+        name = f"{image}-{tag}".replace("/", "_").replace(":", "_")
+        return f"{name}-{config_hash.hexdigest()[:16]}"
+
+    def path(self, key: str) -> Path:
+        """Get the file of a cache entry."""
+        return self.directory / f"{key}.json"
+
+    def load(self, key: str) -> t.Optional[t.Tuple[t.Dict[str, t.Any], float]]:
+        """Get a cached catalog along with its age in seconds, or None if not cached."""
+        try:
+            entry = orjson.loads(self.path(key).read_bytes())
+            return entry["catalog"], max(time.time() - entry["discovered_at"], 0.0)
+        except (OSError, orjson.JSONDecodeError, KeyError, TypeError):
+            return None
+
+    def store(self, key: str, catalog: t.Dict[str, t.Any]) -> None:
+        """Cache a freshly discovered catalog."""
+        self._write(key, {"discovered_at": time.time(), "catalog": catalog})
+
+    def renew(self, key: str) -> None:
+        """Restart the time to live of a cached catalog that discovery found unchanged."""
+        try:
+            entry = orjson.loads(self.path(key).read_bytes())
+        except (OSError, orjson.JSONDecodeError):
+            return
+        entry["discovered_at"] = time.time()
+        self._write(key, entry)
+
+    def _write(self, key: str, entry: t.Dict[str, t.Any]) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with NamedTemporaryFile("wb", dir=self.directory, suffix=".tmp", delete=False) as f:
+            f.write(orjson.dumps(entry))
+        os.replace(f.name, self.path(key))
+
+
+def same_catalog(first: t.Dict[str, t.Any], second: t.Dict[str, t.Any]) -> bool:
+    """Check if two catalogs are equal regardless of key order."""
+    return orjson.dumps(first, option=orjson.OPT_SORT_KEYS) == orjson.dumps(
+        second, option=orjson.OPT_SORT_KEYS
+    )
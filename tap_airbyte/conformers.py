@@ -0,0 +1,117 @@
+"""Record conformers compiled once per stream schema"""
+
+from __future__ import annotations
+
+import typing as t
+
+from singer_sdk.helpers._typing import (
+    _is_exclusive_boolean_type,
+    is_object_type,
+    is_uniform_list,
+)
+
+# Converts a value, collecting the paths of properties missing from the schema
+Converter = t.Callable[[t.Any, t.List[str]], t.Any]
+Conformer = t.Callable[[t.Dict[str, t.Any]], t.Tuple[t.Dict[str, t.Any], t.List[str]]]
+
+_MISSING = object()
+
+
+def _to_boolean(elem: t.Any) -> t.Optional[bool]:
+    return None if elem is None else elem != 0
+
+
+def _compile_object(schema: t.Dict[str, t.Any], parent: t.Optional[str]) -> Converter:
+    """Compile the conformance of an object with the properties of `schema`."""
+    additional = schema.get("additionalProperties")
+    converters: t.Dict[str, t.Optional[Converter]] = {
+        name: _compile_property(property_schema, name if parent is None else f"{parent}.{name}")
+        for name, property_schema in schema["properties"].items()
+    }
+    identity = all(converter is None for converter in converters.values())
+    names = converters.keys()
+
+    def conform(obj: t.Dict[str, t.Any], unmapped: t.List[str]) -> t.Dict[str, t.Any]:
+        if identity and obj.keys() <= names:
+            # Nothing to convert nor to drop
+            return obj
+        output = {}
+        for name, elem in obj.items():
+            converter = converters.get(name, _MISSING)
+            if converter is None:
+                output[name] = elem
+            elif converter is _MISSING:
+                if additional:
+                    output[name] = elem
+                else:
+                    unmapped.append(name if parent is None else f"{parent}.{name}")
+            else:
+                output[name] = converter(elem, unmapped)  # type: ignore[operator]
+        return output
+
+    return conform
+
+
+def _compile_list(schema: t.Dict[str, t.Any], path: str) -> t.Optional[Converter]:
+    """Compile the conformance of the items of a uniform list, None if they are kept as is."""
+    item_schema = schema["items"]
+    conform_object = _compile_object(item_schema, path) if is_object_type(item_schema) else None
+    to_boolean = _is_exclusive_boolean_type(item_schema)
+    if conform_object is None and not to_boolean:
+        return None
+
+    def conform(elem: t.List[t.Any], unmapped: t.List[str]) -> t.List[t.Any]:
+        output = []
+        for item in elem:
+            if conform_object is not None and isinstance(item, dict):
+                output.append(conform_object(item, unmapped))
+            elif to_boolean:
+                output.append(_to_boolean(item))
+            else:
+                output.append(item)
+        return output
+
+    return conform
+
+
+def _compile_property(schema: t.Dict[str, t.Any], path: str) -> t.Optional[Converter]:
+    """Compile the conformance of a property, None if its values are kept as is."""
+    is_list = is_uniform_list(schema)
+    conform_list = _compile_list(schema, path) if is_list else None
+    conform_object = (
+        _compile_object(schema, path) if is_object_type(schema) and "properties" in schema else None
+    )
+    to_boolean = _is_exclusive_boolean_type(schema)
+    if conform_list is None and conform_object is None and not to_boolean:
+        return None
+
+    def convert(elem: t.Any, unmapped: t.List[str]) -> t.Any:
+        if is_list and isinstance(elem, list):
+            return elem if conform_list is None else conform_list(elem, unmapped)
+        if conform_object is not None and isinstance(elem, dict):
+            return conform_object(elem, unmapped)
+        if to_boolean:
+            return _to_boolean(elem)
+        return elem
+
+    return convert
+
+
+def compile_conformer(schema: t.Dict[str, t.Any]) -> t.Optional[Conformer]:
+    """Compile the recursive type conformance of records of a stream schema.
+
+    The result gives the same records and unmapped property paths as the SDK's
+    `conform_record_data_types` does for JSON decoded records, which is all the tap
+    ever gets, without walking the schema for each of them. Returns None for schemas
+    it does not handle, which are left to the SDK.
+    """
+    try:
+        conform_object = _compile_object(schema, None)
+    except (KeyError, TypeError, AttributeError):
+        return None
+
+    def conform(record: t.Dict[str, t.Any]) -> t.Tuple[t.Dict[str, t.Any], t.List[str]]:
+        unmapped: t.List[str] = []
+        return conform_object(record, unmapped), unmapped
+
+    return conform
@@ -0,0 +1,85 @@
+"""Flattening applied to batches of records"""
+
+from __future__ import annotations
+
+import typing as t
+from collections.abc import MutableMapping
+
+from singer_sdk.helpers._flattening import _should_jsondump_value, flatten_key
+from singer_sdk.mapper import RemoveRecordTransform, SameRecordTransform, StreamMap
+from singer_sdk.singerlib.json import serialize_json
+
+# Flattened keys cached per plan, beyond which keys are computed for each record
+MAX_PLANNED_KEYS = 10_000
+
+
+class FlattenPlan:
+    """Flattening of a stream map's records, with the keys worked out once per nested path.
+
+    Gives the same records as the SDK's `flatten_record`, which joins and shortens the
+    key of every nested property of every record.
+    """
+
+    def __init__(self, stream_map: StreamMap) -> None:
+        options = stream_map.flattening_options
+        assert options is not None
+        self.schema = stream_map.transformed_schema
+        self.properties = self.schema.get("properties", {}) if self.schema else {}
+        self.max_level = options.max_level
+        self.separator = options.separator
+        self.max_key_length = options.max_key_length
+        self._keys: t.Dict[t.Tuple[t.Tuple[str, ...], str], t.Tuple[str, bool, bool]] = {}
+
+    def _plan_key(self, parent: t.Tuple[str, ...], key: str) -> t.Tuple[str, bool, bool]:
+        """Get the flattened key of a property, whether to descend into it and whether to dump it."""
+        planned = self._keys.get((parent, key))
+        if planned is None:
+            new_key = flatten_key(key, list(parent), self.separator, max_key_length=self.max_key_length)
+            planned = (
+                new_key,
+                bool(self.schema) and new_key not in self.properties and len(parent) < self.max_level,
+                _should_jsondump_value(key, None, self.schema),
+            )
+            if len(self._keys) < MAX_PLANNED_KEYS:
+                self._keys[(parent, key)] = planned
+        return planned
+
+    def flatten(self, record: t.Mapping[str, t.Any], parent: t.Tuple[str, ...] = ()) -> t.Dict[str, t.Any]:
+        """Flatten a record."""
+        output: t.Dict[str, t.Any] = {}
+        for key, value in record.items():
+            new_key, descend, dump = self._plan_key(parent, key)
+            if descend and isinstance(value, MutableMapping):
+                output.update(self.flatten(value, (*parent, key)))
+            elif dump or isinstance(value, (dict, list)):
+                output[new_key] = serialize_json(value)
+            else:
+                output[new_key] = value
+        return output
+
+
+class BatchStreamMap:
+    """Applies an SDK stream map to whole batches of records.
+
+    Records a map passes through as they are get flattened along a `FlattenPlan`. Any
+    other map transforms each record through its public `transform`, which applies its
+    filter too, exactly as the SDK does.
+    """
+
+    def __init__(self, stream_map: StreamMap) -> None:
+        self.stream_map = stream_map
+        self.stream_alias = stream_map.stream_alias
+        self.flatten_plan = (
+            FlattenPlan(stream_map)
+            if type(stream_map) is SameRecordTransform and stream_map.flattening_enabled
+            else None
+        )
+
+    def transform_batch(self, records: t.Sequence[dict]) -> t.List[t.Optional[dict]]:
+        """Transform a batch of records, with None in place of the records filtered out."""
+        if isinstance(self.stream_map, RemoveRecordTransform):
+            return [None] * len(records)
+        if self.flatten_plan is not None:
+            return [self.flatten_plan.flatten(record) for record in records]
+        transform = self.stream_map.transform
+        return [transform(record) for record in records]
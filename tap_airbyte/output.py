@@ -0,0 +1,143 @@
+"""Single writer thread interleaving the serialized output of every stream onto stdout"""
+
+from __future__ import annotations
+
+import typing as t
+from collections import deque
+from threading import Condition, Thread
+
+from tap_airbyte.writer import BufferedSingerWriter
+
+# Serialized output queued across all stream lanes before producers are paused
+DEFAULT_OUTPUT_QUEUE_BYTES = 16 * 1024 * 1024
+# Bytes written from one lane before the writer moves on to the next
+DEFAULT_OUTPUT_QUANTUM = 64 * 1024
+
+
+class OrderedOutput:
+    """Owns stdout for the duration of a sync, fed with serialized Singer messages.
+
+    Every stream pushes onto its own lane, along with the number of records the pushed
+    bytes complete. One writer thread drains the lanes round robin, at most `quantum`
+    bytes per lane and turn, so a hot stream cannot starve the others. Messages of the
+    tap itself go through the control lane, where a message pushed with watermarks,
+    which is how STATE is pushed, is only written once every lane has written at least
+    its watermark of records. Messages of the control lane are written in order, lanes
+    are drained in the meantime.
+    """
+
+    def __init__(
+        self,
+        writer: BufferedSingerWriter,
+        max_pending_bytes: int = DEFAULT_OUTPUT_QUEUE_BYTES,
+        quantum: int = DEFAULT_OUTPUT_QUANTUM,
+    ) -> None:
+        self.writer = writer
+        self.max_pending_bytes = max_pending_bytes
+        self.quantum = quantum
+        self.pending_bytes = 0
+        self._lanes: t.Dict[str, t.Deque[t.Tuple[bytes, int]]] = {}
+        self._written: t.Dict[str, int] = {}
+        self._control: t.Deque[t.Tuple[bytes, t.Optional[t.Dict[str, int]], bool]] = deque()
+        self._changed = Condition()
+        self._closing = False
+        self._discard = False
+        self._thread: t.Optional[Thread] = None
+
+    def start(self) -> "OrderedOutput":
+        """Start the writer thread."""
+        self._thread = Thread(target=self._run, name="singer-writer", daemon=True)
+        self._thread.start()
+        return self
+
+    def written(self, lane: str) -> int:
+        """Get the number of records of `lane` written out so far."""
+        with self._changed:
+            return self._written.get(lane, 0)
+
+    def push(self, lane: str, data: bytes, records: int = 0) -> None:
+        """Queue serialized messages of a stream, blocking while the queue is full."""
+        with self._changed:
+            while (
+                self.pending_bytes >= self.max_pending_bytes
+                and not self._discard
+                and self._lanes.get(lane)
+            ):
+                self._changed.wait()
+            if self._discard:
+                return
+            self._lanes.setdefault(lane, deque()).append((data, records))
+            self.pending_bytes += len(data)
+            self._changed.notify_all()
+
+    def push_control(
+        self,
+        data: bytes,
+        watermarks: t.Optional[t.Dict[str, int]] = None,
+        flush: bool = False,
+    ) -> None:
+        """Queue a message of the tap, written once every lane reached its watermark."""
+        with self._changed:
+            if self._discard:
+                return
+            self._control.append((data, watermarks, flush))
+            self._changed.notify_all()
+
+    def close(self, discard: bool = False) -> None:
+        """Write out everything queued and stop the writer thread, or drop it if `discard`."""
+        with self._changed:
+            self._closing = True
+            if discard:
+                # Records behind a watermark may never be written, do not wait on them
+                self._discard = True
+                self._lanes.clear()
+                self._control.clear()
+                self.pending_bytes = 0
+            self._changed.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _reached(self, watermarks: t.Optional[t.Dict[str, int]]) -> bool:
+        if not watermarks:
+            return True
+        written = self._written
+        return all(written.get(lane, 0) >= count for lane, count in watermarks.items())
+
+    def _ready(self) -> bool:
+        if any(self._lanes.values()):
+            return True
+        if self._control and self._reached(self._control[0][1]):
+            return True
+        return self._closing
+
+    def _run(self) -> None:
+        while True:
+            with self._changed:
+                self._changed.wait_for(self._ready)
+                control = []
+                while self._control and self._reached(self._control[0][1]):
+                    control.append(self._control.popleft())
+                turn = []
+                for lane, items in self._lanes.items():
+                    taken = 0
+                    while items and taken < self.quantum:
+                        data, records = items.popleft()
+                        taken += len(data)
+                        turn.append((lane, data, records))
+                if not control and not turn and self._closing:
+                    if self._discard or not self._control:
+                        return
+                    # Only watermarked messages left that can never be reached
+                    control.extend(self._control)
+                    self._control.clear()
+            for data, _, flush in control:
+                self.writer.write(data, flush=flush)
+            for _, data, _ in turn:
+                self.writer.write(data)
+            with self._changed:
+                for lane, data, records in turn:
+                    self.pending_bytes -= len(data)
+                    if records:
+                        self._written[lane] = self._written.get(lane, 0) + records
+                self._changed.notify_all()
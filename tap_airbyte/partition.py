@@ -0,0 +1,90 @@
+"""Split a sync across several Airbyte read processes and merge their output"""
+
+from __future__ import annotations
+
+import typing as t
+from queue import Queue
+from threading import Thread
+
+from tap_airbyte.pipeline import iter_line_chunks
+
+# Chunks read ahead per read process before its reader thread waits for the merge
+MERGE_QUEUE_CHUNKS = 4
+
+# Prefix of the metadata columns Airbyte CDC sources add to the streams they keep a global state for
+CDC_COLUMN_PREFIX = "_ab_cdc_"
+
+
+def partition_catalog(catalog: t.Dict[str, t.Any], partitions: int) -> t.List[t.Dict[str, t.Any]]:
+    """Split a configured Airbyte catalog into up to `partitions` catalogs of disjoint streams."""
+    groups: t.List[t.List[t.Dict[str, t.Any]]] = [[] for _ in range(max(partitions, 1))]
+    for index, stream in enumerate(catalog["streams"]):
+        groups[index % len(groups)].append(stream)
+    return [{**catalog, "streams": streams} for streams in groups if streams]
+
+
+def catalog_stream_names(catalog: t.Dict[str, t.Any]) -> t.Set[str]:
+    """Get the names of the streams of a configured Airbyte catalog."""
+    return {entry["stream"]["name"] for entry in catalog["streams"]}
+
+
+def has_per_stream_state(state: t.Any) -> bool:
+    """Check if an Airbyte state holds nothing but per-stream entries."""
+    return isinstance(state, list) and all(entry.get("type") == "STREAM" for entry in state)
+
+
+def uses_global_state(catalog: t.Dict[str, t.Any]) -> bool:
+    """Check if a discovered Airbyte catalog is read through CDC, with a global state.
+
+    The discovered catalog is checked rather than the configured one, which only holds the
+    selected properties of the selected streams and may leave the CDC columns out.
+    """
+    return any(
+        name.startswith(CDC_COLUMN_PREFIX)
+        for stream in catalog["streams"]
+        for name in [
+            *stream.get("json_schema", {}).get("properties", {}),
+            *stream.get("default_cursor_field", []),
+        ]
+    )
+
+
+def filter_connector_state(state: t.Any, names: t.Collection[str]) -> t.Any:
+    """Keep the per-stream entries of an Airbyte v2 state that belong to one of `names`."""
+    if not isinstance(state, list):
+        return state
+    return [
+        entry
+        for entry in state
+        if entry.get("type") != "STREAM"
+        or entry["stream"]["stream_descriptor"].get("name") in names
+    ]
+
+
+def merge_line_chunks(stdouts: t.Sequence[t.BinaryIO], chunk_size: int) -> t.Iterator[bytes]:
+    """Read the output of several processes at once, yielding chunks of whole lines.
+
+    Lines of one process stay in order, lines of different processes are interleaved
+    as they come in. The iterator ends when every process reached EOF.
+    """
+    chunks: Queue = Queue(maxsize=MERGE_QUEUE_CHUNKS * len(stdouts))
+
+    def read(stdout: t.BinaryIO) -> None:
+        try:
+            for chunk in iter_line_chunks(stdout, chunk_size):
+                chunks.put(chunk)
+        except BaseException as e:  # handed over to the merging thread
+            chunks.put(e)
+        chunks.put(None)
+
+    for stdout in stdouts:
+        Thread(target=read, args=(stdout,), daemon=True).start()
+    running = len(stdouts)
+    while running:
+        chunk = chunks.get()
+        if chunk is None:
+            running -= 1
+        elif isinstance(chunk, BaseException):
+            raise chunk
+        else:
+            yield chunk
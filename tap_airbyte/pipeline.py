@@ -0,0 +1,324 @@
+"""Multi-process decode pipeline for the Airbyte stdout reader"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import typing as t
+from concurrent.futures import Executor, ProcessPoolExecutor
+from queue import Queue
+from threading import Thread
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover, Windows
+    fcntl = None  # type: ignore
+
+import orjson
+from singer_sdk.helpers._catalog import pop_deselected_record_properties
+from singer_sdk.helpers._typing import (
+    TypeConformanceLevel,
+    _warn_unmapped_properties,
+    conform_record_data_types,
+)
+from singer_sdk.helpers._util import utc_now
+
+from tap_airbyte.conformers import Conformer, compile_conformer
+from tap_airbyte.passthrough import RawRecordSplicer
+from tap_airbyte.writer import default
+
+DEFAULT_DECODE_CHUNK_SIZE = 1024 * 1024
+
+# Kinds of items produced by decode_chunk, in the order of the lines they came from
+SINGER_LINES = 0  # (SINGER_LINES, stream, encoded Singer RECORD lines or record data lines, record count)
+DECODED_RECORD = 1  # (DECODED_RECORD, stream, record data, message size), left to a Singer stream
+DECODED_MESSAGE = 2  # (DECODED_MESSAGE, any other Airbyte message, message size)
+UNDECODABLE = 3  # (UNDECODABLE, line that is not valid JSON)
+
+logger = logging.getLogger(__name__)
+
+
+class StreamSpec(t.NamedTuple):
+    """What a worker needs to turn a stream's Airbyte records into Singer RECORD lines."""
+
+    schema: t.Dict[str, t.Any]
+    # Selection mask of the stream, None if every property is selected
+    mask: t.Optional[t.Dict[t.Tuple[str, ...], bool]] = None
+    raw: bool = False
+    # Encode records as lines of their data only, for batch files
+    payload: bool = False
+
+
+# Per process state, set up by init_decoder
+_specs: t.Dict[str, StreamSpec] = {}
+_conformers: t.Dict[str, t.Optional[Conformer]] = {}
+_option = orjson.OPT_APPEND_NEWLINE
+_splicer = RawRecordSplicer()
+
+
+def init_decoder(specs: t.Dict[str, StreamSpec], option: int) -> None:
+    """Set up the decoder of the current process."""
+    global _specs, _conformers, _option
+    _specs = specs
+    _conformers = {stream: compile_conformer(spec.schema) for stream, spec in specs.items()}
+    _option = option
+
+
+def decode_chunk(chunk: bytes) -> t.List[t.Tuple[t.Any, ...]]:
+    """Decode a chunk of Airbyte message lines, conforming and encoding records of known streams.
+
+    Consecutive records of the same stream are joined into one item, so the result
+    for a chunk of a single hot stream is a single block of bytes.
+    """
+    items: t.List[t.Tuple[t.Any, ...]] = []
+    run_stream: t.Optional[str] = None
+    run: t.List[bytes] = []
+    time_extracted = utc_now()
+
+    def end_run() -> None:
+        nonlocal run_stream
+        if run:
+            items.append((SINGER_LINES, run_stream, b"".join(run), len(run)))
+            run.clear()
+        run_stream = None
+
+    for line in chunk.splitlines():
+        if not line.strip():
+            continue
+        if _specs:
+            spliced = _splicer.splice(line)
+            if spliced is not None and spliced[0] in _specs and _specs[spliced[0]].raw:
+                if spliced[0] != run_stream:
+                    end_run()
+                    run_stream = spliced[0]
+                run.append(spliced[1])
+                continue
+        try:
+            message = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            end_run()
+            items.append((UNDECODABLE, line))
+            continue
+        if message.get("type") != "RECORD":
+            end_run()
+            items.append((DECODED_MESSAGE, message, len(line)))
+            continue
+        stream = message["record"]["stream"]
+        spec = _specs.get(stream)
+        if spec is None:
+            end_run()
+            items.append((DECODED_RECORD, stream, message["record"]["data"], len(line)))
+            continue
+        record = message["record"]["data"]
+        if spec.mask is not None:
+            pop_deselected_record_properties(record, spec.schema, spec.mask)
+        conform = _conformers.get(stream)
+        if conform is None:
+            record = conform_record_data_types(
+                stream_name=stream,
+                record=record,
+                schema=spec.schema,
+                level=TypeConformanceLevel.RECURSIVE,
+                logger=logger,
+            )
+        else:
+            record, unmapped = conform(record)
+            if unmapped:
+                _warn_unmapped_properties(stream, tuple(unmapped), logger)
+        if stream != run_stream:
+            end_run()
+            run_stream = stream
+        if spec.payload:
+            run.append(orjson.dumps(record, option=_option, default=default))
+            continue
+        run.append(
+            orjson.dumps(
+                {
+                    "type": "RECORD",
+                    "stream": stream,
+                    "record": record,
+                    "time_extracted": time_extracted,
+                },
+                option=_option,
+                default=default,
+            )
+        )
+    end_run()
+    return items
+
+
+def enlarge_pipe(stream: t.BinaryIO, size: int) -> None:
+    """Grow the kernel buffer of a pipe towards `size`, so each read returns more lines.
+
+    Only Linux can resize pipes, and sizes over the system limit are silently skipped.
+    """
+    if fcntl is None or not hasattr(fcntl, "F_SETPIPE_SZ"):
+        return
+    try:
+        fcntl.fcntl(stream.fileno(), fcntl.F_SETPIPE_SZ, size)
+    except (OSError, ValueError) as e:
+        logger.debug("Could not resize the pipe to %d bytes: %s", size, e)
+
+
+def iter_line_chunks(stdout: t.BinaryIO, chunk_size: int) -> t.Iterator[bytes]:
+    """Read whatever is available from `stdout`, up to `chunk_size`, split on line boundaries.
+
+    Reads go straight into a reusable buffer. The partial line at its end is moved to
+    the front once the buffer is full, and the buffer only grows, doubling, when a
+    single line does not fit. A multi-megabyte record therefore costs linear time
+    rather than a concatenation per read.
+    """
+    readinto = getattr(stdout, "readinto1", None) or stdout.readinto
+    buffer = bytearray(chunk_size)
+    # Bytes read but not handed out yet are buffer[start:end]
+    start = end = 0
+    while True:
+        if end == len(buffer):
+            if start:
+                buffer[: end - start] = buffer[start:end]
+                end -= start
+                start = 0
+            else:
+                buffer.extend(bytes(len(buffer)))
+        with memoryview(buffer)[end:] as free:
+            read = readinto(free)
+        if not read:
+            break
+        last = buffer.rfind(b"\n", end, end + read)
+        end += read
+        if last == -1:
+            continue
+        with memoryview(buffer)[start : last + 1] as lines:
+            yield bytes(lines)
+        start = last + 1
+        if start == end:
+            start = end = 0
+    if start < end:
+        yield bytes(buffer[start:end])
+
+
+async def open_pipe_reader(size: int) -> t.Tuple[asyncio.StreamReader, int]:
+    """Create a pipe grown towards `size`, for the stdout of a subprocess run on the event loop.
+
+    Gets a stream reader of the read end, and the write end to hand to the subprocess,
+    which the caller closes once the subprocess is started.
+    """
+    read_fd, write_fd = os.pipe()
+    read_end = os.fdopen(read_fd, "rb", buffering=0)
+    enlarge_pipe(read_end, size)
+    reader = asyncio.StreamReader()
+    try:
+        await asyncio.get_running_loop().connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader), read_end
+        )
+    except BaseException:
+        read_end.close()
+        os.close(write_fd)
+        raise
+    return reader, write_fd
+
+
+async def iter_line_chunks_async(
+    reader: asyncio.StreamReader, chunk_size: int
+) -> t.AsyncIterator[bytes]:
+    """Read whatever is available from an asyncio stream, up to `chunk_size`, split on line boundaries."""
+    partial = bytearray()
+    while True:
+        block = await reader.read(chunk_size)
+        if not block:
+            break
+        end = block.rfind(b"\n")
+        if end == -1:
+            # Amortized linear, however many reads a long line takes
+            partial += block
+            continue
+        if partial:
+            partial += block[: end + 1]
+            yield bytes(partial)
+            partial = bytearray(block[end + 1 :])
+        else:
+            yield block[: end + 1]
+            partial += block[end + 1 :]
+    if partial:
+        yield bytes(partial)
+
+
+class DecodePipeline:
+    """Decodes chunks of Airbyte output on a pool of worker processes.
+
+    Results are handed back in the order the chunks were read, so the order of records
+    within a stream and of records relative to STATE messages is preserved. With 0
+    workers chunks are decoded inline, which is what the benchmark compares against.
+    """
+
+    def __init__(
+        self,
+        specs: t.Dict[str, StreamSpec],
+        workers: int,
+        chunk_size: int = DEFAULT_DECODE_CHUNK_SIZE,
+        option: int = orjson.OPT_APPEND_NEWLINE,
+    ) -> None:
+        self.specs = specs
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.option = option
+        # Chunks in flight, bounded so a slow consumer of the results throttles reading
+        self.max_pending = max(2 * workers, 1)
+        self._executor: t.Optional[Executor] = None
+
+    def __enter__(self) -> "DecodePipeline":
+        if self.workers > 0:
+            # Spawn rather than fork, the tap has threads running by the time this starts
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_decoder,
+                initargs=(self.specs, self.option),
+            )
+        else:
+            init_decoder(self.specs, self.option)
+        return self
+
+    def __exit__(self, *exc_info: t.Any) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def decode(self, stdout: t.BinaryIO) -> t.Iterator[t.Tuple[t.Any, ...]]:
+        """Decode everything read from `stdout`, yielding items in order."""
+        return self.decode_chunks(iter_line_chunks(stdout, self.chunk_size))
+
+    def decode_chunks(self, chunks: t.Iterator[bytes]) -> t.Iterator[t.Tuple[t.Any, ...]]:
+        """Decode chunks of whole lines, yielding items in order."""
+        for items in self.decode_chunk_items(chunks):
+            yield from items
+
+    def decode_chunk_items(self, chunks: t.Iterator[bytes]) -> t.Iterator[t.List[t.Tuple[t.Any, ...]]]:
+        """Decode chunks of whole lines, yielding the items of each chunk in order."""
+        if self._executor is None:
+            for chunk in chunks:
+                yield decode_chunk(chunk)
+            return
+        # Reading happens on its own thread so decoded results are handed back as soon as
+        # they are ready, even while the next read is blocked on an idle source
+        pending: Queue = Queue(maxsize=self.max_pending)
+        reader = Thread(target=self._submit_chunks, args=(chunks, pending), daemon=True)
+        reader.start()
+        while True:
+            future = pending.get()
+            if future is None:
+                break
+            if isinstance(future, BaseException):
+                raise future
+            yield future.result()
+
+    def _submit_chunks(self, chunks: t.Iterator[bytes], pending: Queue) -> None:
+        assert self._executor is not None
+        try:
+            for chunk in chunks:
+                pending.put(self._executor.submit(decode_chunk, chunk))
+        except BaseException as e:  # handed over to the consuming thread
+            pending.put(e)
+        pending.put(None)
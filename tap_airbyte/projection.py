@@ -0,0 +1,50 @@
+"""Projection of Airbyte streams onto the properties selected in the Singer catalog"""
+
+from __future__ import annotations
+
+import typing as t
+
+
+def selected_properties(mask: t.Mapping[t.Tuple[str, ...], bool]) -> t.Optional[t.FrozenSet[str]]:
+    """Get the selected top-level properties of a stream's selection mask, None if all are selected."""
+    properties = {
+        breadcrumb[1]: selected
+        for breadcrumb, selected in mask.items()
+        if len(breadcrumb) == 2 and breadcrumb[0] == "properties"
+    }
+    if all(properties.values()):
+        return None
+    return frozenset(name for name, selected in properties.items() if selected)
+
+
+def project_schema(schema: t.Dict[str, t.Any], properties: t.FrozenSet[str]) -> t.Dict[str, t.Any]:
+    """Get a copy of a JSON schema limited to the given top-level properties."""
+    projected = dict(schema)
+    projected["properties"] = {
+        name: prop for name, prop in schema.get("properties", {}).items() if name in properties
+    }
+    if "required" in schema:
+        projected["required"] = [name for name in schema["required"] if name in properties]
+    return projected
+
+
+def airbyte_key_properties(stream: t.Dict[str, t.Any]) -> t.FrozenSet[str]:
+    """Get the top-level properties an Airbyte stream needs for its primary key and cursor.
+
+    Both the source defined ones and those set on the stream by the user are kept.
+    """
+    paths = [
+        *stream.get("source_defined_primary_key", []),
+        *stream.get("primary_key", []),
+        stream.get("default_cursor_field", []),
+        stream.get("cursor_field", []),
+    ]
+    return frozenset(path[0] for path in paths if path)
+
+
+def project_record(record: t.Dict[str, t.Any], properties: t.FrozenSet[str]) -> t.Dict[str, t.Any]:
+    """Get a record limited to the given top-level properties."""
+    if len(record) <= len(properties) and record.keys() <= properties:
+        # Already projected by the connector
+        return record
+    return {name: value for name, value in record.items() if name in properties}
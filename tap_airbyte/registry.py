@@ -0,0 +1,127 @@
+"""Cached index of the Airbyte connector registry"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import time
+import typing as t
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from urllib.parse import urlparse
+
+import orjson
+import requests
+
+DEFAULT_REGISTRY_URL = "https://connectors.airbyte.com/files/registries/v0/oss_registry.json"
+DEFAULT_REGISTRY_CACHE_DIR = Path(__file__).parent.resolve() / ".registry-cache"
+DEFAULT_REGISTRY_CACHE_TTL = 24 * 60 * 60
+REGISTRY_TIMEOUT = 5
+
+logger = logging.getLogger(__name__)
+
+
+def build_index(registry: t.Dict[str, t.Any]) -> t.Dict[str, t.Dict[str, t.Any]]:
+    """Reduce a registry to what the tap needs per source image."""
+    index = {}
+    for source in registry.get("sources", []):
+        pypi = source.get("remoteRegistries", {}).get("pypi", {})
+        index[source["dockerRepository"]] = {
+            "pypi": bool(pypi.get("enabled")),
+            "package": pypi.get("packageName"),
+            "version": source.get("dockerImageTag"),
+        }
+    return index
+
+
+class ConnectorRegistry:
+    """Looks up source images in a compact index of the Airbyte registry.
+
+    The registry is either a URL or a path to a local copy, for air-gapped runners. The
+    index built from a remote registry is cached on disk and used without any network
+    access for `ttl` seconds. Once expired it is revalidated with a conditional request,
+    and if the registry cannot be reached the expired index is used rather than none.
+    """
+
+    def __init__(
+        self,
+        source: str = DEFAULT_REGISTRY_URL,
+        cache_dir: t.Union[str, Path] = DEFAULT_REGISTRY_CACHE_DIR,
+        ttl: float = DEFAULT_REGISTRY_CACHE_TTL,
+    ) -> None:
+        self.source = source
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self._index: t.Optional[t.Dict[str, t.Dict[str, t.Any]]] = None
+
+    @property
+    def is_remote(self) -> bool:
+        """Check if the registry is fetched over HTTP."""
+        return urlparse(self.source).scheme in ("http", "https")
+
+    @property
+    def cache_path(self) -> Path:
+        """Get the file the index of the registry is cached in."""
+        return self.cache_dir / f"{hashlib.sha256(self.source.encode()).hexdigest()[:16]}.json"
+
+    def lookup(self, image: str) -> t.Optional[t.Dict[str, t.Any]]:
+        """Get the index entry of a source image, None if it is not in the registry."""
+        if self._index is None:
+            self._index = self.load_index()
+        return self._index.get(image)
+
+    def load_index(self) -> t.Dict[str, t.Dict[str, t.Any]]:
+        """Get the index of the registry, fetching it only if the cached one expired."""
+        if not self.is_remote:
+            path = self.source[len("file://"):] if self.source.startswith("file://") else self.source
+            return build_index(orjson.loads(Path(path).read_bytes()))
+        cached = self._read_cache()
+        if cached is not None and time.time() - cached["fetched_at"] < self.ttl:
+            return cached["index"]
+        headers = {}
+        if cached is not None:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+        try:
+            response = requests.get(self.source, headers=headers, timeout=REGISTRY_TIMEOUT)
+            if response.status_code == 304 and cached is not None:
+                self._write_cache({**cached, "fetched_at": time.time()})
+                return cached["index"]
+            response.raise_for_status()
+        except requests.RequestException as e:
+            if cached is None:
+                raise
+            logger.warning("Could not revalidate the Airbyte registry, using the cached index: %s", e)
+            return cached["index"]
+        index = build_index(response.json())
+        self._write_cache(
+            {
+                "fetched_at": time.time(),
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "index": index,
+            }
+        )
+        return index
+
+    def _read_cache(self) -> t.Optional[t.Dict[str, t.Any]]:
+        try:
+            cached = orjson.loads(self.cache_path.read_bytes())
+        except (OSError, orjson.JSONDecodeError):
+            return None
+        if not isinstance(cached, dict) or "index" not in cached or "fetched_at" not in cached:
+            return None
+        return cached
+
+    def _write_cache(self, cached: t.Dict[str, t.Any]) -> None:
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with NamedTemporaryFile("wb", dir=self.cache_dir, suffix=".tmp", delete=False) as f:
+                f.write(orjson.dumps(cached))
+            os.replace(f.name, self.cache_path)
+        except OSError as e:
+            # Only costs a download on the next start
+            logger.debug("Could not cache the Airbyte registry index: %s", e)
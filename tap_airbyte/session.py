@@ -0,0 +1,104 @@
+"""Long-lived connector container that control commands are executed in"""
+
+from __future__ import annotations
+
+import logging
+import os
+import shutil
+import subprocess
+import typing as t
+from tempfile import mkdtemp
+
+import orjson
+
+# Longest sleep accepted by every sleep implementation, the container is removed way before
+KEEPALIVE_SECONDS = "2147483647"
+
+logger = logging.getLogger(__name__)
+
+
+class ContainerSession:
+    """A container of the source image kept running to `exec` Airbyte commands in.
+
+    Creating a container and importing the connector is paid once, rather than by every
+    spec, check and discover command. The container runs `sleep` in place of the image's
+    entrypoint, which is looked up and prepended to each command. A host directory,
+    created under `mount_dir` like the directories of one-off containers, is mounted at
+    `mount_dir` for the whole session, commands get their files through subdirectories of it.
+    """
+
+    def __init__(
+        self,
+        runtime: str,
+        image: str,
+        mount_dir: str,
+        docker_args: t.Optional[t.List[str]] = None,
+    ) -> None:
+        self.runtime = runtime
+        self.image = image
+        self.mount_dir = mount_dir
+        self.docker_args = docker_args or []
+        self.host_dir: t.Optional[str] = None
+        self.container_id: t.Optional[str] = None
+        self.entrypoint: t.List[str] = []
+
+    def start(self) -> "ContainerSession":
+        """Start the container, raising RuntimeError if it cannot be started."""
+        inspect = subprocess.run(
+            [self.runtime, "image", "inspect", "--format", "{{json .Config.Entrypoint}}", self.image],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        if inspect.returncode == 0:
+            self.entrypoint = orjson.loads(inspect.stdout or b"null") or []
+        if not self.entrypoint:
+            raise RuntimeError(f"Could not read the entrypoint of {self.image}: {inspect.stderr.decode()}")
+        self.host_dir = mkdtemp(prefix="tap-airbyte-session-", dir=self.mount_dir)
+        run = subprocess.run(
+            [
+                self.runtime,
+                "run",
+                "-d",
+                "--rm",
+                "-v",
+                f"{self.host_dir}:{self.mount_dir}",
+                *self.docker_args,
+                "--entrypoint",
+                "sleep",
+                self.image,
+                KEEPALIVE_SECONDS,
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        if run.returncode != 0:
+            self.close()
+            raise RuntimeError(f"Could not start a container of {self.image}: {run.stderr.decode()}")
+        self.container_id = run.stdout.decode().strip()
+        logger.info("Started container %s of %s for the session.", self.container_id[:12], self.image)
+        return self
+
+    def container_path(self, host_path: str) -> str:
+        """Get the path of a file of the session directory within the container."""
+        assert self.host_dir is not None, "Session is not started"
+        return f"{self.mount_dir}/{os.path.relpath(host_path, self.host_dir)}"
+
+    def command(self, *airbyte_cmd: str) -> t.List[str]:
+        """Get the command running an Airbyte command within the container."""
+        assert self.container_id is not None, "Session is not started"
+        return [self.runtime, "exec", "-i", self.container_id, *self.entrypoint, *airbyte_cmd]
+
+    def close(self) -> None:
+        """Remove the container and the session directory."""
+        if self.container_id is not None:
+            subprocess.run(
+                [self.runtime, "rm", "-f", self.container_id],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            logger.debug("Removed session container %s.", self.container_id[:12])
+            self.container_id = None
+        if self.host_dir is not None:
+            # Files written by the connector may belong to another user
+            shutil.rmtree(self.host_dir, ignore_errors=True)
+            self.host_dir = None
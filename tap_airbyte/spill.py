@@ -0,0 +1,153 @@
+"""Append-only segment files the stream buffers overflow into, read back memory-mapped"""
+
+from __future__ import annotations
+
+import mmap
+import shutil
+import tempfile
+import typing as t
+from pathlib import Path
+from threading import Lock
+
+import orjson
+
+from tap_airbyte.writer import default
+
+# Size a segment file grows to before the next one is started
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+
+
+class SpilledBatch(t.NamedTuple):
+    """Where a batch of records was written to, in place of the records in a buffer."""
+
+    segment: int
+    offset: int
+    length: int
+    count: int
+
+
+class SpillFile:
+    """Overflow of a stream buffer, as JSON lines in append-only segment files.
+
+    Batches are appended to the newest segment, and a new one is started once it holds
+    `segment_bytes`. Batches are read back in the order they were written, through a
+    memory map of their segment, and a segment is removed once its last batch was read.
+    The disk therefore holds what the consumer has yet to read plus at most a segment.
+    The directory of the segments is only created once the first batch spills. With
+    `max_bytes`, no more batches should be written once that many bytes await reading.
+    """
+
+    def __init__(
+        self,
+        directory: t.Optional[Path],
+        name: str,
+        max_bytes: int = 0,
+        segment_bytes: int = DEFAULT_SEGMENT_BYTES,
+    ) -> None:
+        self.parent = directory
+        self.name = name
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        # Records and bytes written and not read back yet
+        self.records = 0
+        self.bytes = 0
+        self.closed = False
+        self._directory: t.Optional[Path] = None
+        # Segment being written, 0 before the first batch
+        self._segment = 0
+        self._file: t.Optional[t.BinaryIO] = None
+        # Bytes written to every segment still on disk
+        self._written: t.Dict[int, int] = {}
+        # End of the last batch read
+        self._read: t.Tuple[int, int] = (0, 0)
+        self._map: t.Optional[mmap.mmap] = None
+        self._map_segment = 0
+        # Taken by the producer writing and the consumer reading, each on its own thread
+        self._lock = Lock()
+
+    def has_room(self) -> bool:
+        """Check if batches can still be written."""
+        return not self.closed and (not self.max_bytes or self.bytes < self.max_bytes)
+
+    def _path(self, segment: int) -> Path:
+        return self._directory / f"{segment}.jsonl"  # type: ignore[operator]
+
+    def write(self, records: t.List[t.Any]) -> SpilledBatch:
+        """Append a batch of records, getting where to read it back from."""
+        data = b"".join(
+            orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE, default=default) for record in records
+        )
+        with self._lock:
+            if self.closed:
+                raise ValueError(f"Spill file of stream '{self.name}' is closed")
+            if self._file is None or self._written[self._segment] >= self.segment_bytes:
+                self._rotate()
+            offset = self._written[self._segment]
+            # Unbuffered, so the batch can be mapped as soon as it is queued
+            self._file.write(data)  # type: ignore[union-attr]
+            self._written[self._segment] += len(data)
+            self.records += len(records)
+            self.bytes += len(data)
+            return SpilledBatch(self._segment, offset, len(data), len(records))
+
+    def _rotate(self) -> None:
+        if self._directory is None:
+            name = "".join(c if c.isalnum() else "_" for c in self.name)
+            if self.parent is not None:
+                self.parent.mkdir(parents=True, exist_ok=True)
+            self._directory = Path(tempfile.mkdtemp(prefix=f"tap-airbyte-{name}-", dir=self.parent))
+        if self._file is not None:
+            self._file.close()
+        self._segment += 1
+        self._file = open(self._path(self._segment), "wb", buffering=0)
+        self._written[self._segment] = 0
+        self._collect()
+
+    def read(self, batch: SpilledBatch) -> t.List[t.Any]:
+        """Read back a batch of records, batches must be read in the order they were written."""
+        end = batch.offset + batch.length
+        with self._lock:
+            if self.closed:
+                raise ValueError(f"Spill file of stream '{self.name}' is closed")
+            if self._map is None or self._map_segment != batch.segment or len(self._map) < end:
+                # A segment still being written is mapped again once it grew past the map
+                self._unmap()
+                with open(self._path(batch.segment), "rb") as segment:
+                    self._map = mmap.mmap(segment.fileno(), 0, access=mmap.ACCESS_READ)
+                self._map_segment = batch.segment
+            data = self._map[batch.offset:end]
+            self.records -= batch.count
+            self.bytes -= batch.length
+            self._read = (batch.segment, end)
+            self._collect()
+        return [orjson.loads(line) for line in data.splitlines()]
+
+    def _collect(self) -> None:
+        """Remove the segments that were read entirely and are not written anymore."""
+        read_segment, read_end = self._read
+        for segment, written in list(self._written.items()):
+            if segment == self._segment:
+                continue
+            if segment < read_segment or (segment == read_segment and read_end >= written):
+                if segment == self._map_segment:
+                    self._unmap()
+                self._path(segment).unlink(missing_ok=True)
+                del self._written[segment]
+
+    def _unmap(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def close(self) -> None:
+        """Remove every segment, whatever was not read back yet is dropped."""
+        with self._lock:
+            self.closed = True
+            self._unmap()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if self._directory is not None:
+                shutil.rmtree(self._directory, ignore_errors=True)
+            self._written.clear()
+            self.records = self.bytes = 0
@@ -0,0 +1,172 @@
+"""Airbyte state container keyed by stream descriptor"""
+
+from __future__ import annotations
+
+import time
+import typing as t
+
+# Key of the Airbyte per-stream state list within the Singer state
+AIRBYTE_STATE_KEY = "airbyte_state"
+
+# When to write out the merged state, see StateCheckpointer
+CHECKPOINT_EVERY_MESSAGE = "every_message"
+CHECKPOINT_INTERVAL = "interval"
+CHECKPOINT_RECORDS = "records"
+CHECKPOINT_STREAM_BOUNDARY = "stream_boundary"
+CHECKPOINT_POLICIES = (
+    CHECKPOINT_EVERY_MESSAGE,
+    CHECKPOINT_INTERVAL,
+    CHECKPOINT_RECORDS,
+    CHECKPOINT_STREAM_BOUNDARY,
+)
+DEFAULT_CHECKPOINT_INTERVAL = 60.0
+DEFAULT_CHECKPOINT_RECORDS = 10_000
+
+
+def _descriptor_key(descriptor: t.Dict[str, t.Any]) -> t.Tuple[t.Any, ...]:
+    return ("STREAM", *sorted(descriptor.items()))
+
+
+class AirbyteStateStore:
+    """Holds the state emitted by an Airbyte source, indexed for O(1) updates.
+
+    The Singer state produced by the tap keeps the legacy behavior of exposing the data
+    of the latest Airbyte STATE message at the top level, and adds the Airbyte v2 state
+    list under the `airbyte_state` key. See
+    https://docs.airbyte.com/understanding-airbyte/database-data-catalog for the shape of
+    the v2 state. Stored entries are never mutated once added, updates replace them, so
+    a snapshot only has to copy the index and not the state itself.
+    """
+
+    def __init__(self, state: t.Optional[t.Dict[str, t.Any]] = None) -> None:
+        state = state or {}
+        self._unpacked: t.Dict[str, t.Any] = {
+            key: value for key, value in state.items() if key != AIRBYTE_STATE_KEY
+        }
+        self._has_v2 = AIRBYTE_STATE_KEY in state
+        self._entries: t.Dict[t.Tuple[t.Any, ...], t.Dict[str, t.Any]] = {}
+        for index, entry in enumerate(state.get(AIRBYTE_STATE_KEY) or []):
+            if entry.get("type") == "STREAM":
+                key = _descriptor_key(entry["stream"]["stream_descriptor"])
+            elif entry.get("type") == "GLOBAL":
+                key = ("GLOBAL",)
+            else:
+                key = (entry.get("type"), index)
+            self._entries.setdefault(key, entry)
+
+    def __bool__(self) -> bool:
+        return bool(self._unpacked) or self._has_v2
+
+    def update(self, state_message: t.Dict[str, t.Any]) -> None:
+        """Merge the `state` payload of an Airbyte STATE message into the store."""
+        state_type = state_message.get("type")
+        self._has_v2 = True
+        if state_type == "STREAM":
+            stream = state_message["stream"]
+            key = _descriptor_key(stream["stream_descriptor"])
+            existing = self._entries.get(key)
+            if existing is not None:
+                # Keep the existing stream descriptor, only the stream state moves on
+                stream = {**existing["stream"], "stream_state": stream["stream_state"]}
+            self._entries[key] = {"type": "STREAM", "stream": stream}
+        elif state_type == "GLOBAL":
+            self._entries[("GLOBAL",)] = {"type": "GLOBAL", "global": state_message["global"]}
+        elif state_type == "LEGACY":
+            # One record per connector
+            self._entries.clear()
+            self._entries[("LEGACY",)] = {"type": "LEGACY", "legacy": state_message["legacy"]}
+
+        if "data" in state_message:
+            self._unpacked = state_message["data"]
+        elif state_type == "STREAM":
+            self._unpacked = state_message["stream"]
+        elif state_type == "GLOBAL":
+            self._unpacked = state_message["global"]
+        elif state_type == "LEGACY":
+            self._unpacked = state_message["legacy"]
+
+    def connector_state(self) -> t.Any:
+        """Get the state to pass to the Airbyte source via `--state`."""
+        if self._has_v2:
+            return list(self._entries.values())
+        return self._unpacked
+
+    def snapshot(self) -> t.Dict[str, t.Any]:
+        """Get the Singer state, sharing the immutable entries but none of the containers."""
+        state = dict(self._unpacked)
+        if self._has_v2:
+            state[AIRBYTE_STATE_KEY] = list(self._entries.values())
+        return state
+
+
+class StateCheckpointer:
+    """Decides when the merged state is written out, collapsing the checkpoints in between.
+
+    - every_message: every Airbyte STATE message is written out as it arrives
+    - interval: at most once per `interval` seconds
+    - records: once at least `records` records were read since the last emitted state
+    - stream_boundary: when the source moves on to checkpointing another stream, or
+      reports a stream status
+
+    Whatever the policy, the state is always written after EOF, so the latest
+    checkpoint is never lost on a successful sync.
+    """
+
+    def __init__(
+        self,
+        policy: str = CHECKPOINT_EVERY_MESSAGE,
+        interval: float = DEFAULT_CHECKPOINT_INTERVAL,
+        records: int = DEFAULT_CHECKPOINT_RECORDS,
+    ) -> None:
+        if policy not in CHECKPOINT_POLICIES:
+            raise ValueError(
+                f"Unknown state checkpoint policy {policy!r}, expected one of {CHECKPOINT_POLICIES}"
+            )
+        self.policy = policy
+        self.interval = interval
+        self.records = records
+        self.pending = False
+        self.coalesced = 0
+        self._pending_key: t.Optional[t.Tuple[t.Any, ...]] = None
+        self._records_since = 0
+        self._emitted_at = time.monotonic()
+
+    def on_state(self, state_message: t.Dict[str, t.Any]) -> bool:
+        """Register an Airbyte STATE message, returning True if the state should be emitted now."""
+        if state_message.get("type") == "STREAM":
+            key = _descriptor_key(state_message["stream"]["stream_descriptor"])
+        else:
+            key = (state_message.get("type"),)
+        boundary = self.pending and key != self._pending_key
+        if self.pending:
+            self.coalesced += 1
+        self.pending = True
+        self._pending_key = key
+        if self.policy == CHECKPOINT_EVERY_MESSAGE:
+            return True
+        if self.policy == CHECKPOINT_STREAM_BOUNDARY:
+            return boundary
+        return self._due()
+
+    def on_records(self, count: int = 1) -> bool:
+        """Register records read from the source, returning True if a pending state is due."""
+        self._records_since += count
+        return self.pending and self._due()
+
+    def on_stream_status(self) -> bool:
+        """Register a stream status trace, returning True if a pending state is due."""
+        return self.pending and self.policy == CHECKPOINT_STREAM_BOUNDARY
+
+    def emitted(self) -> None:
+        """Register that the merged state was just written out."""
+        self.pending = False
+        self._pending_key = None
+        self._records_since = 0
+        self._emitted_at = time.monotonic()
+
+    def _due(self) -> bool:
+        if self.policy == CHECKPOINT_INTERVAL:
+            return time.monotonic() - self._emitted_at >= self.interval
+        if self.policy == CHECKPOINT_RECORDS:
+            return self._records_since >= self.records
+        return False
@@ -0,0 +1,88 @@
+"""Drain of the stderr of Airbyte connector processes"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import typing as t
+from collections import deque
+from threading import Lock, Thread
+
+DEFAULT_STDERR_TAIL_BYTES = 64 * 1024
+# Connectors log progress to stderr, which is only surfaced in the error of a failed process
+DEFAULT_STDERR_LOG_LEVEL = "DEBUG"
+# Longest line read at once, longer lines are logged in pieces
+MAX_LINE_BYTES = 64 * 1024
+
+
+class StderrDrain:
+    """Reads a connector's stderr on a thread of its own, or an asyncio task, so that it never fills up.
+
+    A full stderr pipe blocks the connector's next write to it, stalling its stdout
+    as well. Every line is logged at `level` and the last `tail_bytes` of the output
+    are kept for the message of the error raised when the process fails.
+    """
+
+    def __init__(
+        self,
+        stream: t.Optional[t.IO[bytes]],
+        logger: logging.Logger,
+        level: int = logging.DEBUG,
+        tail_bytes: int = DEFAULT_STDERR_TAIL_BYTES,
+    ) -> None:
+        self.stream = stream
+        self.logger = logger
+        self.level = level
+        self.tail_bytes = tail_bytes
+        self._tail: t.Deque[bytes] = deque()
+        self._tail_size = 0
+        self._lock = Lock()
+        self._thread = Thread(target=self._run, name="airbyte-stderr", daemon=True)
+
+    def start(self) -> "StderrDrain":
+        """Start draining the stream."""
+        self._thread.start()
+        return self
+
+    def join(self, timeout: t.Optional[float] = None) -> None:
+        """Wait for the stream to reach EOF."""
+        self._thread.join(timeout)
+
+    def tail(self) -> str:
+        """Get the last bytes read from the stream."""
+        with self._lock:
+            return b"".join(self._tail).decode("utf-8", errors="replace")
+
+    async def drain_async(self, reader: asyncio.StreamReader) -> None:
+        """Drain an asyncio stream rather than the stream of a thread, until EOF."""
+        partial = b""
+        while True:
+            block = await reader.read(MAX_LINE_BYTES)
+            if not block:
+                break
+            lines = (partial + block).splitlines(keepends=True)
+            partial = lines.pop() if not lines[-1].endswith(b"\n") else b""
+            for line in lines:
+                self.feed(line)
+            if len(partial) >= MAX_LINE_BYTES:
+                self.feed(partial)
+                partial = b""
+        if partial:
+            self.feed(partial)
+
+    def feed(self, line: bytes) -> None:
+        """Log a line and keep it in the tail."""
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, line.decode("utf-8", errors="replace").rstrip())
+        if not self.tail_bytes:
+            return
+        with self._lock:
+            self._tail.append(line)
+            self._tail_size += len(line)
+            while self._tail_size > self.tail_bytes and len(self._tail) > 1:
+                self._tail_size -= len(self._tail.popleft())
+
+    def _run(self) -> None:
+        assert self.stream is not None
+        for line in iter(lambda: self.stream.readline(MAX_LINE_BYTES), b""):
+            self.feed(line)
@@ -12,78 +12,165 @@
 
 from __future__ import annotations
 
-from copy import deepcopy
-import errno
+import asyncio
+import atexit
+import io
+import logging
 import os
 import shutil
 import subprocess
 import sys
 import time
 import typing as t
-from contextlib import contextmanager
-from datetime import date, datetime
-from decimal import Decimal
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import wait as wait_futures
+from contextlib import ExitStack, closing, contextmanager
 from enum import Enum
 from functools import lru_cache
 from pathlib import Path, PurePath
-from queue import Empty, Queue
 from tempfile import TemporaryDirectory
-from threading import Lock, Thread
-from uuid import UUID
+from threading import Event, Lock, Thread
+from uuid import uuid4
 
 import click
 import orjson
-import requests
 import singer_sdk.singerlib as singer
 import virtualenv
 from singer_sdk import Stream, Tap
 from singer_sdk import typing as th
-
+from singer_sdk.helpers._batch import BaseBatchFileEncoding, SDKBatchMessage
+from singer_sdk.helpers._catalog import pop_deselected_record_properties
+from singer_sdk.helpers._typing import (
+    TypeConformanceLevel,
+    _warn_unmapped_properties,
+    conform_record_data_types,
+)
+from singer_sdk.helpers._util import utc_now
+from singer_sdk.mapper import SameRecordTransform
+
+from tap_airbyte.arrow import ARROW_FORMATS, DEFAULT_ROW_GROUP_SIZE, ArrowBatchFileWriter
+from tap_airbyte.batches import (
+    BATCH_COMPRESSIONS,
+    DEFAULT_BATCH_FILE_RECORDS,
+    BatchFileWriter,
+    SealedFile,
+    local_batch_root,
+)
+from tap_airbyte.bootstrap import PhaseTimings
+from tap_airbyte.buffers import DEFAULT_BATCH_RECORDS, MemoryBudget, StreamBuffer
+from tap_airbyte.catalog_cache import DEFAULT_CATALOG_CACHE_DIR, CatalogCache, same_catalog
+from tap_airbyte.conformers import Conformer, compile_conformer
+from tap_airbyte.mapping import BatchStreamMap
+from tap_airbyte.output import OrderedOutput
+from tap_airbyte.partition import (
+    MERGE_QUEUE_CHUNKS,
+    catalog_stream_names,
+    filter_connector_state,
+    has_per_stream_state,
+    merge_line_chunks,
+    partition_catalog,
+    uses_global_state,
+)
+from tap_airbyte.passthrough import RawRecordSplicer
+from tap_airbyte.pipeline import (
+    DECODED_MESSAGE,
+    DECODED_RECORD,
+    DEFAULT_DECODE_CHUNK_SIZE,
+    SINGER_LINES,
+    DecodePipeline,
+    StreamSpec,
+    enlarge_pipe,
+    iter_line_chunks,
+    iter_line_chunks_async,
+    open_pipe_reader,
+)
+from tap_airbyte.projection import (
+    airbyte_key_properties,
+    project_record,
+    project_schema,
+    selected_properties,
+)
+from tap_airbyte.registry import DEFAULT_REGISTRY_CACHE_TTL, DEFAULT_REGISTRY_URL, ConnectorRegistry
+from tap_airbyte.session import ContainerSession
+from tap_airbyte.spill import SpillFile
+from tap_airbyte.state import (
+    CHECKPOINT_EVERY_MESSAGE,
+    CHECKPOINT_POLICIES,
+    DEFAULT_CHECKPOINT_INTERVAL,
+    DEFAULT_CHECKPOINT_RECORDS,
+    AirbyteStateStore,
+    StateCheckpointer,
+)
+from tap_airbyte.stderr import DEFAULT_STDERR_LOG_LEVEL, DEFAULT_STDERR_TAIL_BYTES, StderrDrain
+from tap_airbyte.venv_store import DEFAULT_VENV_STORE_DIR, VenvStore
+from tap_airbyte.writer import (
+    DEFAULT_OUTPUT_BUFFER_SIZE,
+    DEFAULT_OUTPUT_FLUSH_INTERVAL,
+    BufferedSingerWriter,
+    default,
+)
 from tap_airbyte.yarn.main import run_yarn_service, wait_for_file
 
 # Sentinel value for broken pipe
 PIPE_CLOSED = object()
 
 
-def default(obj):
-    if isinstance(obj, (datetime, date)):
-        return obj.isoformat()
-    elif isinstance(obj, Decimal):
-        return float(obj)
-    elif isinstance(obj, UUID):
-        return str(obj)
-    elif isinstance(obj, bytes):
-        return obj.decode("utf-8")
-    elif isinstance(obj, Enum):
-        return obj.value
-    return str(obj)
+def _on_broken_pipe() -> None:
+    if TapAirbyte.pipe_status is not PIPE_CLOSED:
+        logging.getLogger(TapAirbyte.name).info("Received SIGPIPE, stopping sync of stream.")
+        TapAirbyte.pipe_status = PIPE_CLOSED  # type: ignore
+
+
+# All Singer messages share one buffered writer, since they share one stdout
+SINGER_OUTPUT = BufferedSingerWriter(on_broken_pipe=_on_broken_pipe)
+atexit.register(SINGER_OUTPUT.close)
 
 
 def write_message(message) -> None:
-    try:
-        sys.stdout.buffer.write(
-            orjson.dumps(message.to_dict(), option=TapAirbyte.ORJSON_OPTS, default=default)
-        )
-        sys.stdout.buffer.flush()
-    except IOError as e:
-        # Broken pipe
-        if e.errno == errno.EPIPE and TapAirbyte.pipe_status is not PIPE_CLOSED:
-            TapAirbyte.logger.info("Received SIGPIPE, stopping sync of stream.")  # type: ignore
-            TapAirbyte.pipe_status = PIPE_CLOSED  # type: ignore
-            # Prevent BrokenPipe writes to closed stdout
-            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
-        else:
-            raise
+    SINGER_OUTPUT.write_message(message)
 
 
-STDOUT_LOCK = Lock()
 singer.write_message = write_message
 
 
+# Records a stream consumer serializes before handing them to the writer thread at once
+OUTPUT_BATCH_RECORDS = 64
+
+# Root metadata key of a Singer catalog entry holding the Airbyte stream, minus its schema
+AIRBYTE_STREAM_METADATA_KEY = "airbyte-stream"
+
+# Airbyte stream statuses after which the source sends no more records for the stream
+STREAM_DONE_STATUSES = ("COMPLETE", "INCOMPLETE")
+
+# Ways sync_all can run the read processes
+SYNC_ENGINE_THREADS = "threads"
+SYNC_ENGINE_ASYNCIO = "asyncio"
+
+# Seconds to wait for the rest of stderr once a source exited, its children may hold the pipe open
+STDERR_JOIN_TIMEOUT = 5.0
+
+# Seconds the tap waits on exit for the background revalidation of a cached catalog
+CATALOG_REVALIDATE_JOIN_TIMEOUT = 300.0
+
+
 class AirbyteException(Exception):
     pass
 
 
+def airbyte_streams_from_catalog(catalog: t.Dict[str, t.Any]) -> t.Optional[t.List[t.Dict[str, t.Any]]]:
+    """Rebuild the Airbyte streams of a Singer catalog, None if any entry lacks its Airbyte stream."""
+    streams = []
+    for entry in catalog.get("streams") or []:
+        root = next(
+            (item["metadata"] for item in entry.get("metadata", []) if not item.get("breadcrumb")),
+            {},
+        )
+        if AIRBYTE_STREAM_METADATA_KEY not in root:
+            return None
+        streams.append({**root[AIRBYTE_STREAM_METADATA_KEY], "json_schema": entry["schema"]})
+    return streams or None
+
+
 class AirbyteMessage(str, Enum):
     RECORD = "RECORD"
     STATE = "STATE"
@@ -102,6 +189,9 @@ REPLICATION_METHOD_MAP = {
 }
 # We are piping to Singer targets, so this field is irrelevant
 NOOP_AIRBYTE_SYNC_MODE = "append"
+# Buffer limits applied between the Airbyte reader and the Singer streams
+DEFAULT_BUFFER_MAX_RECORDS_PER_STREAM = 10_000
+DEFAULT_BUFFER_MAX_BYTES = 256 * 1024 * 1024
 
 
 class TapAirbyte(Tap):
@@ -180,6 +270,71 @@ class TapAirbyte(Tap):
             required=False,
             description="Path to Python executable to use.",
         ),
+        th.Property(
+            "stderr_log_level",
+            th.StringType,
+            required=False,
+            default=DEFAULT_STDERR_LOG_LEVEL,
+            allowed_values=["DEBUG", "INFO", "WARNING", "ERROR"],
+            description="Level the lines a source writes to stderr during a sync are logged at. The last "
+                        "`stderr_tail_bytes` are part of the error raised when the source fails, whatever "
+                        "the level.",
+        ),
+        th.Property(
+            "stderr_tail_bytes",
+            th.IntegerType,
+            required=False,
+            default=DEFAULT_STDERR_TAIL_BYTES,
+            description="Number of bytes of a source's stderr kept for the error raised when it fails.",
+        ),
+        th.Property(
+            "sync_engine",
+            th.StringType,
+            required=False,
+            default=SYNC_ENGINE_THREADS,
+            allowed_values=[SYNC_ENGINE_THREADS, SYNC_ENGINE_ASYNCIO],
+            description="How the read processes are run. `threads` reads their output on the main thread "
+                        "with a thread per stderr. `asyncio` runs them on an event loop, with a task per "
+                        "stdout and stderr, and decodes on the loop, ignoring `decode_workers`.",
+        ),
+        th.Property(
+            "container_session",
+            th.BooleanType,
+            required=False,
+            default=False,
+            description="Start one container of the source image and run the spec, check and discover commands "
+                        "within it, instead of a new container for each. The container is removed when the tap "
+                        "exits. Syncs still run in a container of their own.",
+        ),
+        th.Property(
+            "prefetch_image",
+            th.BooleanType,
+            required=False,
+            default=True,
+            description="Pull the source image, if it is not available locally, while the registry is checked "
+                        "for a native connector. The pull is stopped if the source runs natively.",
+        ),
+        th.Property(
+            "native_venv_store",
+            th.StringType,
+            required=False,
+            description="Directory of the native connector virtual environments, keyed by source, version and "
+                        "Python interpreter. Defaults to `.venv-store` in the tap's package directory. Point it "
+                        "to a shared or persistent volume so new workers reuse existing installs.",
+        ),
+        th.Property(
+            "native_wheelhouse",
+            th.StringType,
+            required=False,
+            description="Directory of wheels pip looks in first when installing a native connector.",
+        ),
+        th.Property(
+            "native_wheelhouse_only",
+            th.BooleanType,
+            required=False,
+            default=False,
+            description="Install native connectors from `native_wheelhouse` only, without reaching PyPI.",
+        ),
         th.Property(
             "yarn_service_config",
             th.ObjectType(
@@ -227,8 +382,269 @@ class TapAirbyte(Tap):
             required=False,
             description="Set up a YARN service config for running the Airbyte container. Use only if you want to run "
                         "the Airbyte container as a YARN service.",
-        )
-
+        ),
+        th.Property(
+            "registry_url",
+            th.StringType,
+            required=False,
+            default=DEFAULT_REGISTRY_URL,
+            description="URL of the Airbyte connector registry used to check if a source can run natively, or "
+                        "the path to a local copy of it for air-gapped runners.",
+        ),
+        th.Property(
+            "registry_cache_ttl",
+            th.IntegerType,
+            required=False,
+            default=DEFAULT_REGISTRY_CACHE_TTL,
+            description="Number of seconds the index of a remote registry is used from the on-disk cache "
+                        "before it is revalidated.",
+        ),
+        th.Property(
+            "catalog_cache_ttl",
+            th.IntegerType,
+            required=False,
+            default=0,
+            description="Number of seconds a discovered Airbyte catalog is reused from the on-disk cache before "
+                        "discovery runs again. Entries are keyed by image, tag and a hash of `airbyte_config`. "
+                        "Set to 0 to disable the cache.",
+        ),
+        th.Property(
+            "catalog_cache_dir",
+            th.StringType,
+            required=False,
+            description="Directory of the catalog cache. Defaults to `.catalog-cache` in the tap's package "
+                        "directory, next to the native connector virtual environments.",
+        ),
+        th.Property(
+            "catalog_cache_revalidate",
+            th.BooleanType,
+            required=False,
+            default=False,
+            description="Use an expired cached catalog right away and run discovery in the background. The "
+                        "cache is updated for the next run if the catalog changed.",
+        ),
+        th.Property(
+            "buffer_max_records_per_stream",
+            th.IntegerType,
+            required=False,
+            default=DEFAULT_BUFFER_MAX_RECORDS_PER_STREAM,
+            description="Maximum number of records buffered for a single stream before reading from the "
+                        "Airbyte source is paused. Set to 0 to disable the limit.",
+        ),
+        th.Property(
+            "buffer_max_bytes_per_stream",
+            th.IntegerType,
+            required=False,
+            default=0,
+            description="Maximum approximate size in bytes, measured as raw Airbyte message length, of the "
+                        "records buffered for a single stream before reading from the Airbyte source is "
+                        "paused. Set to 0 to disable the limit.",
+        ),
+        th.Property(
+            "buffer_max_records",
+            th.IntegerType,
+            required=False,
+            default=0,
+            description="Maximum number of records buffered across all streams before reading from the "
+                        "Airbyte source is paused. Set to 0 to disable the limit.",
+        ),
+        th.Property(
+            "buffer_max_bytes",
+            th.IntegerType,
+            required=False,
+            default=DEFAULT_BUFFER_MAX_BYTES,
+            description="Maximum approximate size in bytes, measured as raw Airbyte message length, of the "
+                        "records buffered across all streams before reading from the Airbyte source is "
+                        "paused. Set to 0 to disable the limit.",
+        ),
+        th.Property(
+            "buffer_batch_records",
+            th.IntegerType,
+            required=False,
+            default=DEFAULT_BATCH_RECORDS,
+            description="Maximum number of records of a stream handed over to its consumer at once. Records "
+                        "are handed over as soon as everything the source wrote so far has been read, so "
+                        "batching adds no latency. Set to 1 to hand records over one at a time.",
+        ),
+        th.Property(
+            "buffer_spill_dir",
+            th.StringType,
+            required=False,
+            description="Directory the records of a stream are spilled to once its buffer is full, instead "
+                        "of pausing reads from the Airbyte source. The consumer of the stream reads them "
+                        "back in order, so a slow stream neither holds more memory nor stalls the others. "
+                        "Spilling is disabled if unset.",
+        ),
+        th.Property(
+            "buffer_spill_max_bytes_per_stream",
+            th.IntegerType,
+            required=False,
+            default=0,
+            description="Maximum number of bytes of records of a single stream spilled to disk and not read "
+                        "back yet, before reading from the Airbyte source is paused. Set to 0 to disable "
+                        "the limit.",
+        ),
+        th.Property(
+            "batch_stream_maps",
+            th.BooleanType,
+            required=False,
+            default=True,
+            description="Flatten whole batches of records of the streams without custom stream maps, "
+                        "with the flattened keys of each stream worked out once per nested property "
+                        "rather than for every record. Streams with custom stream maps are mapped one "
+                        "record at a time by the SDK either way. Disable to flatten records one at a time.",
+        ),
+        th.Property(
+            "max_concurrent_streams",
+            th.IntegerType,
+            required=False,
+            default=0,
+            description="Maximum number of Singer streams consuming records at the same time. A stream's "
+                        "consumer starts when its first record arrives and ends when the source reports the "
+                        "stream as complete. Streams waiting for a free consumer are buffered without limits. "
+                        "Set to 0 to run a consumer for every stream that has records.",
+        ),
+        th.Property(
+            "output_buffer_size",
+            th.IntegerType,
+            required=False,
+            default=DEFAULT_OUTPUT_BUFFER_SIZE,
+            description="Size in bytes of the buffer Singer messages are collected in before being written "
+                        "to stdout in a single chunk.",
+        ),
+        th.Property(
+            "output_flush_interval",
+            th.NumberType,
+            required=False,
+            default=DEFAULT_OUTPUT_FLUSH_INTERVAL,
+            description="Maximum number of seconds Singer messages may wait in the output buffer before "
+                        "being written to stdout. STATE messages are always written immediately.",
+        ),
+        th.Property(
+            "batch_config",
+            th.ObjectType(
+                th.Property(
+                    "encoding",
+                    th.ObjectType(
+                        th.Property("format", th.StringType, allowed_values=["jsonl", *ARROW_FORMATS]),
+                        th.Property("compression", th.StringType, allowed_values=list(BATCH_COMPRESSIONS)),
+                    ),
+                ),
+                th.Property(
+                    "storage",
+                    th.ObjectType(
+                        th.Property("root", th.StringType),
+                        th.Property("prefix", th.StringType),
+                    ),
+                ),
+                th.Property("batch_size", th.IntegerType),
+            ),
+            required=False,
+            description="Write the records of every selected stream into rotating files in the local "
+                        "directory `storage.root` and emit a BATCH message per file instead of RECORD "
+                        "messages. Files are JSONL, Parquet or Arrow IPC as per `encoding.format`, hold up "
+                        "to `batch_size` records and are compressed with `encoding.compression`, `gzip`, "
+                        "`zstd` or `none`.",
+        ),
+        th.Property(
+            "batch_compression_level",
+            th.IntegerType,
+            required=False,
+            description="Compression level of the batch files, 6 for gzip and 3 for zstd by default.",
+        ),
+        th.Property(
+            "batch_file_max_bytes",
+            th.IntegerType,
+            required=False,
+            default=0,
+            description="Maximum number of uncompressed bytes of records in a batch file before a new one "
+                        "is started. 0 only limits files by `batch_config.batch_size`.",
+        ),
+        th.Property(
+            "batch_row_group_size",
+            th.IntegerType,
+            required=False,
+            default=DEFAULT_ROW_GROUP_SIZE,
+            description="Number of records of a stream converted into Arrow at once and written as a row "
+                        "group of its Parquet or Arrow IPC batch file, which bounds the records held in "
+                        "memory per stream.",
+        ),
+        th.Property(
+            "project_properties",
+            th.BooleanType,
+            required=False,
+            default=True,
+            description="Limit the JSON schema of each stream in the configured Airbyte catalog to its "
+                        "selected properties, plus its primary key and cursor, whether source defined or "
+                        "set by the user, for connectors supporting column selection. Deselected "
+                        "properties the connector sends anyway are dropped as soon as the records are "
+                        "read.",
+        ),
+        th.Property(
+            "raw_record_passthrough",
+            th.BooleanType,
+            required=False,
+            default=False,
+            description="Forward the record payloads of Airbyte RECORD messages to stdout as raw bytes instead "
+                        "of decoding and re-encoding them. Applies only to streams without stream maps, "
+                        "flattening or deselected properties, and skips the SDK's type conformance.",
+        ),
+        th.Property(
+            "state_checkpoint_policy",
+            th.StringType,
+            required=False,
+            default=CHECKPOINT_EVERY_MESSAGE,
+            allowed_values=list(CHECKPOINT_POLICIES),
+            description="When to emit the merged state as a Singer STATE message. `every_message` emits one "
+                        "per Airbyte STATE message, `interval` at most once every `state_checkpoint_interval` "
+                        "seconds, `records` once `state_checkpoint_records` records were read since the last "
+                        "one, and `stream_boundary` when the source moves on to another stream. The final "
+                        "state is always emitted after the source finishes.",
+        ),
+        th.Property(
+            "state_checkpoint_interval",
+            th.NumberType,
+            required=False,
+            default=DEFAULT_CHECKPOINT_INTERVAL,
+            description="Minimum number of seconds between two STATE messages with the `interval` policy.",
+        ),
+        th.Property(
+            "state_checkpoint_records",
+            th.IntegerType,
+            required=False,
+            default=DEFAULT_CHECKPOINT_RECORDS,
+            description="Minimum number of records read between two STATE messages with the `records` policy.",
+        ),
+        th.Property(
+            "read_processes",
+            th.IntegerType,
+            required=False,
+            default=1,
+            description="Number of Airbyte read processes to split the selected streams across. Each process "
+                        "gets its own configured catalog and the per-stream state of its streams, and their "
+                        "output is merged into one Singer stream. Only for sources that keep per-stream "
+                        "state, a sync falls back to a single process if the state is global or legacy, "
+                        "or if streams are read through CDC. States that are not per stream and emitted "
+                        "by parallel processes anyway are dropped with a warning.",
+        ),
+        th.Property(
+            "decode_workers",
+            th.IntegerType,
+            required=False,
+            default=0,
+            description="Number of worker processes decoding the Airbyte output in parallel. Records of streams "
+                        "without stream maps or flattening are conformed and encoded on the workers too, and "
+                        "written out in the order they were read. 0 decodes everything on the main thread.",
+        ),
+        th.Property(
+            "decode_chunk_size",
+            th.IntegerType,
+            required=False,
+            default=DEFAULT_DECODE_CHUNK_SIZE,
+            description="Size in bytes of the blocks the Airbyte output is read in, and the maximum size of "
+                        "the chunks handed to a decode worker or merged from parallel read processes. On Linux "
+                        "the source's stdout pipe is grown to this size as well.",
+        ),
     ).to_dict()
     airbyte_mount_dir: str = os.getenv("AIRBYTE_MOUNT_DIR", "/tmp")
     pipe_status = None
@@ -240,14 +656,50 @@ class TapAirbyte(Tap):
     container_runtime = os.getenv("OCI_RUNTIME", "docker")
 
     # Airbyte -> Demultiplexer -< Singer Streams
-    singer_consumers: t.List[Thread] = []
-    buffers: t.Dict[str, Queue] = {}
+    consumers: t.Dict[str, Future] = {}
+    consumer_pool: ThreadPoolExecutor
+    buffers: t.Dict[str, StreamBuffer] = {}
+    # Selected top-level properties of the buffered streams with deselected ones
+    projections: t.Dict[str, t.FrozenSet[str]] = {}
+    buffer_budget: MemoryBudget
+    checkpoints: StateCheckpointer
+    # Streams written out by the reader loop itself, with their record counts
+    direct_streams: t.Dict[str, int] = {}
+    # Batch files of the direct streams written as BATCH messages
+    batch_writers: t.Dict[str, BatchFileWriter] = {}
+    message_writer: BufferedSingerWriter
+    # Owns stdout while syncing, every Singer message goes through it
+    output: t.Optional[OrderedOutput] = None
+    # Number of read processes the selected streams are split across
+    read_partitions: int = 1
+    # Whether a read process emitted a state that cannot be merged with the others
+    unmergeable_state: bool = False
+    # Container spec, check and discover are executed in with the session mode
+    _container_session: t.Optional[ContainerSession] = None
+    _container_session_lock = Lock()
+    _container_session_failed = False
+    # Discovery refreshing an expired cached catalog, see catalog_cache_revalidate
+    _revalidation: t.Optional[Thread] = None
+    # Entry of the source image in the Airbyte registry index, set by is_native
+    _registry_entry: t.Optional[t.Dict[str, t.Any]] = None
 
     # State container
-    airbyte_state: t.Dict[str, t.Any] = {}
+    state_store: AirbyteStateStore
 
     ORJSON_OPTS = orjson.OPT_APPEND_NEWLINE
 
+    def __init__(self, *args, message_writer: t.Optional[BufferedSingerWriter] = None, **kwargs) -> None:
+        # Replaced by load_state if the tap is given a state
+        self.state_store = AirbyteStateStore()
+        # Discovery may already run within the SDK's constructor
+        self.timings = PhaseTimings()
+        # The SDK drops unknown metadata when parsing the catalog, keep the Airbyte streams it carries
+        catalog = kwargs.get("catalog")
+        self._catalog_airbyte_streams = (
+            airbyte_streams_from_catalog(catalog) if isinstance(catalog, dict) else None
+        )
+        super().__init__(*args, message_writer=message_writer or SINGER_OUTPUT, **kwargs)
+
     def _ensure_oci(self) -> None:
         """Ensure that the OCI runtime is installed and available."""
         if self.run_on_yarn:
@@ -282,10 +734,24 @@ class TapAirbyte(Tap):
         """Check if the connector should be run on YARN."""
         return bool(self.config.get("yarn_service_config"))
 
+    @property
+    def venv_store(self) -> VenvStore:
+        """Get the store of the native connector virtual environments."""
+        return VenvStore(self.config.get("native_venv_store") or DEFAULT_VENV_STORE_DIR)
+
+    @property
+    def native_venv_key(self) -> str:
+        """Get the key of the connector's virtual environment in the store."""
+        version = self.tag
+        if version == "latest" and self._registry_entry and self._registry_entry.get("version"):
+            # A new release in the registry gets a fresh environment
+            version = self._registry_entry["version"]
+        return VenvStore.key(self.source_name, version, self.config.get("native_source_python"))
+
     @property
     def native_venv_path(self) -> Path:
         """Get the path to the virtual environment for the connector."""
-        return Path(__file__).parent.resolve() / f".venv-airbyte-{self.source_name}"
+        return self.venv_store.path(self.native_venv_key)
 
     @property
     def native_venv_bin_path(self) -> Path:
@@ -294,13 +760,15 @@ class TapAirbyte(Tap):
 
     def setup_native_connector_venv(self) -> None:
         """Creates a virtual environment and installs the source connector via PyPI"""
-        if self.native_venv_path.exists():
-            self.logger.info("Virtual environment for source already exists.")
-            return
+        path, created = self.venv_store.ensure(self.native_venv_key, self._build_native_venv)
+        if not created:
+            self.logger.info("Virtual environment for source already exists at %s.", path)
 
+    def _build_native_venv(self, path: Path) -> None:
+        """Create the virtual environment at `path`, called with the store's lock held."""
         self.logger.info(
             "Creating virtual environment at %s, using %s Python.",
-            self.native_venv_path,
+            path,
             self.config.get("native_source_python", "default")
         )
 
@@ -309,7 +777,7 @@ class TapAirbyte(Tap):
 
         if self.config.get("native_source_python"):
             args.extend(["-p", self.config["native_source_python"]])
-        args.append(str(self.native_venv_path))
+        args.append(str(path))
 
         # Run the virtualenv command
         virtualenv.cli_run(args)
@@ -319,13 +787,21 @@ class TapAirbyte(Tap):
             self._get_requirement_string()
         )
 
+        # pip's own cache, PIP_CACHE_DIR, is used as well
+        pip_args = []
+        if self.config.get("native_wheelhouse"):
+            pip_args.extend(["--find-links", self.config["native_wheelhouse"]])
+            if self.config.get("native_wheelhouse_only", False):
+                pip_args.append("--no-index")
+
         subprocess.run(
-            [self.native_venv_bin_path / "pip", "install",
+            [self.native_venv_bin_path / "pip", "install", *pip_args,
              self._get_requirement_string()],
             check=True,
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT
         )
+        self.logger.info(f"pip check results: {self._run_pip_check()}")
 
     def _run_pip_check(self) -> str:
         process = subprocess.run(
@@ -346,32 +822,94 @@ class TapAirbyte(Tap):
     @lru_cache(maxsize=None)
     def is_native(self) -> bool:
         """Check if the connector is available on PyPI and can be managed natively without Docker."""
-        is_native = False
-        if self.config.get("skip_native_check", False):
-            return is_native
+        cancel_prefetch = Event()
+        pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bootstrap")
+        # The image is fetched while the registry is consulted, in case it is needed
+        prefetch = pool.submit(self._prefetch_image, cancel_prefetch)
         try:
-            response = requests.get(
-                "https://connectors.airbyte.com/files/registries/v0/oss_registry.json",
-                timeout=5,
-            )
-            response.raise_for_status()
-            data = response.json()
-            sources = data["sources"]
-            image_name = self.config["airbyte_spec"]["image"]
-            for source in sources:
-                if source["dockerRepository"] == image_name:
-                    is_native = source.get("remoteRegistries", {}).get("pypi", {}).get("enabled")
-                    break
-        except Exception:
-            pass
+            is_native = self._lookup_native()
+            image_present = not is_native and prefetch.result()
+        finally:
+            # A native source never waits on the prefetch, which kills its command and stops
+            cancel_prefetch.set()
+            pool.shutdown(wait=False, cancel_futures=True)
         if is_native:
-            self.setup_native_connector_venv()
-            pip_result = self._run_pip_check()
-            self.logger.info(f"pip check results: {pip_result}")
-        else:
+            with self.timings.phase("venv"):
+                self.setup_native_connector_venv()
+        elif not image_present:
+            # Reports a runtime that does not work, a missing image is pulled when the source starts
             self._ensure_oci()
         return is_native
 
+    def _lookup_native(self) -> bool:
+        """Check the registry for the connector being available on PyPI."""
+        if self.config.get("skip_native_check", False):
+            return False
+        registry = ConnectorRegistry(
+            self.config.get("registry_url") or DEFAULT_REGISTRY_URL,
+            ttl=self.config.get("registry_cache_ttl", DEFAULT_REGISTRY_CACHE_TTL),
+        )
+        with self.timings.phase("registry"):
+            try:
+                self._registry_entry = registry.lookup(self.config["airbyte_spec"]["image"])
+            except Exception as e:
+                self.logger.warning(
+                    "Could not read the Airbyte registry, running the source in a container: %s", e
+                )
+                return False
+        return bool(self._registry_entry and self._registry_entry["pypi"])
+
+    def _prefetch_image(self, cancel: Event) -> bool:
+        """Check the OCI runtime and pull the image if it is not available locally yet.
+
+        Returns True if the image is available locally. Once `cancel` is set, because the
+        source runs natively, the running command is killed and no other one is started.
+        """
+        if self.run_on_yarn or not self.config.get("prefetch_image", True):
+            return False
+        runtime = self.container_runtime
+        if not shutil.which(runtime):
+            return False
+        with self.timings.phase("oci_check"):
+            version = self._run_unless_cancelled([runtime, "version"], cancel)
+        if version is None or version[0] != 0:
+            return False
+        image = f"{self.image}:{self.tag}"
+        present = self._run_unless_cancelled([runtime, "image", "inspect", image], cancel)
+        if present is None:
+            return False
+        if present[0] == 0:
+            return True
+        with self.timings.phase("image_pull"):
+            pull = self._run_unless_cancelled([runtime, "pull", image], cancel)
+        if pull is None:
+            return False
+        if pull[0] != 0:
+            self.logger.warning("Could not pull %s: %s", image, pull[1].decode(errors="replace"))
+            return False
+        return True
+
+    @staticmethod
+    def _run_unless_cancelled(
+        command: t.List[str], cancel: Event
+    ) -> t.Optional[t.Tuple[int, bytes]]:
+        """Run a command, getting its exit code and stderr, None if `cancel` was set first.
+
+        The command is killed as soon as `cancel` is set, or not started if it was already.
+        """
+        if cancel.is_set():
+            return None
+        proc = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        while True:
+            try:
+                _, stderr = proc.communicate(timeout=0.1)
+                return proc.returncode, stderr or b""
+            except subprocess.TimeoutExpired:
+                if cancel.is_set():
+                    proc.kill()
+                    proc.communicate()
+                    return None
+
     def _to_yarn_command(self, *airbyte_cmd: str, runtime_tmp_dir: str):
         """
         Run the Airbyte connector on YARN and return the command to watch the output file.
@@ -405,7 +943,7 @@ class TapAirbyte(Tap):
     @property
     def venv(self) -> Path:
         """Get the path to the virtual environment for the connector."""
-        return Path(__file__).parent.resolve() / f".venv-airbyte-{self.source_name}"
+        return self.native_venv_path
 
     @property
     def source_name(self) -> str:
@@ -417,11 +955,56 @@ class TapAirbyte(Tap):
         with TemporaryDirectory(dir=self.airbyte_mount_dir) as runtime_tmp_dir:
             subprocess.run(self.to_command("--help", runtime_tmp_dir=runtime_tmp_dir), check=True)
 
+    @property
+    def container_session(self) -> t.Optional[ContainerSession]:
+        """Get the container control commands are executed in, if the session mode is enabled."""
+        if not self.config.get("container_session", False) or self.run_on_yarn or self.is_native():
+            return None
+        with TapAirbyte._container_session_lock:
+            if self._container_session is None and not self._container_session_failed:
+                session = ContainerSession(
+                    self.container_runtime,
+                    f"{self.image}:{self.tag}",
+                    self.airbyte_mount_dir,
+                    docker_args=self.docker_mounts,
+                )
+                try:
+                    self._container_session = session.start()
+                except RuntimeError as e:
+                    self.logger.warning("Running control commands in one-off containers: %s", e)
+                    self._container_session_failed = True
+                    return None
+                atexit.register(session.close)
+        return self._container_session
+
+    @contextmanager
+    def _control_dir(self) -> t.Iterator[t.Tuple[str, str]]:
+        """Get a temporary directory for the files of a control command.
+
+        Yields its path on the host and the path the connector sees it at.
+        """
+        session = self.container_session
+        if session is not None:
+            with TemporaryDirectory(dir=session.host_dir) as host_tmpdir:
+                yield host_tmpdir, session.container_path(host_tmpdir)
+            return
+        with TemporaryDirectory(dir=self.airbyte_mount_dir) as host_tmpdir:
+            yield host_tmpdir, host_tmpdir if self.is_native() else self.airbyte_mount_dir
+
+    def _control_command(
+            self, *airbyte_cmd: str, host_tmpdir: str, docker_args: t.Optional[t.List[str]] = None
+    ) -> t.List[t.Union[str, Path]]:
+        """Construct the command of a spec, check or discover run, within the session container if any."""
+        session = self.container_session
+        if session is not None:
+            return session.command(*airbyte_cmd)
+        return self.to_command(*airbyte_cmd, runtime_tmp_dir=host_tmpdir, docker_args=docker_args)
+
     def run_spec(self) -> t.Dict[str, t.Any]:
         """Run the spec command for the Airbyte connector."""
-        with TemporaryDirectory(dir=self.airbyte_mount_dir) as runtime_tmp_dir:
+        with self._control_dir() as (host_tmpdir, _):
             proc = subprocess.run(
-                self.to_command("spec", runtime_tmp_dir=runtime_tmp_dir),
+                self._control_command("spec", host_tmpdir=host_tmpdir),
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
             )
@@ -473,12 +1056,11 @@ class TapAirbyte(Tap):
 
     def run_check(self) -> bool:
         """Run the check command for the Airbyte connector."""
-        with TemporaryDirectory(dir=self.airbyte_mount_dir) as host_tmpdir:
+        with self._control_dir() as (host_tmpdir, runtime_conf_dir):
             with open(f"{host_tmpdir}/config.json", "wb") as f:
                 f.write(orjson.dumps(self.config.get("airbyte_config", {})))
-            runtime_conf_dir = host_tmpdir if self.is_native() else self.airbyte_mount_dir
             proc = subprocess.run(
-                self.to_command(
+                self._control_command(
                     "check",
                     "--config",
                     f"{runtime_conf_dir}/config.json",
@@ -489,7 +1071,7 @@ class TapAirbyte(Tap):
                         f"{host_tmpdir}:{self.airbyte_mount_dir}",
                         *self.docker_mounts,
                     ],
-                    runtime_tmp_dir=host_tmpdir
+                    host_tmpdir=host_tmpdir
                 ),
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
@@ -533,45 +1115,79 @@ class TapAirbyte(Tap):
         return self.run_check()
 
     @contextmanager
-    def run_read(self) -> t.Iterator[subprocess.Popen]:
-        """Run the read command for the Airbyte connector."""
+    def read_command(
+        self, configured_catalog: t.Optional[t.Dict[str, t.Any]] = None
+    ) -> t.Iterator[t.List[t.Union[str, Path]]]:
+        """Write the files of a read run to a temporary directory, yielding the command using them."""
         with TemporaryDirectory(dir=self.airbyte_mount_dir) as host_tmpdir:
             with open(f"{host_tmpdir}/config.json", "wb") as config, open(f"{host_tmpdir}/catalog.json",
                                                                           "wb") as catalog:
                 config.write(orjson.dumps(self.config.get("airbyte_config", {})))
-                catalog.write(orjson.dumps(self.configured_airbyte_catalog))
-            if self.airbyte_state:
+                catalog.write(orjson.dumps(configured_catalog or self.configured_airbyte_catalog))
+            if self.state_store:
                 with open(f"{host_tmpdir}/state.json", "wb") as state:
-                    # Use the new airbyte state container if it exists.
-                    state_dict = self.airbyte_state
-                    if 'airbyte_state' in self.airbyte_state:
-                        # This is airbyte state V2
-                        state_dict = self.airbyte_state['airbyte_state']
-
+                    # Uses the airbyte state V2 list if it exists, the legacy state otherwise
+                    state_dict = self.state_store.connector_state()
+                    if configured_catalog is not None:
+                        state_dict = filter_connector_state(
+                            state_dict, catalog_stream_names(configured_catalog)
+                        )
                     self.logger.debug("Using state: %s", state_dict)
                     state.write(orjson.dumps(state_dict, default=default))
 
             runtime_conf_dir = host_tmpdir if self.is_native() else self.airbyte_mount_dir
-            proc = subprocess.Popen(
-                self.to_command(
-                    "read",
-                    "--config",
-                    f"{runtime_conf_dir}/config.json",
-                    "--catalog",
-                    f"{runtime_conf_dir}/catalog.json",
-                    *(["--state", f"{runtime_conf_dir}/state.json"] if self.airbyte_state else []),
-                    docker_args=[
-                        "--rm",
-                        "-i",
-                        "-v",
-                        f"{host_tmpdir}:{self.airbyte_mount_dir}",
-                        *self.docker_mounts,
-                    ],
-                    runtime_tmp_dir=host_tmpdir
-                ),
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
+            yield self.to_command(
+                "read",
+                "--config",
+                f"{runtime_conf_dir}/config.json",
+                "--catalog",
+                f"{runtime_conf_dir}/catalog.json",
+                *(["--state", f"{runtime_conf_dir}/state.json"] if self.state_store else []),
+                docker_args=[
+                    "--rm",
+                    "-i",
+                    "-v",
+                    f"{host_tmpdir}:{self.airbyte_mount_dir}",
+                    *self.docker_mounts,
+                ],
+                runtime_tmp_dir=host_tmpdir
+            )
+
+    def _stderr_drain(self, stream: t.Optional[t.IO[bytes]] = None) -> StderrDrain:
+        """Create the drain of the stderr of a read process."""
+        return StderrDrain(
+            stream,
+            self.logger,
+            level=logging.getLevelName(self.config.get("stderr_log_level", DEFAULT_STDERR_LOG_LEVEL).upper()),
+            tail_bytes=self.config.get("stderr_tail_bytes", DEFAULT_STDERR_TAIL_BYTES),
+        )
+
+    def _check_read_exit(self, returncode: t.Optional[int], stderr: StderrDrain) -> None:
+        """Raise if a read process ended before EOF or failed, unless the target went away."""
+        if TapAirbyte.pipe_status is PIPE_CLOSED:
+            return
+        if not self.eof_received:
+            # If EOF was not received, the process was killed and we should raise an exception
+            type_, value, _ = sys.exc_info()
+            err = type_.__name__ if type_ else "UnknownError"
+            raise AirbyteException(
+                f"Airbyte process terminated early:\n{err}: {value}\nStderr: {stderr.tail()}"
+            )
+        if returncode != 0:
+            # If EOF was received, the process should have exited with return code 0
+            raise AirbyteException(
+                f"Airbyte process failed with return code {returncode}: {stderr.tail()}"
             )
+
+    @contextmanager
+    def run_read(
+        self, configured_catalog: t.Optional[t.Dict[str, t.Any]] = None
+    ) -> t.Iterator[subprocess.Popen]:
+        """Run the read command for the Airbyte connector, limited to `configured_catalog` if given."""
+        with self.read_command(configured_catalog) as command:
+            proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            enlarge_pipe(proc.stdout, self.config.get("decode_chunk_size", DEFAULT_DECODE_CHUNK_SIZE))
+            stderr = self._stderr_drain(proc.stderr).start()
             try:
                 # Context is held until EOF or exception
                 yield proc
@@ -581,17 +1197,8 @@ class TapAirbyte(Tap):
                     self.logger.warning("Airbyte process terminated before EOF message received.")
                 self.logger.debug("Waiting for Airbyte process to terminate.")
                 returncode = proc.wait()
-                if not self.eof_received and TapAirbyte.pipe_status is not PIPE_CLOSED:
-                    # If EOF was not received, the process was killed and we should raise an exception
-                    type_, value, _ = sys.exc_info()
-                    err = type_.__name__ if type_ else "UnknownError"
-                    raise AirbyteException(f"Airbyte process terminated early:\n{err}: {value}")
-                if returncode != 0 and TapAirbyte.pipe_status is not PIPE_CLOSED:
-                    # If EOF was received, the process should have exited with return code 0
-                    raise AirbyteException(
-                        f"Airbyte process failed with return code {returncode}:"
-                        f" {proc.stderr.read() if proc.stderr else ''}"
-                    )
+                stderr.join(timeout=STDERR_JOIN_TIMEOUT)
+                self._check_read_exit(returncode, stderr)
 
     def _process_log_message(self, airbyte_message: t.Dict[str, t.Any]) -> None:
         """Process log messages from Airbyte."""
@@ -657,28 +1264,99 @@ class TapAirbyte(Tap):
     @property
     @lru_cache(maxsize=None)
     def airbyte_catalog(self) -> t.Dict[str, t.Any]:
-        """Get the Airbyte catalog."""
-        with TemporaryDirectory(dir=self.airbyte_mount_dir) as host_tmpdir:
+        """Get the Airbyte catalog, from the Singer catalog or the on-disk cache if possible."""
+        if self._catalog_airbyte_streams is not None:
+            self.logger.info("Using the Airbyte streams of the Singer catalog, skipping discovery.")
+            return {"streams": self._catalog_airbyte_streams}
+        ttl = self.config.get("catalog_cache_ttl", 0)
+        if not ttl:
+            return self.run_discover()
+        cache = CatalogCache(self.config.get("catalog_cache_dir") or DEFAULT_CATALOG_CACHE_DIR)
+        key = cache.key(self.image, self.tag, self.config.get("airbyte_config", {}))
+        cached = cache.load(key)
+        if cached is not None:
+            catalog, age = cached
+            if age < ttl:
+                self.logger.info("Using Airbyte catalog cached %d seconds ago.", age)
+                return catalog
+            if self.config.get("catalog_cache_revalidate", False):
+                self.logger.info("Using expired cached Airbyte catalog, revalidating in the background.")
+                self._start_revalidation(cache, key, catalog)
+                return catalog
+        catalog = self.run_discover()
+        cache.store(key, catalog)
+        return catalog
+
+    def _revalidate_catalog(self, cache: CatalogCache, key: str, catalog: t.Dict[str, t.Any]) -> None:
+        """Run discovery again and update the cache entry the tap is already using."""
+        try:
+            discovered = self.run_discover()
+        except Exception as e:
+            self.logger.warning("Revalidating the cached Airbyte catalog failed: %s", e)
+            return
+        if same_catalog(catalog, discovered):
+            cache.renew(key)
+        else:
+            self.logger.info("Airbyte catalog changed, the cache is updated for the next run.")
+            cache.store(key, discovered)
+
+    def _start_revalidation(self, cache: CatalogCache, key: str, catalog: t.Dict[str, t.Any]) -> None:
+        """Revalidate a cached catalog on a thread the tap waits for when exiting."""
+        # Cached but not locked, the registry lookup, image pull and OCI check could run on
+        # both threads at once if left to the revalidation
+        self.is_native()
+        # Exit handlers run last registered first, a session started by the revalidation
+        # itself would be closed before the revalidation is waited for
+        _ = self.container_session
+        self._revalidation = Thread(
+            target=self._revalidate_catalog,
+            args=(cache, key, catalog),
+            name="catalog-revalidation",
+            daemon=True,
+        )
+        self._revalidation.start()
+        atexit.register(self._join_revalidation)
+
+    def _join_revalidation(self, timeout: float = CATALOG_REVALIDATE_JOIN_TIMEOUT) -> None:
+        """Wait for the background revalidation of the cached catalog, if still running."""
+        revalidation = self._revalidation
+        if revalidation is None or not revalidation.is_alive():
+            return
+        self.logger.info(
+            "Waiting up to %d seconds for the revalidation of the cached Airbyte catalog to finish.",
+            timeout,
+        )
+        revalidation.join(timeout)
+        if revalidation.is_alive():
+            self.logger.warning(
+                "Revalidating the cached Airbyte catalog did not finish within %d seconds, giving up.",
+                timeout,
+            )
+
+    def run_discover(self) -> t.Dict[str, t.Any]:
+        """Run the discover command for the Airbyte connector."""
+        with self._control_dir() as (host_tmpdir, runtime_conf_dir):
             with open(f"{host_tmpdir}/config.json", "wb") as f:
                 f.write(orjson.dumps(self.config.get("airbyte_config", {})))
-            runtime_conf_dir = host_tmpdir if self.is_native() else self.airbyte_mount_dir
-            proc = subprocess.run(
-                self.to_command(
-                    "discover",
-                    "--config",
-                    f"{runtime_conf_dir}/config.json",
-                    docker_args=[
-                        "--rm",
-                        "-i",
-                        "-v",
-                        f"{host_tmpdir}:{self.airbyte_mount_dir}",
-                        *self.docker_mounts,
-                    ],
-                    runtime_tmp_dir=host_tmpdir
-                ),
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
+            command = self._control_command(
+                "discover",
+                "--config",
+                f"{runtime_conf_dir}/config.json",
+                docker_args=[
+                    "--rm",
+                    "-i",
+                    "-v",
+                    f"{host_tmpdir}:{self.airbyte_mount_dir}",
+                    *self.docker_mounts,
+                ],
+                host_tmpdir=host_tmpdir
             )
+            with self.timings.phase("discover"):
+                proc = subprocess.run(
+                    command,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                )
         for line in proc.stdout.decode("utf-8").splitlines():
             try:
                 message = orjson.loads(line)
@@ -698,6 +1376,23 @@ class TapAirbyte(Tap):
             f"Stderr: {proc.stderr.decode('utf-8')}"
         )
 
+    @property
+    def catalog_dict(self) -> dict:
+        """Get the Singer catalog, with the Airbyte stream stored in each stream's metadata."""
+        catalog = super().catalog_dict
+        airbyte_streams = {stream["name"]: stream for stream in self.airbyte_catalog["streams"]}
+        for entry in catalog["streams"]:
+            airbyte_stream = airbyte_streams.get(entry["tap_stream_id"])
+            if airbyte_stream is None:
+                continue
+            for metadata in entry["metadata"]:
+                if not metadata["breadcrumb"]:
+                    # The schema is already part of the entry
+                    metadata["metadata"][AIRBYTE_STREAM_METADATA_KEY] = {
+                        key: value for key, value in airbyte_stream.items() if key != "json_schema"
+                    }
+        return catalog
+
     @property
     def configured_airbyte_catalog(self) -> t.Dict[str, t.Any]:
         """Get the Airbyte catalog with only selected streams."""
@@ -717,6 +1412,15 @@ class TapAirbyte(Tap):
                     sync_mode = stream["supported_sync_modes"][0]
             except (IndexError, KeyError):
                 sync_mode = "FULL_REFRESH"
+            properties = self._projected_properties(stream["name"])
+            if properties is not None:
+                # Honoured by connectors supporting column selection, the others send every property
+                stream = {
+                    **stream,
+                    "json_schema": project_schema(
+                        stream["json_schema"], properties | airbyte_key_properties(stream)
+                    ),
+                }
             output["streams"].append(
                 {
                     "stream": stream,
@@ -726,128 +1430,574 @@ class TapAirbyte(Tap):
             )
         return output
 
+    def _projected_properties(self, stream_name: str) -> t.Optional[t.FrozenSet[str]]:
+        """Get the top-level properties selected in a stream, None if all are or projection is disabled.
+
+        The primary key and replication key of the stream, as set in the Singer catalog, are kept
+        even if deselected.
+        """
+        if not self.config.get("project_properties", True) or stream_name not in self.streams:
+            return None
+        stream = self.streams[stream_name]
+        properties = selected_properties(stream.mask)
+        if properties is None:
+            return None
+        keys = [*(stream.primary_keys or []), stream.replication_key]
+        return properties | frozenset(key for key in keys if key)
+
     def load_state(self, state: t.Dict[str, t.Any]) -> None:
         """Load the state from the Airbyte source."""
         super().load_state(state)
-        self.airbyte_state = state
+        self.state_store = AirbyteStateStore(state)
+
+    @property
+    def airbyte_state(self) -> t.Dict[str, t.Any]:
+        """Get the Singer state, legacy Airbyte state plus the v2 list under `airbyte_state`."""
+        return self.state_store.snapshot()
+
+    def _create_buffers(self) -> None:
+        """Create the bounded buffers the Airbyte reader loop fills for each selected stream."""
+        self.buffer_budget = MemoryBudget(
+            max_records=self.config.get("buffer_max_records", 0),
+            max_bytes=self.config.get("buffer_max_bytes", DEFAULT_BUFFER_MAX_BYTES),
+        )
+        self.buffers = {}
+        self.projections = {}
+        spill_dir = self.config.get("buffer_spill_dir")
+        for stream in self.streams.values():
+            if not stream.selected and not stream.has_selected_descendents:
+                continue
+            if stream.name in self.direct_streams:
+                continue
+            properties = self._projected_properties(stream.name)
+            if properties is not None:
+                self.projections[stream.name] = properties
+            self.buffers[stream.name] = StreamBuffer(
+                stream.name,
+                budget=self.buffer_budget,
+                max_records=self.config.get(
+                    "buffer_max_records_per_stream", DEFAULT_BUFFER_MAX_RECORDS_PER_STREAM
+                ),
+                max_bytes=self.config.get("buffer_max_bytes_per_stream", 0),
+                logger=self.logger,
+                batch_size=self.config.get("buffer_batch_records", DEFAULT_BATCH_RECORDS),
+                spill=SpillFile(
+                    Path(spill_dir).expanduser(),
+                    stream.name,
+                    max_bytes=self.config.get("buffer_spill_max_bytes_per_stream", 0),
+                )
+                if spill_dir
+                else None,
+            )
+
+    def write_message(self, message: singer.Message) -> None:
+        """Write a message of the tap itself, behind the output of the streams while syncing."""
+        if self.output is None:
+            super().write_message(message)
+            return
+        self.output.push_control(self.message_writer.serialize_message(message))
+
+    def _flush_buffers(self) -> None:
+        """Hand the records staged in every stream buffer over to the consumers."""
+        for stream_buffer in self.buffers.values():
+            stream_buffer.flush()
+
+    def _write_airbyte_state(self) -> None:
+        """Emit the merged Airbyte state as a Singer STATE message."""
+        # The watermarks below only count records handed over, and batch files sealed
+        self._flush_buffers()
+        self._seal_batch_files()
+        if self.output is None:
+            self.write_message(singer.StateMessage(self.airbyte_state))
+        else:
+            # Held back until every record read before this state was written out
+            watermarks = {name: buffer.accepted for name, buffer in self.buffers.items()}
+            watermarks.update(self.direct_streams)
+            self.output.push_control(
+                self.message_writer.serialize_message(singer.StateMessage(self.airbyte_state)),
+                watermarks=watermarks,
+                flush=True,
+            )
+        self.checkpoints.emitted()
+
+    def _log_backpressure(self) -> None:
+        """Log how long reading from the Airbyte source was paused by each stream buffer."""
+        for name, stream_buffer in self.buffers.items():
+            if stream_buffer.stalls:
+                self.logger.info(
+                    "Stream '%s' paused the Airbyte source %d times for %0.2f seconds in total.",
+                    name,
+                    stream_buffer.stalls,
+                    stream_buffer.stall_seconds,
+                )
+            if stream_buffer.spilled:
+                self.logger.info(
+                    "Stream '%s' spilled %d records to disk while its consumer was behind.",
+                    name,
+                    stream_buffer.spilled,
+                )
+
+    def _start_consumer(self, stream_name: str) -> None:
+        """Schedule the Singer stream draining the buffer of `stream_name` on the consumer pool."""
+        stream_buffer = self.buffers[stream_name]
+        # Queued behind busy consumers until a worker frees up, see StreamBuffer
+        stream_buffer.awaiting_consumer = True
+        self.consumers[stream_name] = self.consumer_pool.submit(self.streams[stream_name].sync)
+
+    def _finish_stream(self, stream_name: str) -> None:
+        """Signal the consumer of `stream_name` that the source is done with the stream."""
+        if stream_name in self.batch_writers:
+            self._seal_batch_files(stream_name)
+        stream_buffer = self.buffers.get(stream_name)
+        if stream_buffer is not None:
+            stream_buffer.finish()
+
+    def _join_consumers(self) -> None:
+        """Finish every buffer and wait for the consumers, starting the ones that never got a record."""
+        for name, stream_buffer in self.buffers.items():
+            stream_buffer.finish()
+            if name not in self.consumers and name in self.streams:
+                # Still emits the SCHEMA message of streams without records
+                self._start_consumer(name)
+        wait_futures(list(self.consumers.values()))
+        failed = [name for name, consumer in self.consumers.items() if consumer.exception()]
+        for name in failed:
+            self.logger.error(
+                "Sync of stream '%s' failed.", name, exc_info=self.consumers[name].exception()
+            )
+        if failed:
+            raise AirbyteException(f"Sync of streams {', '.join(failed)} failed.")
+
+    def _dispatch_record(self, stream_name: str, data: t.Dict[str, t.Any], size: int) -> None:
+        """Hand a decoded Airbyte record over to its Singer stream."""
+        if self.checkpoints.on_records():
+            self._write_airbyte_state()
+        if stream_name in self.batch_writers:
+            record = self.streams[stream_name]._conform_record(data)
+            for sealed in self.batch_writers[stream_name].write_record(record):
+                self._push_batch_message(stream_name, sealed)
+            return
+        if stream_name in self.direct_streams:
+            # The record could not be spliced, so encode it the regular way
+            self.output.push(
+                stream_name,
+                self.message_writer.serialize_message(
+                    singer.RecordMessage(stream=stream_name, record=data, time_extracted=utc_now())
+                ),
+                1,
+            )
+            self.direct_streams[stream_name] += 1
+            return
+        stream_buffer = self.buffers.get(stream_name)
+        if stream_buffer is None:
+            # Unknown or deselected stream, no Singer stream would ever consume the record
+            return
+        properties = self.projections.get(stream_name)
+        if properties is not None:
+            # Deselected properties are not held in the buffer, in case the connector sent them
+            data = project_record(data, properties)
+        if stream_name not in self.consumers:
+            self._start_consumer(stream_name)
+        # Handing a batch over blocks while the buffer is full, throttling the source through the pipe
+        if not stream_buffer.add(data, size):
+            self.logger.warning(
+                "Received a record for stream '%s' after it was reported complete, writing it"
+                " out without stream maps.",
+                stream_name,
+            )
+            self.write_message(
+                singer.RecordMessage(stream=stream_name, record=data, time_extracted=utc_now())
+            )
+
+    def _process_airbyte_message(self, airbyte_message: t.Dict[str, t.Any], size: int) -> None:
+        """Process a decoded Airbyte message."""
+        if airbyte_message["type"] == AirbyteMessage.RECORD:
+            self._dispatch_record(
+                airbyte_message["record"]["stream"], airbyte_message["record"]["data"], size
+            )
+        elif airbyte_message["type"] in (
+                AirbyteMessage.LOG,
+                AirbyteMessage.TRACE,
+        ):
+            self._process_log_message(airbyte_message)
+            if (
+                airbyte_message["type"] == AirbyteMessage.TRACE
+                and airbyte_message["trace"].get("type") == "STREAM_STATUS"
+            ):
+                stream_status = airbyte_message["trace"].get("stream_status") or {}
+                if stream_status.get("status") in STREAM_DONE_STATUSES:
+                    self._finish_stream(stream_status["stream_descriptor"]["name"])
+                if self.checkpoints.on_stream_status():
+                    self._write_airbyte_state()
+        elif airbyte_message["type"] == AirbyteMessage.STATE:
+            if self.read_partitions > 1 and airbyte_message["state"].get("type") != "STREAM":
+                # Records were already written, so the sync goes on without checkpointing the state
+                if not self.unmergeable_state:
+                    self.logger.warning(
+                        "Airbyte source emitted a %s state, which cannot be merged across "
+                        "parallel read processes. States that are not per stream are dropped for "
+                        "the rest of this sync, so the next one reads their streams again. Set "
+                        "read_processes to 1.",
+                        airbyte_message["state"].get("type"),
+                    )
+                    self.unmergeable_state = True
+                return
+            self.state_store.update(airbyte_message["state"])
+            if self.checkpoints.on_state(airbyte_message["state"]):
+                self._write_airbyte_state()
+        else:
+            self.logger.warning("Unhandled message: %s", airbyte_message)
+
+    def _write_direct_records(self, stream_name: str, lines: bytes, count: int) -> None:
+        """Write Singer RECORD lines produced by the reader for a stream without a consumer."""
+        if stream_name in self.batch_writers:
+            # Lines of record data rather than RECORD messages, see StreamSpec.payload
+            self._write_batch_lines(stream_name, lines, count)
+        else:
+            self.output.push(stream_name, lines, count)
+            self.direct_streams[stream_name] += count
+        if self.checkpoints.on_records(count):
+            self._write_airbyte_state()
+
+    def _write_batch_lines(self, stream_name: str, lines: bytes, count: int) -> None:
+        """Write JSON lines of records into the batch files of a stream."""
+        for sealed in self.batch_writers[stream_name].write(lines, count):
+            self._push_batch_message(stream_name, sealed)
+
+    def _push_batch_message(self, stream_name: str, sealed: SealedFile) -> None:
+        """Write the BATCH message of a sealed file, which completes the records in it."""
+        message = SDKBatchMessage(
+            stream=stream_name,
+            encoding=BaseBatchFileEncoding(**self.batch_writers[stream_name].encoding),
+            manifest=[sealed.url],
+        )
+        self.output.push(stream_name, self.message_writer.serialize_message(message), sealed.records)
+        self.direct_streams[stream_name] += sealed.records
+
+    def _seal_batch_files(self, *stream_names: str) -> None:
+        """Seal the open batch files of the given streams, or of every stream."""
+        for name in stream_names or list(self.batch_writers):
+            sealed = self.batch_writers[name].seal()
+            if sealed is not None:
+                self._push_batch_message(name, sealed)
+
+    def _create_batch_writers(self) -> None:
+        """Create the batch file writers of the selected streams, if BATCH messages are configured."""
+        self.batch_writers = {}
+        batch_config = self.config.get("batch_config")
+        if not batch_config:
+            return
+        encoding = batch_config.get("encoding") or {}
+        storage = batch_config.get("storage") or {}
+        file_format = encoding.get("format") or "jsonl"
+        if file_format != "jsonl" and file_format not in ARROW_FORMATS:
+            raise AirbyteException(f"Unsupported batch file format: {file_format}")
+        try:
+            directory = local_batch_root(storage.get("root") or ".")
+        except ValueError as e:
+            raise AirbyteException(str(e)) from e
+        sync_id = uuid4().hex
+        for stream in self.streams.values():
+            if not stream.selected:
+                continue
+            options = dict(
+                prefix=storage.get("prefix") or f"{self.name}--",
+                # Arrow IPC files cannot be gzipped
+                compression=encoding.get("compression") or ("zstd" if file_format == "arrow" else "gzip"),
+                level=self.config.get("batch_compression_level"),
+                max_records=batch_config.get("batch_size") or DEFAULT_BATCH_FILE_RECORDS,
+                max_bytes=self.config.get("batch_file_max_bytes", 0),
+                sync_id=sync_id,
+            )
+            if file_format == "jsonl":
+                self.batch_writers[stream.name] = BatchFileWriter(directory, stream.name, **options)
+                continue
+            # Conformed records only hold the selected properties
+            properties = selected_properties(stream.mask)
+            schema = stream.schema if properties is None else project_schema(stream.schema, properties)
+            try:
+                self.batch_writers[stream.name] = ArrowBatchFileWriter(
+                    directory,
+                    stream.name,
+                    schema,
+                    format=file_format,
+                    row_group_size=self.config.get("batch_row_group_size", DEFAULT_ROW_GROUP_SIZE),
+                    **options,
+                )
+            except (RuntimeError, ValueError) as e:
+                raise AirbyteException(str(e)) from e
+        if self.batch_writers:
+            self.logger.info("Writing records into batch files in %s.", directory)
+
+    def _process_airbyte_line(self, message: bytes, splicer: RawRecordSplicer) -> None:
+        """Process a line of output of the read process."""
+        # Records of batch files are decoded, every direct stream is a batch stream then
+        if self.direct_streams and not self.batch_writers:
+            spliced = splicer.splice(message)
+            if spliced is not None and spliced[0] in self.direct_streams:
+                self._write_direct_records(spliced[0], spliced[1], 1)
+                return
+        try:
+            airbyte_message = orjson.loads(message)
+        except orjson.JSONDecodeError:
+            if message.strip():
+                self.logger.warning("Could not parse message: %s", message)
+            return
+        self._process_airbyte_message(airbyte_message, len(message))
+
+    def _process_airbyte_chunk(self, chunk: bytes, splicer: RawRecordSplicer) -> bool:
+        """Process a chunk of Airbyte message lines, returning False if the target went away."""
+        # Iterating a BytesIO splits lines lazily, without building a list of them first
+        for message in io.BytesIO(chunk):
+            if TapAirbyte.pipe_status is PIPE_CLOSED:
+                return False
+            self._process_airbyte_line(message, splicer)
+        # The next read may wait on the source, the consumers get what was read so far
+        self._flush_buffers()
+        return True
+
+    def _read_airbyte_chunks(self, chunks: t.Iterator[bytes]) -> None:
+        """Read and process chunks of Airbyte message lines, one line at a time."""
+        splicer = RawRecordSplicer()
+        for chunk in chunks:
+            if not self._process_airbyte_chunk(chunk, splicer):
+                return
+        self.eof_received = True
+
+    async def _read_airbyte_async(self, partitions: t.List[t.Dict[str, t.Any]], chunk_size: int) -> None:
+        """Run the read processes and process their Airbyte messages on an event loop.
+
+        Every process gets a task reading its stdout and one draining its stderr. Chunks
+        of lines reach this coroutine through a bounded queue, so a full queue stops the
+        reads and throttles the sources. Buffers do not block here, the space they need
+        is awaited between chunks instead, which keeps the loop running meanwhile.
+        """
+        for stream_buffer in self.buffers.values():
+            stream_buffer.blocking = False
+        chunks: asyncio.Queue = asyncio.Queue(maxsize=MERGE_QUEUE_CHUNKS * len(partitions))
+        procs: t.List[asyncio.subprocess.Process] = []
+        stderrs: t.List[StderrDrain] = []
+        drains: t.List[asyncio.Task] = []
+        readers: t.List[asyncio.Task] = []
+        with ExitStack() as read_commands:
+            try:
+                for catalog in partitions:
+                    command = read_commands.enter_context(
+                        self.read_command(catalog if len(partitions) > 1 else None)
+                    )
+                    # A pipe of our own, asyncio does not expose the one it creates to grow it
+                    stdout, stdout_fd = await open_pipe_reader(chunk_size)
+                    try:
+                        proc = await asyncio.create_subprocess_exec(
+                            *command, stdout=stdout_fd, stderr=asyncio.subprocess.PIPE
+                        )
+                    finally:
+                        # Held by the source alone, so its exit ends the stream
+                        os.close(stdout_fd)
+                    procs.append(proc)
+                    stderrs.append(self._stderr_drain())
+                    drains.append(asyncio.create_task(stderrs[-1].drain_async(proc.stderr)))
+                    readers.append(asyncio.create_task(self._enqueue_chunks(stdout, chunks, chunk_size)))
+                splicer = RawRecordSplicer()
+                running = len(readers)
+                while running:
+                    chunk = await chunks.get()
+                    if chunk is None:
+                        running -= 1
+                        continue
+                    if isinstance(chunk, BaseException):
+                        raise chunk
+                    if not self._process_airbyte_chunk(chunk, splicer):
+                        return
+                    with self.buffer_budget.space:
+                        full = any(stream_buffer.full() for stream_buffer in self.buffers.values())
+                    if full:
+                        await asyncio.to_thread(self.buffer_budget.wait_for_space, self.buffers.values())
+                self.eof_received = True
+            finally:
+                for reader in readers:
+                    reader.cancel()
+                if not self.eof_received:
+                    for proc in procs:
+                        if proc.returncode is None:
+                            proc.kill()
+                    self.logger.warning("Airbyte process terminated before EOF message received.")
+                self.logger.debug("Waiting for Airbyte process to terminate.")
+                returncodes = [await proc.wait() for proc in procs]
+                if drains:
+                    await asyncio.wait(drains, timeout=STDERR_JOIN_TIMEOUT)
+                for returncode, stderr in zip(returncodes, stderrs):
+                    self._check_read_exit(returncode, stderr)
+
+    @staticmethod
+    async def _enqueue_chunks(stdout: asyncio.StreamReader, chunks: asyncio.Queue, chunk_size: int) -> None:
+        """Read the stdout of a read process into the queue of chunks, ending with None."""
+        try:
+            async for chunk in iter_line_chunks_async(stdout, chunk_size):
+                await chunks.put(chunk)
+        except Exception as e:  # handed over to the dispatching coroutine
+            await chunks.put(e)
+        await chunks.put(None)
+
+    def _read_airbyte_messages_pipelined(self, chunks: t.Iterator[bytes], workers: int) -> None:
+        """Read the Airbyte messages of the read processes, decoding them on worker processes."""
+        specs = {
+            name: StreamSpec(
+                schema=self.streams[name].schema,
+                mask=None if all(self.streams[name].mask.values()) else dict(self.streams[name].mask),
+                raw=self.streams[name].raw_passthrough,
+                payload=name in self.batch_writers,
+            )
+            for name in self.direct_streams
+        }
+        with DecodePipeline(
+            specs,
+            workers=workers,
+            chunk_size=self.config.get("decode_chunk_size", DEFAULT_DECODE_CHUNK_SIZE),
+            option=self.ORJSON_OPTS,
+        ) as pipeline:
+            for items in pipeline.decode_chunk_items(chunks):
+                for item in items:
+                    if TapAirbyte.pipe_status is PIPE_CLOSED:
+                        return
+                    if item[0] == SINGER_LINES:
+                        self._write_direct_records(item[1], item[2], item[3])
+                    elif item[0] == DECODED_RECORD:
+                        self._dispatch_record(item[1], item[2], item[3])
+                    elif item[0] == DECODED_MESSAGE:
+                        self._process_airbyte_message(item[1], item[2])
+                    else:
+                        self.logger.warning("Could not parse message: %s", item[1])
+                self._flush_buffers()
+        self.eof_received = True
+
+    def _read_airbyte_threaded(
+        self, partitions: t.List[t.Dict[str, t.Any]], workers: int, chunk_size: int
+    ) -> None:
+        """Run the read processes and process their Airbyte messages on this thread."""
+        with ExitStack() as airbyte_jobs:
+            if len(partitions) > 1:
+                jobs = [airbyte_jobs.enter_context(self.run_read(catalog)) for catalog in partitions]
+            else:
+                jobs = [airbyte_jobs.enter_context(self.run_read())]
+            # Main processor loop
+            if any(airbyte_job.stdout is None for airbyte_job in jobs):
+                raise AirbyteException("Could not start Airbyte process.")
+            if len(jobs) > 1:
+                chunks = merge_line_chunks([airbyte_job.stdout for airbyte_job in jobs], chunk_size)
+            else:
+                chunks = iter_line_chunks(jobs[0].stdout, chunk_size)
+            if workers:
+                self._read_airbyte_messages_pipelined(chunks, workers)
+            else:
+                self._read_airbyte_chunks(chunks)
+
+    def _partition_read(self) -> t.List[t.Dict[str, t.Any]]:
+        """Split the configured catalog across the read processes."""
+        processes = self.config.get("read_processes", 1)
+        if processes <= 1:
+            return [self.configured_airbyte_catalog]
+        if self.state_store and not has_per_stream_state(self.state_store.connector_state()):
+            self.logger.warning(
+                "The state of the Airbyte source is not per stream, reading with a single process."
+            )
+            return [self.configured_airbyte_catalog]
+        if uses_global_state(self.airbyte_catalog):
+            self.logger.warning(
+                "The Airbyte source reads streams through CDC with a global state, reading with a "
+                "single process."
+            )
+            return [self.configured_airbyte_catalog]
+        partitions = partition_catalog(self.configured_airbyte_catalog, processes)
+        self.logger.info(
+            "Reading %d streams with %d Airbyte processes.",
+            len(self.configured_airbyte_catalog["streams"]),
+            len(partitions),
+        )
+        return partitions
 
     def sync_all(self) -> None:
         """Sync all streams from the Airbyte source."""
         stream: Stream
         self.eof_received = False
+        self.message_writer.configure(
+            buffer_size=self.config.get("output_buffer_size", DEFAULT_OUTPUT_BUFFER_SIZE),
+            flush_interval=self.config.get("output_flush_interval", DEFAULT_OUTPUT_FLUSH_INTERVAL),
+            option=self.ORJSON_OPTS,
+        )
+        engine = self.config.get("sync_engine", SYNC_ENGINE_THREADS)
+        workers = self.config.get("decode_workers", 0)
+        if engine == SYNC_ENGINE_ASYNCIO and workers:
+            self.logger.warning("The asyncio sync engine decodes on the event loop, ignoring decode_workers.")
+            workers = 0
+        self._create_batch_writers()
+        # Streams whose records skip the Singer streams and are written out by the reader
+        self.direct_streams = {
+            stream.name: 0
+            for stream in self.streams.values()
+            if stream.name in self.batch_writers
+            or stream.raw_passthrough
+            or (workers and stream.can_bypass_consumer)
+        }
+        self._create_buffers()
+        self.checkpoints = StateCheckpointer(
+            policy=self.config.get("state_checkpoint_policy", CHECKPOINT_EVERY_MESSAGE),
+            interval=self.config.get("state_checkpoint_interval", DEFAULT_CHECKPOINT_INTERVAL),
+            records=self.config.get("state_checkpoint_records", DEFAULT_CHECKPOINT_RECORDS),
+        )
+        # The only thread writing to stdout until the sync is over
+        self.output = OrderedOutput(self.message_writer).start()
         for stream in self.streams.values():
             if not stream.selected and not stream.has_selected_descendents:
                 self.logger.info(f"Skipping deselected stream '{stream.name}'.")
-                continue
-            consumer = Thread(target=stream.sync, daemon=True)
-            consumer.start()
-            self.singer_consumers.append(consumer)
+            elif stream.name in self.direct_streams:
+                self.logger.info(f"Writing records of stream '{stream.name}' directly from the reader.")
+                stream._write_schema_message()
+        # Consumers are started by the reader as the first record of each stream arrives
+        self.consumers = {}
+        self.consumer_pool = ThreadPoolExecutor(
+            max_workers=self.config.get("max_concurrent_streams", 0) or max(len(self.buffers), 1),
+            thread_name_prefix="singer-consumer",
+        )
+        self.logger.info("Startup phases: %s", self.timings.summary())
+        partitions = self._partition_read()
+        self.read_partitions = len(partitions)
+        chunk_size = self.config.get("decode_chunk_size", DEFAULT_DECODE_CHUNK_SIZE)
         t1 = time.perf_counter()
-        with self.run_read() as airbyte_job:
-            # Main processor loop
-            if airbyte_job.stdout is None:
-                raise AirbyteException("Could not start Airbyte process.")
-            while TapAirbyte.pipe_status is not PIPE_CLOSED:
-                message = airbyte_job.stdout.readline()
-                if not message and airbyte_job.poll() is not None:
-                    self.eof_received = True
-                    break
-                try:
-                    airbyte_message = orjson.loads(message)
-                except orjson.JSONDecodeError:
-                    if message:
-                        self.logger.warning("Could not parse message: %s", message)
-                    continue
-                if airbyte_message["type"] == AirbyteMessage.RECORD:
-                    stream_buffer: Queue = self.buffers.setdefault(
-                        airbyte_message["record"]["stream"],
-                        Queue(),
-                    )
-                    stream_buffer.put_nowait(airbyte_message["record"]["data"])
-                elif airbyte_message["type"] in (
-                        AirbyteMessage.LOG,
-                        AirbyteMessage.TRACE,
-                ):
-                    self._process_log_message(airbyte_message)
-                elif airbyte_message["type"] == AirbyteMessage.STATE:
-                    # See: https://docs.airbyte.com/understanding-airbyte/database-data-catalog
-                    # for how this state should be handled.
-                    state_message = deepcopy(airbyte_message["state"])
-                    state_type = state_message["type"]
-
-                    if "airbyte_state" not in self.airbyte_state:
-                        self.airbyte_state["airbyte_state"] = []
-
-                    # The airbyte_state_v2 here should adhere to the link above.
-                    existing_airbyte_state_v2: list[dict] = deepcopy(self.airbyte_state["airbyte_state"])
-                    if state_type == "STREAM":
-                        stream_descriptor = state_message["stream"]["stream_descriptor"]
-                        stream_state = state_message["stream"]["stream_state"]
-
-                        # Update the state for this stream descriptor or add it to the list.
-                        found = False
-                        for existing_state in existing_airbyte_state_v2:
-                            if existing_state["type"] == "STREAM" and existing_state["stream"]["stream_descriptor"] == stream_descriptor:
-                                existing_state["stream"]["stream_state"] = stream_state
-                                found = True
-                                break
-                        if not found:
-                            existing_airbyte_state_v2.append({
-                                "type": "STREAM",
-                                "stream": state_message["stream"]
-                            })
-                    elif state_type == "GLOBAL":
-                        # Update the global state.
-                        found = False
-                        for existing_state in existing_airbyte_state_v2:
-                            if existing_state["type"] == "GLOBAL":
-                                existing_state["global"] = state_message["global"]
-                                found = True
-                                break
-                        if not found:
-                            existing_airbyte_state_v2.append({
-                                "type": "GLOBAL",
-                                "global": state_message["global"]
-                            })
-                    elif state_type == "LEGACY":
-                        # One record per connector.
-                        existing_airbyte_state_v2.clear()
-                        existing_airbyte_state_v2.append(
-                            {
-                                "type": "LEGACY",
-                                "legacy": state_message["legacy"]
-                            }
-                        )
-
-                    if "data" in state_message:
-                        unpacked_state = state_message["data"]
-                    elif state_type == "STREAM":
-                        unpacked_state = state_message["stream"]
-                    elif state_type == "GLOBAL":
-                        unpacked_state = state_message["global"]
-                    elif state_type == "LEGACY":
-                        unpacked_state = state_message["legacy"]
-
-                    # Keep the legacy state behavior, but append the new state under a new key.
-                    # Deepcopy here since existing_airbyte_state_v2 can reference the same object.
-                    self.airbyte_state = deepcopy(unpacked_state)
-                    self.airbyte_state['airbyte_state'] = existing_airbyte_state_v2
-
-                    with STDOUT_LOCK:
-                        singer.write_message(singer.StateMessage(self.airbyte_state))
-                else:
-                    self.logger.warning("Unhandled message: %s", airbyte_message)
-        # Daemon threads will be terminated when the main thread exits,
-        # so we do not need to wait on them to join after SIGPIPE
-        if TapAirbyte.pipe_status is not PIPE_CLOSED:
-            self.logger.info("Waiting for sync threads to finish...")
-            for sync in self.singer_consumers:
-                sync.join()
-            # Write final state if EOF was received from Airbyte
-            if self.eof_received:
-                with STDOUT_LOCK:
-                    singer.write_message(singer.StateMessage(self.airbyte_state))
+        try:
+            if engine == SYNC_ENGINE_ASYNCIO:
+                asyncio.run(self._read_airbyte_async(partitions, chunk_size))
+            else:
+                self._read_airbyte_threaded(partitions, workers, chunk_size)
+            # There is nobody left to write to after SIGPIPE, so the consumers are not waited on
+            if TapAirbyte.pipe_status is not PIPE_CLOSED:
+                self._seal_batch_files()
+                self.logger.info("Waiting for sync threads to finish...")
+                self._join_consumers()
+                # Write final state if EOF was received from Airbyte
+                if self.eof_received:
+                    self._write_airbyte_state()
+                self.output.close()
+        finally:
+            # Releases any consumer still blocked on its buffer
+            for stream_buffer in self.buffers.values():
+                stream_buffer.close()
+            self.consumer_pool.shutdown(wait=False, cancel_futures=True)
+            # Whatever is left can no longer be delivered in order
+            self.output.close(discard=True)
+            self.output = None
+            for batch_writer in self.batch_writers.values():
+                batch_writer.abort()
+        self.message_writer.flush()
         t2 = time.perf_counter()
+        for name, count in self.direct_streams.items():
+            self.logger.info("Wrote %d records of stream '%s' directly from the reader.", count, name)
+        if self.checkpoints.coalesced:
+            self.logger.info(
+                "Coalesced %d Airbyte state messages into later checkpoints.",
+                self.checkpoints.coalesced,
+            )
+        self._log_backpressure()
         for stream in self.streams.values():
             stream.log_sync_costs()
         self.logger.info(f"Synced {len(self.streams)} streams in {t2 - t1:0.2f} seconds.")
@@ -902,52 +2052,206 @@ class AirbyteStream(Stream):
     def __init__(self, tap: TapAirbyte, schema: dict, name: str) -> None:
         super().__init__(tap, schema, name)
         self.parent = tap
-        self._buffer: t.Optional[Queue] = None
+        # Serialized messages of the records processed since the last push to the output
+        self._pending_output: t.List[bytes] = []
+        self._pending_records = 0
+        self._conformer: t.Optional[Conformer] = None
+        self._conformer_compiled = False
+        self._all_selected: t.Optional[bool] = None
+        self._batch_maps: t.Optional[t.List[BatchStreamMap]] = None
+        # Conformed records of the current batch, for the batch stream maps
+        self._map_batch: t.List[dict] = []
+
+    @property
+    def conformer(self) -> t.Optional[Conformer]:
+        """Get the record conformer compiled for the stream's schema, None to use the SDK's."""
+        if not self._conformer_compiled:
+            if self.TYPE_CONFORMANCE_LEVEL == TypeConformanceLevel.RECURSIVE:
+                self._conformer = compile_conformer(self.effective_schema)
+                if self._conformer is None:
+                    self.logger.debug("Conforming %s records with the generic conformer", self.name)
+            self._conformer_compiled = True
+        return self._conformer
+
+    def _conform_record(self, record: dict) -> dict:
+        """Conform a record to the stream's schema, with the compiled conformer if there is one."""
+        conform = self.conformer
+        if conform is None:
+            pop_deselected_record_properties(record, self.schema, self.mask)
+            return conform_record_data_types(
+                stream_name=self.name,
+                record=record,
+                schema=self.effective_schema,
+                level=self.TYPE_CONFORMANCE_LEVEL,
+                logger=self.logger,
+            )
+        if self._all_selected is None:
+            self._all_selected = all(self.mask.values())
+        if not self._all_selected:
+            pop_deselected_record_properties(record, self.schema, self.mask)
+        record, unmapped = conform(record)
+        if unmapped:
+            _warn_unmapped_properties(self.name, tuple(unmapped), self.logger)
+        return record
+
+    def _generate_record_messages(self, record: dict) -> t.Generator[singer.RecordMessage, None, None]:
+        """Write out the RECORD messages of a record, conformed by the stream's compiled conformer."""
+        record = self._conform_record(record)
+        for stream_map in self.stream_maps:
+            mapped_record = stream_map.transform(record)
+            # Emit record if not filtered
+            if mapped_record is not None:
+                yield singer.RecordMessage(
+                    stream=stream_map.stream_alias,
+                    record=mapped_record,
+                    version=self._stream_version,
+                    time_extracted=utc_now(),
+                )
+
+    @property
+    def batch_maps(self) -> t.Optional[t.List[BatchStreamMap]]:
+        """Get the stream maps applied to whole batches of records, None to map records one by one.
+
+        Only worth it for a stream with a map flattening the records it passes through as they are.
+        """
+        if self._batch_maps is None:
+            if not self.config.get("batch_stream_maps", True) or not any(
+                type(stream_map) is SameRecordTransform and stream_map.flattening_enabled
+                for stream_map in self.stream_maps
+            ):
+                self._batch_maps = []
+            else:
+                self._batch_maps = [BatchStreamMap(stream_map) for stream_map in self.stream_maps]
+        return self._batch_maps or None
+
+    def _map_pending(self) -> None:
+        """Write out the RECORD messages of the records waiting for their batch to be mapped."""
+        if not self._map_batch:
+            return
+        records, self._map_batch = self._map_batch, []
+        mapped = [
+            (batch_map.stream_alias, batch_map.transform_batch(records))
+            for batch_map in self.batch_maps or []
+        ]
+        time_extracted = utc_now()
+        # In the order the SDK writes them, every map of a record before the next record
+        messages = (
+            singer.RecordMessage(
+                stream=stream_alias,
+                record=mapped_records[index],
+                version=self._stream_version,
+                time_extracted=time_extracted,
+            )
+            for index in range(len(records))
+            for stream_alias, mapped_records in mapped
+            if mapped_records[index] is not None
+        )
+        if self.parent.output is None:
+            for record_message in messages:
+                self._tap.write_message(record_message)
+            return
+        serialize = self.parent.message_writer.serialize_message
+        self._pending_output.extend(serialize(record_message) for record_message in messages)
+
+    def _write_message(self, message: singer.Message) -> None:
+        """Write a message of the stream onto its lane of the ordered output."""
+        self._map_pending()
+        if self.parent.output is None:
+            self._tap.write_message(message)
+            return
+        self._pending_output.append(self.parent.message_writer.serialize_message(message))
+        self._push_output()
+
+    def _push_output(self) -> None:
+        """Hand the pending output over to the writer thread, with the records it completes."""
+        self._map_pending()
+        if self._pending_output or self._pending_records:
+            self.parent.output.push(self.name, b"".join(self._pending_output), self._pending_records)
+            self._pending_output.clear()
+            self._pending_records = 0
 
     def _write_record_message(self, record: dict) -> None:
+        if self.batch_maps is not None:
+            # Mapped once the batch the record came in is done
+            self._map_batch.append(self._conform_record(record))
+            return
+        if self.parent.output is None:
+            for record_message in self._generate_record_messages(record):
+                self._tap.write_message(record_message)
+            return
+        serialize = self.parent.message_writer.serialize_message
         for record_message in self._generate_record_messages(record):
-            with STDOUT_LOCK:
-                singer.write_message(record_message)
+            self._pending_output.append(serialize(record_message))
+
+    def _write_schema_message(self) -> None:
+        for schema_message in self._generate_schema_messages():
+            self._write_message(schema_message)
+
+    def _write_activate_version_message(self, full_table_version: int) -> None:
+        self._write_message(
+            singer.ActivateVersionMessage(stream=self.name, version=full_table_version)
+        )
 
     def _write_state_message(self) -> None:
         pass
 
+    @property
+    def raw_passthrough(self) -> bool:
+        """Check if raw Airbyte record payloads can be written out for this stream as is."""
+        if not self.config.get("raw_record_passthrough", False) or not self.can_bypass_consumer:
+            return False
+        if self.config.get("batch_config"):
+            # Records go into batch files instead
+            return False
+        # Deselected properties would have to be removed from every record
+        return all(self.mask.values())
+
+    @property
+    def can_bypass_consumer(self) -> bool:
+        """Check if the reader can write this stream's records without going through the SDK."""
+        if not self.selected or len(self.stream_maps) != 1:
+            return False
+        stream_map = self.stream_maps[0]
+        if type(stream_map) is not SameRecordTransform or stream_map.flattening_enabled:
+            return False
+        if stream_map.stream_alias != self.name:
+            return False
+        return not (self.replication_method == "FULL_TABLE" and self.emit_activate_version_messages)
+
     def _increment_stream_state(self, *args, **kwargs) -> None:
         pass
 
     @property
-    def buffer(self) -> Queue:
-        """Get the buffer for the stream."""
-        if not self._buffer:
-            while self.name not in self.parent.buffers:
-                if self.parent.eof_received:
-                    # EOF received, no records for this stream
-                    self._buffer = Queue()
-                    break
-                self.logger.debug(f"Waiting for records from Airbyte for stream {self.name}...")
-                time.sleep(1)
-            else:
-                self._buffer = self.parent.buffers[self.name]
-        return self._buffer
+    def buffer(self) -> StreamBuffer:
+        """Get the buffer the Airbyte reader loop fills for the stream."""
+        stream_buffer = self.parent.buffers.get(self.name)
+        if stream_buffer is None:
+            # Not fed by the reader loop, there is nothing to sync
+            stream_buffer = StreamBuffer(self.name)
+            stream_buffer.finish()
+        return stream_buffer
 
     def get_records(self, context: t.Optional[dict]) -> t.Iterable[dict]:
         """Get records from the stream."""
-        while (
-                self.parent.eof_received is False or not self.buffer.empty()
-        ) and TapAirbyte.pipe_status is not PIPE_CLOSED:
-            try:
-                # The timeout permits the consumer to re-check the producer is alive
-                yield self.buffer.get(timeout=1.0)
-            except Empty:
-                continue
-            self.buffer.task_done()
-        if self.name in self.parent.buffers:
-            while not self.buffer.empty() and TapAirbyte.pipe_status is not PIPE_CLOSED:
-                try:
-                    yield self.buffer.get(timeout=1.0)
-                except Empty:
-                    break
-                self.buffer.task_done()
+        stream_buffer = self.buffer
+        try:
+            # Ends once the reader finishes the buffer, or closes it after SIGPIPE
+            with closing(stream_buffer.drain_batches()) as batches:
+                for batch in batches:
+                    for record in batch:
+                        yield record
+                        # The SDK is done with the record once it asks for the next one
+                        self._pending_records += 1
+                        if len(self._pending_output) >= OUTPUT_BATCH_RECORDS:
+                            self._push_output()
+                    self._map_pending()
+                    if stream_buffer.empty():
+                        self._push_output()
+            if self.parent.output is not None:
+                self._push_output()
+        finally:
+            # Never leave the reader loop blocked on a buffer nobody drains anymore
+            stream_buffer.close()
 
 
 if __name__ == "__main__":
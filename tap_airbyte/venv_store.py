@@ -0,0 +1,85 @@
+"""Shared store of native connector virtual environments"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import sys
+import typing as t
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover, Windows
+    fcntl = None  # type: ignore
+
+DEFAULT_VENV_STORE_DIR = Path(__file__).parent.resolve() / ".venv-store"
+# Written once a virtual environment is fully installed
+COMPLETE_MARKER = ".complete"
+
+
+def interpreter_id(python: t.Optional[str] = None) -> str:
+    """Get a short identifier of a Python interpreter, the current one if `python` is not given."""
+    if python:
+        python = shutil.which(python) or python
+    path = os.path.realpath(python or sys.executable)
+    return hashlib.sha256(path.encode()).hexdigest()[:8]
+
+
+class VenvStore:
+    """Virtual environments keyed by source, version and Python interpreter.
+
+    A virtual environment cannot be moved once created, so it is built in place under an
+    exclusive file lock and published by writing a marker file last. Readers only use
+    environments with the marker, and a directory without it is the leftover of an
+    interrupted build, which is removed and built again.
+    """
+
+    def __init__(self, root: t.Union[str, Path] = DEFAULT_VENV_STORE_DIR) -> None:
+        self.root = Path(root)
+
+    @staticmethod
+    def key(source: str, version: str, python: t.Optional[str] = None) -> str:
+        """Get the key of the environment of a source version for an interpreter."""
+        return f"{source}-{version}-{interpreter_id(python)}"
+
+    def path(self, key: str) -> Path:
+        """Get the directory of an environment."""
+        return self.root / key
+
+    def is_complete(self, key: str) -> bool:
+        """Check if an environment is fully installed."""
+        return (self.path(key) / COMPLETE_MARKER).exists()
+
+    @contextmanager
+    def lock(self, key: str) -> t.Iterator[None]:
+        """Hold the lock of an environment, across processes."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / f".{key}.lock", "wb") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def ensure(self, key: str, build: t.Callable[[Path], None]) -> t.Tuple[Path, bool]:
+        """Get an environment, calling `build` with its directory if it is not installed yet.
+
+        Returns the directory and whether it was built by this call.
+        """
+        path = self.path(key)
+        if self.is_complete(key):
+            return path, False
+        with self.lock(key):
+            if self.is_complete(key):
+                # Built by a concurrent run while waiting for the lock
+                return path, False
+            if path.exists():
+                shutil.rmtree(path)
+            build(path)
+            (path / COMPLETE_MARKER).touch()
+        return path, True
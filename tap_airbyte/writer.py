@@ -0,0 +1,164 @@
+"""Buffered Singer message writer that owns the tap's stdout"""
+
+from __future__ import annotations
+
+import errno
+import os
+import sys
+import time
+import typing as t
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from threading import Event, Lock, Thread
+from uuid import UUID
+
+import orjson
+from singer_sdk.singerlib import Message
+from singer_sdk.singerlib.encoding.base import GenericSingerWriter, SingerMessageType
+
+DEFAULT_OUTPUT_BUFFER_SIZE = 1024 * 1024
+DEFAULT_OUTPUT_FLUSH_INTERVAL = 0.5
+
+
+def default(obj):
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    elif isinstance(obj, Decimal):
+        return float(obj)
+    elif isinstance(obj, UUID):
+        return str(obj)
+    elif isinstance(obj, bytes):
+        return obj.decode("utf-8")
+    elif isinstance(obj, Enum):
+        return obj.value
+    return str(obj)
+
+
+class BufferedSingerWriter(GenericSingerWriter[bytes, Message]):
+    """Serializes Singer messages into a reusable buffer and writes it to stdout in large chunks.
+
+    The buffer is written out when it is full, when it has held data for longer than the
+    flush interval, and always right after a STATE message so a target never sees a
+    state before the records it covers. Messages are serialized outside of the lock, so
+    concurrent producers only contend for the copy into the buffer.
+    """
+
+    def __init__(
+        self,
+        buffer_size: int = DEFAULT_OUTPUT_BUFFER_SIZE,
+        flush_interval: float = DEFAULT_OUTPUT_FLUSH_INTERVAL,
+        option: int = orjson.OPT_APPEND_NEWLINE,
+        on_broken_pipe: t.Optional[t.Callable[[], None]] = None,
+    ) -> None:
+        super().__init__()
+        self.flush_interval = flush_interval
+        self.option = option
+        self.on_broken_pipe = on_broken_pipe
+        self.pipe_closed = False
+        self._buffer = bytearray(buffer_size)
+        self._view = memoryview(self._buffer)
+        self._pos = 0
+        self._lock = Lock()
+        self._pending_since = 0.0
+        self._flusher: t.Optional[Thread] = None
+        self._stop = Event()
+
+    @property
+    def buffer_size(self) -> int:
+        """Get the capacity of the output buffer in bytes."""
+        return len(self._buffer)
+
+    def configure(
+        self,
+        buffer_size: t.Optional[int] = None,
+        flush_interval: t.Optional[float] = None,
+        option: t.Optional[int] = None,
+    ) -> None:
+        """Change the buffer size, flush interval or orjson options, flushing pending output."""
+        with self._lock:
+            self._flush()
+            if buffer_size is not None and buffer_size != len(self._buffer):
+                self._view.release()
+                self._buffer = bytearray(max(buffer_size, 1))
+                self._view = memoryview(self._buffer)
+            if flush_interval is not None:
+                self.flush_interval = flush_interval
+            if option is not None:
+                self.option = option
+
+    def serialize_message(self, message: Message) -> bytes:
+        """Serialize a message into a line of json."""
+        return orjson.dumps(message.to_dict(), option=self.option, default=default)
+
+    def write_message(self, message: Message) -> None:
+        """Write a message to stdout, flushing immediately if it is a STATE message."""
+        self.write(self.serialize_message(message), flush=message.type == SingerMessageType.STATE)
+
+    def write(self, data: bytes, flush: bool = False) -> None:
+        """Append already serialized messages to the buffer."""
+        with self._lock:
+            size = len(data)
+            if self._pos + size > len(self._buffer):
+                self._flush()
+            if size > len(self._buffer):
+                # Larger than the whole buffer, hand it straight to the pipe
+                self._write_out(data)
+            else:
+                if not self._pos:
+                    self._pending_since = time.monotonic()
+                self._view[self._pos : self._pos + size] = data
+                self._pos += size
+            if flush:
+                self._flush()
+        if self._flusher is None and self.flush_interval > 0:
+            self._start_flusher()
+
+    def flush(self) -> None:
+        """Write out everything buffered so far."""
+        with self._lock:
+            self._flush()
+
+    def close(self) -> None:
+        """Flush the buffer and stop the background flusher."""
+        self._stop.set()
+        self.flush()
+
+    def _flush(self) -> None:
+        if self._pos:
+            pos, self._pos = self._pos, 0
+            self._write_out(self._view[:pos])
+
+    def _write_out(self, data: t.Union[bytes, memoryview]) -> None:
+        if self.pipe_closed:
+            return
+        try:
+            sys.stdout.buffer.write(data)
+            sys.stdout.buffer.flush()
+        except IOError as e:
+            # Broken pipe
+            if e.errno != errno.EPIPE:
+                raise
+            self.pipe_closed = True
+            # Prevent BrokenPipe writes to closed stdout
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            if self.on_broken_pipe:
+                self.on_broken_pipe()
+
+    def _start_flusher(self) -> None:
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._stop.clear()
+            self._flusher = Thread(target=self._flush_periodically, daemon=True)
+            self._flusher.start()
+
+    def _flush_periodically(self) -> None:
+        """Flush output that has been sitting in the buffer for longer than the interval."""
+        try:
+            while not self._stop.wait(self.flush_interval):
+                with self._lock:
+                    if self._pos and time.monotonic() - self._pending_since >= self.flush_interval:
+                        self._flush()
+        finally:
+            self._flusher = None
@@ -0,0 +1,178 @@
+"""Helpers to run TapAirbyte syncs against a canned Airbyte message feed instead of a connector"""
+
+import io
+import os
+import sys
+import typing as t
+from contextlib import contextmanager, redirect_stderr, redirect_stdout
+from tempfile import TemporaryDirectory
+from unittest.mock import PropertyMock, patch
+
+import orjson
+
+from tap_airbyte.tap import TapAirbyte
+
+# Copies the file given as argument to stdout
+CAT_FILE = "import shutil, sys; shutil.copyfileobj(open(sys.argv[1], 'rb'), sys.stdout.buffer)"
+
+CATALOG = {
+    "streams": [
+        {
+            "name": "users",
+            "json_schema": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "integer"},
+                    "name": {"type": ["null", "string"]},
+                    "updated_at": {"type": ["null", "string"], "format": "date-time"},
+                },
+            },
+            "supported_sync_modes": ["full_refresh", "incremental"],
+            "source_defined_primary_key": [["id"]],
+        },
+        {
+            "name": "events",
+            "json_schema": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "integer"},
+                    "payload": {
+                        "type": ["null", "object"],
+                        "properties": {"kind": {"type": ["null", "string"]}},
+                    },
+                },
+            },
+            "supported_sync_modes": ["full_refresh"],
+            "source_defined_primary_key": [["id"]],
+        },
+    ]
+}
+
+
+def record(stream: str, data: t.Dict[str, t.Any]) -> bytes:
+    """Build an Airbyte RECORD message line."""
+    return orjson.dumps(
+        {"type": "RECORD", "record": {"stream": stream, "data": data, "emitted_at": 0}},
+        option=orjson.OPT_APPEND_NEWLINE,
+    )
+
+
+def stream_state(stream: str, data: t.Dict[str, t.Any]) -> bytes:
+    """Build an Airbyte per-stream STATE message line."""
+    return orjson.dumps(
+        {
+            "type": "STATE",
+            "state": {
+                "type": "STREAM",
+                "stream": {"stream_descriptor": {"name": stream}, "stream_state": data},
+            },
+        },
+        option=orjson.OPT_APPEND_NEWLINE,
+    )
+
+
+def stream_status(stream: str, status: str) -> bytes:
+    """Build an Airbyte STREAM_STATUS trace message line."""
+    return orjson.dumps(
+        {
+            "type": "TRACE",
+            "trace": {
+                "type": "STREAM_STATUS",
+                "emitted_at": 0,
+                "stream_status": {"stream_descriptor": {"name": stream}, "status": status},
+            },
+        },
+        option=orjson.OPT_APPEND_NEWLINE,
+    )
+
+
+def line_stream(line: bytes) -> t.Optional[str]:
+    """Get the stream an Airbyte RECORD, STATE or STREAM_STATUS message line belongs to."""
+    message = orjson.loads(line)
+    if message["type"] == "RECORD":
+        return message["record"]["stream"]
+    if message["type"] == "STATE" and message["state"].get("type") == "STREAM":
+        return message["state"]["stream"]["stream_descriptor"]["name"]
+    if message["type"] == "STATE" and message["state"].get("type") == "GLOBAL":
+        return message["state"]["global"]["stream_states"][0]["stream_descriptor"]["name"]
+    if message["type"] == "TRACE" and message["trace"].get("type") == "STREAM_STATUS":
+        return message["trace"]["stream_status"]["stream_descriptor"]["name"]
+    return None
+
+
+class FakeAirbyteProcess:
+    """Stands in for the `subprocess.Popen` object yielded by `TapAirbyte.run_read`."""
+
+    def __init__(self, lines: t.Iterable[bytes]) -> None:
+        self.stdout = io.BytesIO(b"".join(lines))
+        self.stderr = io.BytesIO()
+        self.returncode = 0
+
+    def poll(self) -> int:
+        return 0
+
+    def wait(self) -> int:
+        return 0
+
+    def kill(self) -> None:
+        pass
+
+
+@contextmanager
+def fake_tap(
+    config: t.Optional[t.Dict[str, t.Any]] = None,
+    catalog=CATALOG,
+    state: t.Optional[t.Dict[str, t.Any]] = None,
+):
+    """Create a tap whose discovery returns `catalog` without running a connector."""
+    with patch.object(
+        TapAirbyte, "airbyte_catalog", new_callable=PropertyMock, return_value=catalog
+    ), patch.object(TapAirbyte, "is_native", return_value=True):
+        yield TapAirbyte(
+            config={"airbyte_spec": {"image": "airbyte/source-fake"}, **(config or {})},
+            state=state,
+        )
+
+
+def deselect(tap: TapAirbyte, stream_name: str, *properties: str) -> None:
+    """Deselect top-level properties of a stream, as a Singer catalog would."""
+    stream = tap.streams[stream_name]
+    for name in properties:
+        stream.metadata[("properties", name)].selected = False
+    stream._mask = None
+
+
+def run_sync(tap: TapAirbyte, lines: t.Iterable[bytes]) -> t.List[t.Dict[str, t.Any]]:
+    """Sync `tap` against the given Airbyte message lines and return the Singer output."""
+
+    lines = list(lines)
+
+    def partition_lines(configured_catalog=None) -> t.List[bytes]:
+        if configured_catalog is None:
+            return lines
+        names = {entry["stream"]["name"] for entry in configured_catalog["streams"]}
+        return [line for line in lines if line_stream(line) in names]
+
+    @contextmanager
+    def run_read(configured_catalog=None):
+        yield FakeAirbyteProcess(partition_lines(configured_catalog))
+
+    @contextmanager
+    def read_command(configured_catalog=None):
+        # A real process writing out the feed, for the asyncio engine
+        with TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "feed.jsonl")
+            with open(path, "wb") as feed:
+                feed.write(b"".join(partition_lines(configured_catalog)))
+            yield [sys.executable, "-c", CAT_FILE, path]
+
+    TapAirbyte.pipe_status = None
+    stdout = io.TextIOWrapper(io.BytesIO(), encoding="utf-8")
+    stderr = io.TextIOWrapper(io.BytesIO(), encoding="utf-8")
+    with patch.object(tap, "run_read", run_read), patch.object(
+        tap, "read_command", read_command
+    ), redirect_stdout(stdout), redirect_stderr(stderr):
+        tap.sync_all()
+    stdout.flush()
+    stdout.seek(0)
+    return [orjson.loads(line) for line in stdout.readlines() if line.strip()]
@@ -0,0 +1,88 @@
+from urllib.parse import urlparse
+
+import pytest
+
+from tap_airbyte import arrow
+from tap_airbyte.tap import AirbyteException
+from tests.airbyte_fakes import fake_tap, record, run_sync
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "id": {"type": "integer"},
+        "score": {"type": ["null", "integer", "number"]},
+        "name": {"type": ["null", "string"]},
+        "payload": {"type": ["null", "object"], "properties": {"kind": {"type": ["null", "string"]}}},
+        "tags": {"type": ["null", "array"], "items": {"type": "string"}},
+        "metadata": {"type": ["null", "object"]},
+        "value": {"anyOf": [{"type": "string"}, {"type": "integer"}]},
+    },
+}
+
+
+def test_arrow_types_of_json_schemas():
+    pa = pytest.importorskip("pyarrow")
+    schema, convert = arrow.arrow_schema(SCHEMA)
+    assert [(field.name, field.type) for field in schema] == [
+        ("id", pa.int64()),
+        ("score", pa.float64()),
+        ("name", pa.string()),
+        ("payload", pa.struct([pa.field("kind", pa.string())])),
+        ("tags", pa.list_(pa.string())),
+        ("metadata", pa.string()),
+        ("value", pa.string()),
+    ]
+    # Only values kept as JSON text are converted
+    data = {"id": 1, "name": "a", "metadata": {"b": [1]}, "value": 2}
+    assert convert(data) == {"id": 1, "name": "a", "metadata": '{"b":[1]}', "value": "2"}
+
+
+@pytest.mark.parametrize("file_format", arrow.ARROW_FORMATS)
+def test_row_groups_and_rotation(tmp_path, file_format):
+    pa = pytest.importorskip("pyarrow")
+    writer = arrow.ArrowBatchFileWriter(
+        tmp_path, "users", SCHEMA, format=file_format, compression="zstd", max_records=5, row_group_size=2
+    )
+    sealed = []
+    for i in range(7):
+        # A string column holding a number is coerced rather than failing the row group
+        sealed += writer.write_record({"id": i, "name": i if i == 3 else f"user {i}", "tags": ["t"]})
+    sealed.append(writer.seal())
+    assert [file.records for file in sealed] == [5, 2]
+    path = urlparse(sealed[0].url).path
+    if file_format == "parquet":
+        parquet = pytest.importorskip("pyarrow.parquet").ParquetFile(path)
+        assert parquet.metadata.num_row_groups == 3
+        table = parquet.read()
+    else:
+        table = pa.ipc.open_file(path).read_all()
+    assert table.column("name").to_pylist() == ["user 0", "user 1", "user 2", "3", "user 4"]
+    assert table.column("tags").to_pylist()[0] == ["t"]
+    assert not list(tmp_path.glob("*.part"))
+
+
+def test_parquet_batches_of_a_sync(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    config = {
+        "batch_config": {
+            "encoding": {"format": "parquet", "compression": "gzip"},
+            "storage": {"root": tmp_path.as_uri()},
+            "batch_size": 2,
+        }
+    }
+    lines = [record("users", {"id": i, "name": "a", "updated_at": None, "extra": 1}) for i in range(3)]
+    with fake_tap(config) as tap:
+        messages = run_sync(tap, lines)
+    batch_messages = [message for message in messages if message["type"] == "BATCH"]
+    assert batch_messages[0]["encoding"] == {"format": "parquet", "compression": "gzip"}
+    tables = [pq.read_table(urlparse(message["manifest"][0]).path) for message in batch_messages]
+    assert [table.num_rows for table in tables] == [2, 1]
+    assert tables[0].to_pylist()[0] == {"id": 0, "name": "a", "updated_at": None}
+
+
+def test_columnar_formats_need_pyarrow(monkeypatch, tmp_path):
+    monkeypatch.setattr(arrow, "pa", None)
+    config = {"batch_config": {"encoding": {"format": "arrow"}, "storage": {"root": tmp_path.as_uri()}}}
+    with fake_tap(config) as tap:
+        with pytest.raises(AirbyteException, match="arrow extra"):
+            tap._create_batch_writers()
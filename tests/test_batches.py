@@ -0,0 +1,66 @@
+import gzip
+from pathlib import Path
+from urllib.parse import urlparse
+
+import orjson
+import pytest
+
+from tap_airbyte import batches
+from tap_airbyte.batches import BatchFileWriter, local_batch_root, open_compressed
+from tests.airbyte_fakes import fake_tap, record, run_sync, stream_state
+
+
+def read_batch_file(url):
+    with gzip.open(urlparse(url).path) as lines:
+        return [orjson.loads(line) for line in lines]
+
+
+def test_files_rotate_at_exactly_max_records(tmp_path):
+    writer = BatchFileWriter(tmp_path, "users", max_records=3)
+    lines = b"".join(b'{"id":%d}\n' % i for i in range(7))
+    sealed = writer.write(lines, 7)
+    assert [file.records for file in sealed] == [3, 3]
+    assert [data["id"] for data in read_batch_file(sealed[1].url)] == [3, 4, 5]
+    # The last record is in a file that is still being written
+    assert [path.suffix for path in tmp_path.iterdir()].count(".part") == 1
+    last = writer.seal()
+    assert last.records == 1 and writer.seal() is None
+    writer.write(b'{"id":7}\n', 1)
+    writer.abort()
+    assert len(list(tmp_path.iterdir())) == 3
+
+
+def test_local_roots_only(monkeypatch, tmp_path):
+    assert local_batch_root(tmp_path.as_uri()) == tmp_path
+    assert local_batch_root("batches") == Path("batches")
+    with pytest.raises(ValueError):
+        local_batch_root("s3://bucket/batches")
+    monkeypatch.setattr(batches, "zstandard", None)
+    with pytest.raises(RuntimeError, match="zstd"):
+        open_compressed(tmp_path / "users.jsonl.zst", "zstd")
+
+
+def test_state_follows_the_batch_files_it_covers(tmp_path):
+    config = {
+        "batch_config": {
+            "encoding": {"format": "jsonl", "compression": "gzip"},
+            "storage": {"root": tmp_path.as_uri()},
+            "batch_size": 2,
+        }
+    }
+    lines = [record("users", {"id": i, "name": "a", "updated_at": None, "extra": 1}) for i in range(3)]
+    lines.append(stream_state("users", {"cursor": 3}))
+    lines.append(record("users", {"id": 3, "name": "b", "updated_at": None}))
+    with fake_tap(config) as tap:
+        messages = run_sync(tap, lines)
+    kinds = [message["type"] for message in messages if message["type"] != "SCHEMA"]
+    assert "RECORD" not in kinds
+    # The state covers the records of the first two files
+    assert kinds[:2] == ["BATCH", "BATCH"] and kinds.index("STATE") >= 2
+    batch_messages = [message for message in messages if message["type"] == "BATCH"]
+    assert batch_messages[0]["encoding"] == {"format": "jsonl", "compression": "gzip"}
+    files = [read_batch_file(message["manifest"][0]) for message in batch_messages]
+    assert [len(records) for records in files] == [2, 1, 1]
+    # Conformed to the schema like any other record
+    assert files[0][0] == {"id": 0, "name": "a", "updated_at": None}
+    assert not list(tmp_path.glob("*.part"))
@@ -0,0 +1,123 @@
+import subprocess
+import time
+from threading import Event
+from unittest.mock import patch
+
+from tap_airbyte.bootstrap import PhaseTimings
+from tap_airbyte.tap import TapAirbyte
+
+from tests.airbyte_fakes import fake_tap
+
+is_native = TapAirbyte.is_native.__wrapped__
+
+
+def test_phase_timings_add_up_repeated_phases():
+    timings = PhaseTimings()
+    for _ in range(2):
+        with timings.phase("discover"):
+            time.sleep(0.01)
+    assert list(timings.phases) == ["discover"]
+    assert timings.phases["discover"] >= 0.02
+    assert timings.summary().startswith("discover 0.0")
+
+
+class FakeProcess:
+    """A command of the fake OCI runtime, running until it is killed without a return code."""
+
+    def __init__(self, command, returncode):
+        self.command = command
+        self.returncode = returncode
+        self.killed = False
+
+    def communicate(self, timeout=None):
+        if self.returncode is None:
+            time.sleep(timeout or 0)
+            raise subprocess.TimeoutExpired(self.command, timeout)
+        return None, b"" if self.returncode == 0 else b"manifest unknown"
+
+    def kill(self):
+        self.killed = True
+        self.returncode = -9
+
+
+def fake_runtime(inspect_returncode, pull_returncode=None):
+    """Patch the OCI runtime, getting the commands it was asked to run."""
+    processes = []
+    returncodes = {"version": 0, "image": inspect_returncode, "pull": pull_returncode}
+
+    def popen(command, **kwargs):
+        processes.append(FakeProcess(command, returncodes[command[1]]))
+        return processes[-1]
+
+    return (
+        patch("tap_airbyte.tap.shutil.which", return_value="/usr/bin/docker"),
+        patch("tap_airbyte.tap.subprocess.Popen", side_effect=popen),
+        processes,
+    )
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_image_pull_is_cancelled_for_native_sources():
+    which, popen, processes = fake_runtime(inspect_returncode=1)
+
+    def lookup():
+        time.sleep(0.3)
+        return True
+
+    with fake_tap() as tap, which, popen:
+        with patch.object(tap, "_lookup_native", side_effect=lookup), patch.object(
+            tap, "setup_native_connector_venv"
+        ) as setup, patch.object(tap, "_ensure_oci") as ensure_oci:
+            assert is_native(tap)
+        # Not waited on by the native source, the pull is killed in the background
+        assert wait_for(lambda: processes[-1].killed)
+    assert [process.command[1] for process in processes] == ["version", "image", "pull"]
+    setup.assert_called_once()
+    ensure_oci.assert_not_called()
+    assert wait_for(lambda: {"oci_check", "image_pull", "venv"} <= set(tap.timings.phases))
+
+
+def test_native_sources_start_no_runtime_command_once_known():
+    which, popen, processes = fake_runtime(inspect_returncode=0)
+    with fake_tap() as tap, which, popen:
+        cancel = Event()
+        cancel.set()
+        assert not tap._prefetch_image(cancel)
+    assert processes == []
+
+
+def test_present_image_is_not_pulled():
+    which, popen, processes = fake_runtime(inspect_returncode=0)
+    with fake_tap() as tap, which, popen:
+        with patch.object(tap, "_lookup_native", return_value=False), patch.object(
+            tap, "_ensure_oci"
+        ) as ensure_oci:
+            assert not is_native(tap)
+    assert [process.command[1] for process in processes] == ["version", "image"]
+    # The runtime was already checked by the prefetch
+    ensure_oci.assert_not_called()
+
+
+def test_runtime_is_checked_when_the_image_could_not_be_pulled():
+    which, popen, processes = fake_runtime(inspect_returncode=1, pull_returncode=1)
+    with fake_tap() as tap, which, popen:
+        with patch.object(tap, "_lookup_native", return_value=False), patch.object(
+            tap, "_ensure_oci"
+        ) as ensure_oci:
+            assert not is_native(tap)
+    ensure_oci.assert_called_once()
+
+
+def test_runtime_is_checked_when_prefetch_is_disabled():
+    with fake_tap({"prefetch_image": False}) as tap:
+        with patch.object(tap, "_lookup_native", return_value=False), patch.object(
+            tap, "_ensure_oci"
+        ) as ensure_oci:
+            assert not is_native(tap)
+    ensure_oci.assert_called_once()
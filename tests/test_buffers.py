@@ -0,0 +1,164 @@
+from queue import Empty
+from threading import Thread
+
+import pytest
+
+from tap_airbyte.buffers import MemoryBudget, StreamBuffer
+from tap_airbyte.spill import SpillFile
+from tests.airbyte_fakes import fake_tap, record, run_sync, stream_status
+
+
+def test_stream_buffer_is_fifo_and_tracks_size():
+    buffer = StreamBuffer("users")
+    buffer.put({"id": 1}, 10)
+    buffer.put({"id": 2}, 20)
+    assert (buffer.records, buffer.bytes) == (2, 30)
+    assert buffer.get(timeout=0) == {"id": 1}
+    assert buffer.get(timeout=0) == {"id": 2}
+    assert (buffer.records, buffer.bytes) == (0, 0)
+    with pytest.raises(Empty):
+        buffer.get(timeout=0)
+
+
+def test_stream_buffer_blocks_producer_until_consumer_drains():
+    buffer = StreamBuffer("users", max_records=2)
+    received = []
+
+    def produce():
+        for i in range(10):
+            buffer.put(i, 1)
+
+    producer = Thread(target=produce)
+    producer.start()
+    while len(received) < 10:
+        received.append(buffer.get(timeout=5))
+        assert buffer.records <= 2
+    producer.join(timeout=5)
+    assert received == list(range(10))
+    assert buffer.stalls > 0
+
+
+def test_global_budget_is_shared_but_never_blocks_an_empty_buffer():
+    budget = MemoryBudget(max_bytes=100)
+    slow, fast = StreamBuffer("slow", budget), StreamBuffer("fast", budget)
+    slow.put("big", 150)
+    assert budget.exhausted()
+    # Would block forever if an empty buffer respected the exhausted global budget
+    fast.put("small", 1)
+    assert fast.get(timeout=0) == "small"
+
+
+def test_closed_buffer_releases_budget_and_drops_records():
+    budget = MemoryBudget(max_records=1)
+    buffer = StreamBuffer("users", budget)
+    buffer.put(1, 1)
+    buffer.close()
+    assert budget.records == 0
+    # The consumer is gone, this must not block
+    buffer.put(2, 1)
+    assert buffer.empty()
+
+
+def test_sync_with_tight_limits_delivers_every_record_in_order():
+    lines = [record("users", {"id": i}) for i in range(200)]
+    with fake_tap({"buffer_max_records_per_stream": 3, "buffer_max_bytes": 256}) as tap:
+        output = run_sync(tap, lines)
+    records = [m["record"]["id"] for m in output if m["type"] == "RECORD"]
+    assert records == list(range(200))
+
+
+def test_drain_ends_when_the_buffer_is_finished():
+    buffer = StreamBuffer("users", max_records=2)
+    drained = []
+    consumer = Thread(target=lambda: drained.extend(buffer.drain()))
+    consumer.start()
+    for i in range(10):
+        buffer.put(i, 1)
+    buffer.finish()
+    consumer.join(timeout=5)
+    assert not consumer.is_alive()
+    assert drained == list(range(10))
+    assert not buffer.put(10, 1)
+
+
+def test_buffer_awaiting_consumer_is_not_bounded():
+    buffer = StreamBuffer("users", max_records=1)
+    buffer.awaiting_consumer = True
+    for i in range(5):
+        # Would block forever if the limit applied before a consumer is draining
+        buffer.put(i, 1)
+    buffer.finish()
+    assert list(buffer.drain()) == list(range(5))
+    assert not buffer.awaiting_consumer
+
+
+def test_sync_with_one_consumer_runs_streams_as_they_complete():
+    lines = [
+        *(record("users", {"id": i}) for i in range(50)),
+        stream_status("users", "COMPLETE"),
+        *(record("events", {"id": i}) for i in range(50)),
+        stream_status("events", "COMPLETE"),
+    ]
+    with fake_tap({"max_concurrent_streams": 1, "buffer_max_records_per_stream": 2}) as tap:
+        output = run_sync(tap, lines)
+    records = [(m["stream"], m["record"]["id"]) for m in output if m["type"] == "RECORD"]
+    assert records == [("users", i) for i in range(50)] + [("events", i) for i in range(50)]
+
+
+def test_stream_without_records_still_gets_its_schema():
+    with fake_tap() as tap:
+        output = run_sync(tap, [record("users", {"id": 1})])
+    assert sorted(m["stream"] for m in output if m["type"] == "SCHEMA") == ["events", "users"]
+
+
+def test_records_are_handed_over_in_batches():
+    budget = MemoryBudget()
+    buffer = StreamBuffer("users", budget=budget, batch_size=3)
+    for i in range(4):
+        assert buffer.add(i, 1)
+    # The fourth record is still staged
+    assert buffer.accepted == 3
+    assert buffer.flush()
+    assert buffer.accepted == 4
+    buffer.finish()
+    batches = buffer.drain_batches()
+    assert next(batches) == [0, 1, 2]
+    # Released only once the consumer is done with the batch
+    assert budget.records == 4
+    assert next(batches) == [3]
+    assert budget.records == 1
+    assert list(batches) == []
+    assert budget.records == 0
+    assert not buffer.add(4, 1)
+
+
+def test_full_buffer_spills_to_disk_in_order(tmp_path):
+    budget = MemoryBudget()
+    buffer = StreamBuffer("users", budget, max_records=2, spill=SpillFile(tmp_path, "users", max_bytes=6))
+    buffer.put_batch([0, 1], 2)
+    # Would block without a consumer, spilled instead and not held in memory
+    buffer.put_batch([2, 3], 2)
+    buffer.put_batch([4], 1)
+    assert (buffer.spilled, budget.records, buffer.qsize()) == (3, 2, 5)
+    # Out of room on disk, the buffer is full again
+    assert buffer.spill.bytes == 6
+    with budget.space:
+        assert buffer.full()
+    buffer.finish()
+    batches = buffer.drain_batches()
+    assert next(batches) == [0, 1]
+    assert [record for batch in batches for record in batch] == [2, 3, 4]
+    assert budget.records == 0 and buffer.spill.closed
+    assert not list(tmp_path.iterdir())
+
+
+def test_sync_spilling_a_slow_stream_delivers_every_record_in_order(tmp_path):
+    lines = [record("users" if i % 2 else "events", {"id": i}) for i in range(200)]
+    config = {"buffer_max_records_per_stream": 3, "buffer_batch_records": 2, "buffer_spill_dir": str(tmp_path)}
+    with fake_tap(config) as tap:
+        output = run_sync(tap, lines)
+        assert sum(stream_buffer.spilled for stream_buffer in tap.buffers.values()) > 0
+    for stream, ids in (("events", range(0, 200, 2)), ("users", range(1, 200, 2))):
+        records = [m["record"]["id"] for m in output if m["type"] == "RECORD" and m["stream"] == stream]
+        assert records == list(ids)
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,48 @@
+from operator import itemgetter
+from unittest.mock import patch
+
+from tap_airbyte.tap import AIRBYTE_STREAM_METADATA_KEY, TapAirbyte
+from tests.airbyte_fakes import CATALOG, fake_tap
+
+CONFIG = {"airbyte_spec": {"image": "airbyte/source-fake"}}
+
+
+def discovered_catalog():
+    with fake_tap() as tap:
+        return tap.catalog_dict
+
+
+def test_discovered_catalog_carries_the_airbyte_streams():
+    catalog = discovered_catalog()
+    for entry in catalog["streams"]:
+        (root,) = [item["metadata"] for item in entry["metadata"] if not item["breadcrumb"]]
+        airbyte_stream = root[AIRBYTE_STREAM_METADATA_KEY]
+        assert airbyte_stream["name"] == entry["tap_stream_id"]
+        assert "supported_sync_modes" in airbyte_stream
+        assert "json_schema" not in airbyte_stream
+
+
+def test_singer_catalog_skips_discovery():
+    catalog = discovered_catalog()
+    with patch.object(TapAirbyte, "run_discover", side_effect=AssertionError) as discover, patch.object(
+        TapAirbyte, "is_native", return_value=True
+    ):
+        tap = TapAirbyte(config=CONFIG, catalog=catalog)
+        configured = tap.configured_airbyte_catalog
+    assert discover.call_count == 0
+    by_name = itemgetter("name")
+    assert sorted((entry["stream"] for entry in configured["streams"]), key=by_name) == sorted(
+        CATALOG["streams"], key=by_name
+    )
+
+
+def test_singer_catalog_without_airbyte_streams_is_discovered():
+    catalog = discovered_catalog()
+    for entry in catalog["streams"]:
+        for item in entry["metadata"]:
+            item["metadata"].pop(AIRBYTE_STREAM_METADATA_KEY, None)
+    with patch.object(TapAirbyte, "run_discover", return_value=CATALOG) as discover, patch.object(
+        TapAirbyte, "is_native", return_value=True
+    ):
+        TapAirbyte(config=CONFIG, catalog=catalog).configured_airbyte_catalog
+    assert discover.call_count == 1
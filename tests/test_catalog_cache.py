@@ -0,0 +1,98 @@
+from threading import current_thread
+from unittest.mock import patch
+
+import orjson
+
+from tap_airbyte.catalog_cache import CatalogCache
+from tap_airbyte.tap import TapAirbyte
+from tests.airbyte_fakes import CATALOG
+
+CHANGED_CATALOG = {"streams": CATALOG["streams"][:1]}
+# Names of the threads the native check ran on
+NATIVE_CHECKS = []
+
+
+def native_check():
+    NATIVE_CHECKS.append(current_thread().name)
+    return True
+
+
+def make_tap(tmp_path, discovered, **config):
+    with patch.object(TapAirbyte, "run_discover", side_effect=discovered) as discover, patch.object(
+        TapAirbyte, "is_native", side_effect=native_check
+    ):
+        tap = TapAirbyte(
+            config={
+                "airbyte_spec": {"image": "airbyte/source-fake"},
+                "airbyte_config": {"api_key": "secret"},
+                "catalog_cache_ttl": 60,
+                "catalog_cache_dir": str(tmp_path),
+                **config,
+            }
+        )
+        # A background revalidation runs while discovery is patched
+        tap._join_revalidation(timeout=5)
+    return tap, discover
+
+
+def test_cache_key_depends_on_image_tag_and_config():
+    key = CatalogCache.key("airbyte/source-fake", "latest", {"a": 1, "b": 2})
+    assert key == CatalogCache.key("airbyte/source-fake", "latest", {"b": 2, "a": 1})
+    assert key != CatalogCache.key("airbyte/source-fake", "1.0.0", {"a": 1, "b": 2})
+    assert key != CatalogCache.key("airbyte/source-fake", "latest", {"a": 1, "b": 3})
+    assert "secret" not in CatalogCache.key("airbyte/source-fake", "latest", {"a": "secret"})
+
+
+def test_fresh_catalog_is_served_from_disk(tmp_path):
+    _, discover = make_tap(tmp_path, [CATALOG])
+    assert discover.call_count == 1
+    tap, discover = make_tap(tmp_path, [CHANGED_CATALOG])
+    assert discover.call_count == 0
+    assert sorted(tap.streams) == ["events", "users"]
+
+
+def test_expired_catalog_is_discovered_again(tmp_path):
+    make_tap(tmp_path, [CATALOG])
+    expire(tmp_path)
+    tap, discover = make_tap(tmp_path, [CHANGED_CATALOG])
+    assert discover.call_count == 1
+    assert sorted(tap.streams) == ["users"]
+
+
+def test_expired_catalog_is_served_while_revalidating(tmp_path):
+    make_tap(tmp_path, [CATALOG])
+    expire(tmp_path)
+    tap, discover = make_tap(tmp_path, [CHANGED_CATALOG], catalog_cache_revalidate=True)
+    assert discover.call_count == 1
+    # The stale catalog is used for this run, the changed one is cached for the next
+    assert sorted(tap.streams) == ["events", "users"]
+    tap, discover = make_tap(tmp_path, [CATALOG])
+    assert discover.call_count == 0
+    assert sorted(tap.streams) == ["users"]
+
+
+def test_unchanged_catalog_only_renews_its_expiry(tmp_path):
+    make_tap(tmp_path, [CATALOG])
+    expire(tmp_path)
+    with patch.object(CatalogCache, "store") as store:
+        make_tap(tmp_path, [CATALOG], catalog_cache_revalidate=True)
+    store.assert_not_called()
+    tap, discover = make_tap(tmp_path, [CHANGED_CATALOG])
+    assert discover.call_count == 0
+
+
+def test_source_is_resolved_before_revalidating(tmp_path):
+    make_tap(tmp_path, [CATALOG])
+    expire(tmp_path)
+    NATIVE_CHECKS.clear()
+    with patch.object(TapAirbyte, "_revalidate_catalog") as revalidate:
+        make_tap(tmp_path, [CATALOG], catalog_cache_revalidate=True)
+    revalidate.assert_called_once()
+    assert NATIVE_CHECKS[0] == current_thread().name
+
+
+def expire(directory):
+    (entry,) = directory.glob("*.json")
+    content = orjson.loads(entry.read_bytes())
+    content["discovered_at"] -= 3600
+    entry.write_bytes(orjson.dumps(content))
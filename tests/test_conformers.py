@@ -0,0 +1,59 @@
+import logging
+
+from singer_sdk.helpers._typing import TypeConformanceLevel, _conform_record_data_types
+
+from tap_airbyte.conformers import compile_conformer
+from tests.airbyte_fakes import fake_tap, record, run_sync
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "id": {"type": "integer"},
+        "active": {"type": ["boolean", "null"]},
+        "tags": {"type": "array", "items": {"type": "string"}},
+        "flags": {"type": "array", "items": {"type": "boolean"}},
+        "owner": {
+            "type": ["object", "null"],
+            "properties": {"login": {"type": "string"}, "site_admin": {"type": "boolean"}},
+        },
+        "labels": {
+            "type": "array",
+            "items": {"type": "object", "properties": {"name": {"type": "string"}}},
+        },
+        "metadata": {"type": "object", "properties": {}, "additionalProperties": True},
+        "raw": {"type": "object"},
+    },
+}
+
+
+def generic(record):
+    return _conform_record_data_types(record, SCHEMA, TypeConformanceLevel.RECURSIVE, None)
+
+
+def test_compiled_conformer_matches_the_sdk():
+    conform = compile_conformer(SCHEMA)
+    records = [
+        {"id": 1, "tags": ["a"], "raw": {"any": [1]}},
+        {"id": 2, "active": 1, "flags": [0, 1, None], "owner": None, "extra": "x"},
+        {"owner": {"login": "a", "site_admin": 0, "email": "a@b"}, "metadata": {"k": "v"}},
+        {"labels": [{"name": "bug", "color": "red"}, "loose"], "active": None, "tags": "a"},
+        {"owner": "not an object", "labels": None, "flags": True},
+    ]
+    for record_ in records:
+        assert conform(dict(record_)) == generic(dict(record_))
+
+
+def test_schemas_without_nested_properties_fall_back():
+    schema = {"type": "object", "properties": {"items": {"type": "array", "items": {"type": "object"}}}}
+    assert compile_conformer(schema) is None
+    assert compile_conformer({"type": "object"}) is None
+
+
+def test_records_are_conformed_and_unmapped_properties_warned(caplog):
+    with fake_tap() as tap:
+        assert tap.streams["users"].conformer is not None
+        with caplog.at_level(logging.WARNING):
+            messages = run_sync(tap, [record("users", {"id": 1, "name": "a", "updated_at": None, "x": 1})])
+    records = [message["record"] for message in messages if message["type"] == "RECORD"]
+    assert records == [{"id": 1, "name": "a", "updated_at": None}]
+    assert "users" in caplog.text and "x" in caplog.text
@@ -0,0 +1,65 @@
+import io
+import sys
+from contextlib import contextmanager, redirect_stdout
+from unittest.mock import patch
+
+import pytest
+
+from tap_airbyte.tap import AirbyteException, TapAirbyte
+from tests.airbyte_fakes import fake_tap, record, run_sync, stream_state
+
+FEED = [
+    *(record("users", {"id": i}) for i in range(500)),
+    stream_state("users", {"cursor": 500}),
+    *(record("events", {"id": i}) for i in range(300)),
+    stream_state("events", {"cursor": 300}),
+]
+
+
+def singer_summary(messages, ordered=True):
+    records = {}
+    states = []
+    for message in messages:
+        if message["type"] == "RECORD":
+            records.setdefault(message["stream"], []).append(message["record"]["id"])
+        elif message["type"] == "STATE":
+            states.append(message["value"])
+    if ordered:
+        return records, states
+    # Parallel reads interleave their streams, so the order of their states varies between runs
+    final = {
+        state["stream"]["stream_descriptor"]["name"]: state["stream"]["stream_state"]
+        for state in states[-1]["airbyte_state"]
+    }
+    seen = {
+        (state["stream_descriptor"]["name"], state["stream_state"]["cursor"]) for state in states
+    }
+    return records, sorted(seen), final
+
+
+@pytest.mark.parametrize("read_processes", [1, 2])
+def test_asyncio_engine_matches_threads(read_processes):
+    outputs = []
+    for engine in ("threads", "asyncio"):
+        config = {
+            "sync_engine": engine,
+            "read_processes": read_processes,
+            "buffer_max_records_per_stream": 50,
+        }
+        with fake_tap(config) as tap:
+            outputs.append(singer_summary(run_sync(tap, FEED), ordered=read_processes == 1))
+    assert outputs[0] == outputs[1]
+    assert outputs[1][0] == {"users": list(range(500)), "events": list(range(300))}
+
+
+def test_asyncio_engine_reports_failed_sources():
+    @contextmanager
+    def failing_command(configured_catalog=None):
+        script = "import sys; print('connection refused', file=sys.stderr); sys.exit(3)"
+        yield [sys.executable, "-c", script]
+
+    TapAirbyte.pipe_status = None
+    with fake_tap({"sync_engine": "asyncio"}) as tap:
+        with patch.object(tap, "read_command", failing_command), redirect_stdout(io.StringIO()):
+            with pytest.raises(AirbyteException, match="connection refused"):
+                tap.sync_all()
@@ -0,0 +1,91 @@
+import pytest
+from singer_sdk.exceptions import MapExpressionError
+from singer_sdk.helpers._flattening import FlatteningOptions, flatten_record
+from singer_sdk.mapper import CustomStreamMap, SameRecordTransform
+
+from tap_airbyte.mapping import BatchStreamMap, FlattenPlan
+from tests.airbyte_fakes import fake_tap, record, run_sync
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "id": {"type": "integer"},
+        "name": {"type": ["null", "string"]},
+        "payload": {
+            "type": ["null", "object"],
+            "properties": {
+                "kind": {"type": ["null", "string"]},
+                "a_rather_long_property_name_to_shorten": {
+                    "type": ["null", "object"],
+                    "properties": {"deep": {"type": ["null", "object"]}},
+                },
+            },
+        },
+        "tags": {"type": ["null", "array"], "items": {"type": "string"}},
+    },
+}
+
+RECORDS = [
+    {"id": 1, "name": "a", "payload": {"kind": "x", "a_rather_long_property_name_to_shorten": {"deep": {"b": 1}}}},
+    {"id": 2, "name": None, "payload": None, "tags": ["t"]},
+    {"id": 3, "payload": {"extra": [1, 2]}},
+]
+
+
+def test_flatten_plan_matches_the_sdk():
+    options = FlatteningOptions(enabled=True, max_level=2, max_key_length=30)
+    stream_map = SameRecordTransform("users", SCHEMA, ["id"], flattening_options=options)
+    plan = FlattenPlan(stream_map)
+    for data in RECORDS * 2:
+        assert plan.flatten(data) == flatten_record(
+            data, stream_map.transformed_schema, max_level=2, max_key_length=30
+        )
+
+
+def test_custom_maps_match_the_sdk():
+    definitions = [
+        {"name": None, "login": "name", "upper": "name.upper() if name else None", "__filter__": "id != 2"},
+        {"__else__": None, "__key_properties__": ["renamed"], "renamed": "id", "self_name": "self", "missing": "nope"},
+        {"kind": "payload.get('kind') if payload else None", "__key_properties__": ["id"]},
+    ]
+    for definition in definitions:
+        stream_map = CustomStreamMap("users", {}, {}, SCHEMA, ["id"], definition, None)
+        batch_map = BatchStreamMap(stream_map)
+        for data in RECORDS:
+            try:
+                expected = stream_map.transform(data)
+            except MapExpressionError:
+                with pytest.raises(MapExpressionError):
+                    batch_map.transform_batch([data])
+            else:
+                assert batch_map.transform_batch([data]) == [expected]
+
+
+def test_batch_stream_maps_write_what_the_sdk_writes():
+    config = {
+        "stream_maps": {
+            "users": {"name": None, "login": "name", "__filter__": "id != 2"},
+            "users_copy": {"__source__": "users", "__else__": None, "id": "id", "upper": "name.upper()"},
+        },
+        "flattening_enabled": True,
+        "flattening_max_depth": 1,
+    }
+    lines = [record("users", {"id": i, "name": f"user {i}", "updated_at": None}) for i in range(4)]
+    lines.append(record("events", {"id": 1, "payload": {"kind": "click"}}))
+    outputs = []
+    for batch_stream_maps in (True, False):
+        with fake_tap({**config, "batch_stream_maps": batch_stream_maps}) as tap:
+            messages = run_sync(tap, lines)
+            # Custom maps are left to the SDK, flattening alone is batched
+            assert tap.streams["users"].batch_maps is None
+            assert (tap.streams["events"].batch_maps is not None) is batch_stream_maps
+        records = {}
+        for message in messages:
+            if message["type"] == "RECORD":
+                records.setdefault(message["stream"], []).append(message["record"])
+        outputs.append(records)
+    assert outputs[0] == outputs[1]
+    assert [data["id"] for data in outputs[0]["users"]] == [0, 1, 3]
+    assert outputs[0]["users"][-1] == {"id": 3, "updated_at": None, "login": "user 3"}
+    assert outputs[0]["users_copy"][-1] == {"id": 3, "upper": "USER 3"}
+    assert outputs[0]["events"] == [{"id": 1, "payload__kind": "click"}]
@@ -0,0 +1,76 @@
+import time
+from threading import Lock
+
+from tap_airbyte.output import OrderedOutput
+from tests.airbyte_fakes import fake_tap, record, run_sync, stream_state
+
+
+class CollectingWriter:
+    """Stands in for the BufferedSingerWriter, recording every chunk handed to it."""
+
+    def __init__(self) -> None:
+        self.chunks = []
+        self._lock = Lock()
+
+    def write(self, data: bytes, flush: bool = False) -> None:
+        with self._lock:
+            self.chunks.append(data)
+
+
+def wait_for(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_state_waits_for_the_records_before_it():
+    writer = CollectingWriter()
+    output = OrderedOutput(writer).start()
+    output.push("users", b"u1\n", 1)
+    output.push_control(b"state\n", watermarks={"users": 1, "events": 1}, flush=True)
+    assert wait_for(lambda: b"u1\n" in writer.chunks)
+    time.sleep(0.05)
+    assert b"state\n" not in writer.chunks
+    output.push("events", b"e1\n", 1)
+    output.close()
+    assert writer.chunks.index(b"state\n") > writer.chunks.index(b"e1\n")
+
+
+def test_lanes_are_interleaved_fairly():
+    writer = CollectingWriter()
+    output = OrderedOutput(writer, quantum=1)
+    for i in range(10):
+        output.push("hot", b"h%d\n" % i, 1)
+    output.push("cold", b"c0\n", 1)
+    output.start().close()
+    # The cold stream is served on the first turn instead of after the whole hot backlog
+    assert writer.chunks.index(b"c0\n") < writer.chunks.index(b"h2\n")
+
+
+def test_discard_does_not_wait_for_unreachable_watermarks():
+    writer = CollectingWriter()
+    output = OrderedOutput(writer).start()
+    output.push_control(b"state\n", watermarks={"users": 1})
+    output.close(discard=True)
+    assert writer.chunks == []
+
+
+def test_sync_writes_states_after_their_records():
+    lines = []
+    for i in range(100):
+        lines.append(record("users", {"id": i}))
+        lines.append(record("events", {"id": i}))
+        if i % 10 == 9:
+            lines.append(stream_state("users", {"cursor": i}))
+    with fake_tap({"buffer_max_records_per_stream": 4}) as tap:
+        output = run_sync(tap, lines)
+    seen = {"users": 0, "events": 0}
+    for message in output:
+        if message["type"] == "RECORD":
+            seen[message["stream"]] += 1
+        elif message["type"] == "STATE" and "airbyte_state" in message["value"]:
+            cursor = message["value"]["airbyte_state"][0]["stream"]["stream_state"]["cursor"]
+            assert seen["users"] >= cursor + 1
+            assert seen["events"] >= cursor + 1
+    assert seen == {"users": 100, "events": 100}
@@ -0,0 +1,104 @@
+import io
+
+import orjson
+
+from tap_airbyte.partition import filter_connector_state, merge_line_chunks, partition_catalog
+from tests.airbyte_fakes import CATALOG, deselect, fake_tap, record, run_sync, stream_state
+
+
+def test_partition_catalog_spreads_streams_round_robin():
+    catalog = {"streams": [{"stream": {"name": name}} for name in "abcde"]}
+    partitions = partition_catalog(catalog, 2)
+    assert [[s["stream"]["name"] for s in p["streams"]] for p in partitions] == [
+        ["a", "c", "e"],
+        ["b", "d"],
+    ]
+    # Never more partitions than streams
+    assert len(partition_catalog(catalog, 10)) == 5
+
+
+def test_filter_connector_state_keeps_the_partition_streams():
+    state = [
+        {"type": "STREAM", "stream": {"stream_descriptor": {"name": "a"}, "stream_state": {}}},
+        {"type": "STREAM", "stream": {"stream_descriptor": {"name": "b"}, "stream_state": {}}},
+    ]
+    assert filter_connector_state(state, {"b"}) == state[1:]
+    assert filter_connector_state({"legacy": 1}, {"b"}) == {"legacy": 1}
+
+
+def test_merge_line_chunks_keeps_each_process_in_order():
+    first = io.BytesIO(b"".join(b"a%d\n" % i for i in range(1000)))
+    second = io.BytesIO(b"".join(b"b%d\n" % i for i in range(1000)))
+    lines = b"".join(merge_line_chunks([first, second], chunk_size=64)).splitlines()
+    assert [line for line in lines if line.startswith(b"a")] == [b"a%d" % i for i in range(1000)]
+    assert [line for line in lines if line.startswith(b"b")] == [b"b%d" % i for i in range(1000)]
+
+
+def test_partitioned_sync_merges_records_and_states():
+    lines = [
+        record("users", {"id": 1}),
+        stream_state("users", {"cursor": 1}),
+        record("events", {"id": 2}),
+        stream_state("events", {"cursor": 2}),
+    ]
+    with fake_tap({"read_processes": 2}) as tap:
+        assert len(tap._partition_read()) == 2
+        output = run_sync(tap, lines)
+    records = sorted((m["stream"], m["record"]["id"]) for m in output if m["type"] == "RECORD")
+    assert records == [("events", 2), ("users", 1)]
+    final_state = output[-1]["value"]["airbyte_state"]
+    assert sorted(
+        (entry["stream"]["stream_descriptor"]["name"], entry["stream"]["stream_state"])
+        for entry in final_state
+    ) == [("events", {"cursor": 2}), ("users", {"cursor": 1})]
+
+
+def test_partitioned_sync_falls_back_to_one_process_for_legacy_state():
+    with fake_tap({"read_processes": 2}, state={"cursor": 1}) as tap:
+        assert len(tap._partition_read()) == 1
+
+
+def test_partitioned_sync_falls_back_to_one_process_for_cdc_streams():
+    users = {**CATALOG["streams"][0]}
+    users["json_schema"] = {
+        "type": "object",
+        "properties": {"id": {"type": "integer"}, "_ab_cdc_lsn": {"type": ["null", "number"]}},
+    }
+    catalog = {"streams": [users, CATALOG["streams"][1]]}
+    with fake_tap({"read_processes": 2}, catalog=catalog) as tap:
+        # Left out of the configured catalog once deselected
+        deselect(tap, "users", "_ab_cdc_lsn")
+        streams = tap.configured_airbyte_catalog["streams"]
+        assert "_ab_cdc_lsn" not in streams[0]["stream"]["json_schema"]["properties"]
+        assert len(tap._partition_read()) == 1
+
+
+def test_partitioned_sync_drops_global_state_without_failing():
+    global_state = orjson.dumps(
+        {
+            "type": "STATE",
+            "state": {
+                "type": "GLOBAL",
+                "global": {
+                    "shared_state": {"lsn": 1},
+                    "stream_states": [
+                        {"stream_descriptor": {"name": "users"}, "stream_state": {"lsn": 1}}
+                    ],
+                },
+            },
+        },
+        option=orjson.OPT_APPEND_NEWLINE,
+    )
+    lines = [
+        record("users", {"id": 1}),
+        global_state,
+        record("events", {"id": 2}),
+        stream_state("events", {"cursor": 2}),
+    ]
+    with fake_tap({"read_processes": 2}) as tap:
+        output = run_sync(tap, lines)
+    assert tap.unmergeable_state
+    records = sorted((m["stream"], m["record"]["id"]) for m in output if m["type"] == "RECORD")
+    assert records == [("events", 2), ("users", 1)]
+    final_state = output[-1]["value"]["airbyte_state"]
+    assert [entry["type"] for entry in final_state] == ["STREAM"]
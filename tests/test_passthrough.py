@@ -0,0 +1,61 @@
+import orjson
+
+from tap_airbyte.passthrough import RawRecordSplicer
+from tests.airbyte_fakes import fake_tap, record, run_sync, stream_state
+
+
+def test_splice_copies_the_payload_verbatim():
+    line = (
+        b'{"type":"RECORD","record":{"namespace":"public","stream":"users",'
+        b'"data":{"id":1,"emitted_at":"nested","data":{"x":[1,2]}},"emitted_at":1700000000000}}\n'
+    )
+    stream, singer_line = RawRecordSplicer().splice(line)
+    assert stream == "users"
+    message = orjson.loads(singer_line)
+    assert message["type"] == "RECORD"
+    assert message["stream"] == "users"
+    assert message["record"] == {"id": 1, "emitted_at": "nested", "data": {"x": [1, 2]}}
+    assert message["time_extracted"] == "2023-11-14T22:13:20+00:00"
+
+
+def test_splice_accepts_whitespace_and_meta():
+    line = (
+        b'{"type": "RECORD", "record": {"stream": "users", "data": {"id": 2}, '
+        b'"emitted_at": 1, "meta": {"changes": []}}}\n'
+    )
+    stream, singer_line = RawRecordSplicer().splice(line)
+    assert stream == "users"
+    assert orjson.loads(singer_line)["record"] == {"id": 2}
+
+
+def test_splice_rejects_anything_else():
+    splicer = RawRecordSplicer()
+    assert splicer.splice(stream_state("users", {"cursor": 1})) is None
+    assert splicer.splice(b'{"type":"LOG","log":{"level":"INFO","message":"hi"}}\n') is None
+    # Unexpected key order
+    assert splicer.splice(b'{"type":"RECORD","record":{"emitted_at":1,"stream":"u","data":{}}}\n') is None
+    assert splicer.splice(b"not json\n") is None
+
+
+def test_passthrough_sync_matches_regular_sync():
+    lines = [
+        record("users", {"id": 1, "name": "a"}),
+        stream_state("users", {"cursor": 1}),
+        record("events", {"id": 2, "payload": {"kind": "click"}}),
+    ]
+    with fake_tap() as tap:
+        regular = run_sync(tap, lines)
+    with fake_tap({"raw_record_passthrough": True}) as tap:
+        assert all(stream.raw_passthrough for stream in tap.streams.values())
+        passthrough = run_sync(tap, lines)
+
+    def records(messages):
+        return sorted(
+            (m["stream"], orjson.dumps(m["record"], option=orjson.OPT_SORT_KEYS))
+            for m in messages
+            if m["type"] == "RECORD"
+        )
+
+    assert records(passthrough) == records(regular)
+    assert [m["type"] for m in passthrough].count("SCHEMA") == 2
+    assert passthrough[-1] == regular[-1]
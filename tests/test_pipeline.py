@@ -0,0 +1,122 @@
+import asyncio
+import io
+import os
+import sys
+
+import orjson
+import pytest
+
+from tap_airbyte.pipeline import (
+    DECODED_MESSAGE,
+    DECODED_RECORD,
+    SINGER_LINES,
+    UNDECODABLE,
+    DecodePipeline,
+    StreamSpec,
+    decode_chunk,
+    init_decoder,
+    iter_line_chunks,
+    iter_line_chunks_async,
+    open_pipe_reader,
+)
+from tests.airbyte_fakes import CATALOG, fake_tap, record, run_sync, stream_state
+
+USERS_SCHEMA = CATALOG["streams"][0]["json_schema"]
+
+
+def test_decode_chunk_keeps_order_and_groups_runs():
+    init_decoder({"users": StreamSpec(USERS_SCHEMA)}, orjson.OPT_APPEND_NEWLINE)
+    chunk = b"".join(
+        [
+            record("users", {"id": 1, "unknown": True}),
+            record("users", {"id": 2}),
+            stream_state("users", {"c": 2}),
+            record("events", {"id": 3}),
+            b"garbage\n",
+        ]
+    )
+    items = decode_chunk(chunk)
+    assert [item[0] for item in items] == [SINGER_LINES, DECODED_MESSAGE, DECODED_RECORD, UNDECODABLE]
+    lines = [orjson.loads(line) for line in items[0][2].splitlines()]
+    # Conformed against the schema on the way
+    assert [line["record"] for line in lines] == [{"id": 1}, {"id": 2}]
+    assert items[0][3] == 2
+    assert items[2][1:3] == ("events", {"id": 3})
+
+
+def test_line_chunks_never_split_a_line():
+    data = b"".join(record("users", {"id": i, "pad": "x" * i}) for i in range(100))
+    chunks = list(iter_line_chunks(io.BytesIO(data), 64))
+    assert b"".join(chunks) == data
+    assert all(chunk.endswith(b"\n") for chunk in chunks)
+
+
+def test_worker_pool_preserves_order():
+    lines = [record("users", {"id": i}) for i in range(5000)]
+    init_decoder({}, orjson.OPT_APPEND_NEWLINE)
+    with DecodePipeline({"users": StreamSpec(USERS_SCHEMA)}, workers=2, chunk_size=4096) as pipeline:
+        items = list(pipeline.decode(io.BytesIO(b"".join(lines))))
+    ids = [orjson.loads(line)["record"]["id"] for item in items for line in item[2].splitlines()]
+    assert ids == list(range(5000))
+
+
+def test_pipelined_sync_matches_regular_sync():
+    lines = []
+    for i in range(300):
+        lines.append(record("users", {"id": i, "name": str(i)}))
+        lines.append(record("events", {"id": i, "payload": {"kind": "k"}}))
+        if i % 50 == 0:
+            lines.append(stream_state("users", {"c": i}))
+    with fake_tap() as tap:
+        regular = run_sync(tap, lines)
+    with fake_tap({"decode_workers": 2, "decode_chunk_size": 2048}) as tap:
+        pipelined = run_sync(tap, lines)
+
+    def by_stream(messages, stream):
+        return [m["record"] for m in messages if m["type"] == "RECORD" and m["stream"] == stream]
+
+    assert by_stream(pipelined, "users") == by_stream(regular, "users")
+    assert by_stream(pipelined, "events") == by_stream(regular, "events")
+    assert pipelined[-1] == regular[-1]
+    # Records written by the reader always precede the state that follows them
+    seen = 0
+    for message in pipelined:
+        if message["type"] == "RECORD" and message["stream"] == "users":
+            seen = message["record"]["id"]
+        elif message["type"] == "STATE":
+            assert seen >= message["value"]["stream_state"]["c"]
+
+
+def test_line_chunks_assemble_lines_longer_than_the_buffer():
+    big = record("users", {"id": 1, "pad": "x" * 10_000})
+    data = record("users", {"id": 0}) + big + record("users", {"id": 2})
+    chunks = list(iter_line_chunks(io.BufferedReader(io.BytesIO(data), buffer_size=16), 64))
+    assert b"".join(chunks) == data
+    assert big in b"".join(chunks).splitlines(keepends=True)
+
+
+def test_line_chunks_keep_an_unterminated_last_line():
+    assert list(iter_line_chunks(io.BytesIO(b'{"a": 1}\n{"b"'), 4)) == [b'{"a": 1}\n', b'{"b"']
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="pipes are only resized on Linux")
+def test_pipe_of_an_asyncio_subprocess_is_enlarged():
+    import fcntl
+
+    async def read():
+        stdout, stdout_fd = await open_pipe_reader(1024 * 1024)
+        # Both ends share the pipe's kernel buffer
+        size = fcntl.fcntl(stdout_fd, fcntl.F_GETPIPE_SZ)
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                sys.executable, "-c", "print('a'); print('b')", stdout=stdout_fd
+            )
+        finally:
+            os.close(stdout_fd)
+        chunks = [chunk async for chunk in iter_line_chunks_async(stdout, 1024)]
+        assert await proc.wait() == 0
+        return size, b"".join(chunks)
+
+    size, output = asyncio.run(read())
+    assert output == b"a\nb\n"
+    assert size == 1024 * 1024
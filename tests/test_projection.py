@@ -0,0 +1,59 @@
+from tap_airbyte.projection import (
+    airbyte_key_properties,
+    project_record,
+    project_schema,
+    selected_properties,
+)
+from tests.airbyte_fakes import deselect, fake_tap, record, run_sync
+
+
+def test_selected_properties_ignore_nested_breadcrumbs():
+    mask = {(): True, ("properties", "id"): True, ("properties", "a", "properties", "b"): False}
+    assert selected_properties(mask) is None
+    mask[("properties", "wide")] = False
+    assert selected_properties(mask) == {"id"}
+
+
+def test_schema_and_records_are_projected():
+    schema = {"type": "object", "properties": {"id": {}, "wide": {}}, "required": ["id", "wide"]}
+    assert project_schema(schema, frozenset({"id"})) == {
+        "type": "object", "properties": {"id": {}}, "required": ["id"]
+    }
+    record = {"id": 1}
+    assert project_record(record, frozenset({"id", "name"})) is record
+    assert project_record({"id": 1, "wide": 2}, frozenset({"id"})) == {"id": 1}
+
+
+def test_deselected_properties_are_projected_and_dropped():
+    with fake_tap() as tap:
+        deselect(tap, "users", "name", "id")
+        catalog = {entry["stream"]["name"]: entry["stream"] for entry in tap.configured_airbyte_catalog["streams"]}
+        # The primary key stays even if deselected
+        assert set(catalog["users"]["json_schema"]["properties"]) == {"id", "updated_at"}
+        assert set(catalog["events"]["json_schema"]["properties"]) == {"id", "payload"}
+        messages = run_sync(tap, [record("users", {"id": 1, "name": "a", "updated_at": None})])
+    records = [message["record"] for message in messages if message["type"] == "RECORD"]
+    assert records == [{"id": 1, "updated_at": None}]
+    assert tap.projections == {"users": frozenset({"id", "updated_at"})}
+
+
+def test_user_defined_keys_are_kept():
+    stream = {
+        "source_defined_primary_key": [["id"]],
+        "primary_key": [["tenant"], ["id"]],
+        "cursor_field": ["updated_at"],
+    }
+    assert airbyte_key_properties(stream) == {"id", "tenant", "updated_at"}
+
+
+def test_user_defined_cursor_is_kept_if_deselected():
+    with fake_tap() as tap:
+        deselect(tap, "users", "name", "updated_at")
+        # Set as the replication key in the Singer catalog, on a property that is not automatic
+        tap.streams["users"].replication_key = "updated_at"
+        streams = tap.configured_airbyte_catalog["streams"]
+        catalog = {entry["stream"]["name"]: entry["stream"] for entry in streams}
+        assert set(catalog["users"]["json_schema"]["properties"]) == {"id", "updated_at"}
+        run_sync(tap, [record("users", {"id": 1, "name": "a", "updated_at": None})])
+    # Left in the records for the SDK to track the replication key
+    assert tap.projections == {"users": frozenset({"id", "updated_at"})}
@@ -0,0 +1,74 @@
+import time
+from unittest.mock import MagicMock, patch
+
+import orjson
+import pytest
+import requests
+
+from tap_airbyte.registry import ConnectorRegistry, build_index
+
+REGISTRY = {
+    "sources": [
+        {
+            "dockerRepository": "airbyte/source-native",
+            "dockerImageTag": "1.2.3",
+            "remoteRegistries": {"pypi": {"enabled": True, "packageName": "airbyte-source-native"}},
+        },
+        {"dockerRepository": "airbyte/source-java", "dockerImageTag": "0.1.0"},
+    ]
+}
+
+
+def response(status=200, body=REGISTRY, headers=None):
+    mock = MagicMock(status_code=status, headers=headers or {})
+    mock.json.return_value = body
+    if status >= 400:
+        mock.raise_for_status.side_effect = requests.HTTPError(status)
+    return mock
+
+
+def test_build_index():
+    index = build_index(REGISTRY)
+    assert index["airbyte/source-native"] == {
+        "pypi": True,
+        "package": "airbyte-source-native",
+        "version": "1.2.3",
+    }
+    assert index["airbyte/source-java"]["pypi"] is False
+
+
+def test_local_registry_file(tmp_path):
+    path = tmp_path / "registry.json"
+    path.write_bytes(orjson.dumps(REGISTRY))
+    registry = ConnectorRegistry(str(path), cache_dir=tmp_path / "cache")
+    assert registry.lookup("airbyte/source-native")["pypi"]
+    assert registry.lookup("airbyte/source-missing") is None
+    assert ConnectorRegistry(f"file://{path}").lookup("airbyte/source-java") is not None
+
+
+def test_cached_index_is_used_without_network(tmp_path):
+    with patch("requests.get", return_value=response(headers={"ETag": '"v1"'})) as get:
+        ConnectorRegistry(cache_dir=tmp_path).lookup("airbyte/source-native")
+        assert ConnectorRegistry(cache_dir=tmp_path).lookup("airbyte/source-native")["pypi"]
+    assert get.call_count == 1
+
+
+def test_expired_index_is_revalidated_conditionally(tmp_path):
+    with patch("requests.get", return_value=response(headers={"ETag": '"v1"'})):
+        ConnectorRegistry(cache_dir=tmp_path).lookup("airbyte/source-native")
+    with patch("requests.get", return_value=response(status=304)) as get:
+        assert ConnectorRegistry(cache_dir=tmp_path, ttl=0).lookup("airbyte/source-native")["pypi"]
+    assert get.call_args.kwargs["headers"] == {"If-None-Match": '"v1"'}
+    cached = orjson.loads(ConnectorRegistry(cache_dir=tmp_path).cache_path.read_bytes())
+    assert time.time() - cached["fetched_at"] < 60
+
+
+def test_unreachable_registry_falls_back_to_the_expired_index(tmp_path):
+    with patch("requests.get", return_value=response()):
+        ConnectorRegistry(cache_dir=tmp_path).lookup("airbyte/source-native")
+    with patch("requests.get", side_effect=requests.ConnectionError):
+        assert ConnectorRegistry(cache_dir=tmp_path, ttl=0).lookup("airbyte/source-native")["pypi"]
+    with patch("requests.get", side_effect=requests.ConnectionError), pytest.raises(
+        requests.ConnectionError
+    ):
+        ConnectorRegistry(cache_dir=tmp_path / "empty").lookup("airbyte/source-native")
@@ -0,0 +1,72 @@
+import os
+import subprocess
+from unittest.mock import patch
+
+import pytest
+
+from tap_airbyte.session import ContainerSession
+
+from tests.airbyte_fakes import fake_tap
+
+
+def fake_runtime(run_returncode=0):
+    calls = []
+
+    def run(command, **kwargs):
+        calls.append(command)
+        if command[1:3] == ["image", "inspect"]:
+            return subprocess.CompletedProcess(command, 0, b'["python", "/airbyte/main.py"]\n', b"")
+        if command[1] == "run":
+            return subprocess.CompletedProcess(command, run_returncode, b"0123456789abcdef\n", b"no space left")
+        return subprocess.CompletedProcess(command, 0)
+
+    return patch("tap_airbyte.session.subprocess.run", side_effect=run), calls
+
+
+def test_commands_are_executed_in_the_session_container():
+    runtime, calls = fake_runtime()
+    with runtime:
+        session = ContainerSession("docker", "airbyte/source-fake:1.0.0", "/tmp", ["--mount", "x"]).start()
+        host_dir = session.host_dir
+        assert os.path.isdir(host_dir)
+        assert calls[-1][:5] == ["docker", "run", "-d", "--rm", "-v"]
+        assert calls[-1][-4:] == ["--entrypoint", "sleep", "airbyte/source-fake:1.0.0", "2147483647"]
+        assert session.command("discover", "--config", "/tmp/abc/config.json") == [
+            "docker", "exec", "-i", "0123456789abcdef",
+            "python", "/airbyte/main.py", "discover", "--config", "/tmp/abc/config.json",
+        ]
+        assert session.container_path(os.path.join(host_dir, "abc", "config.json")) == "/tmp/abc/config.json"
+        session.close()
+    assert calls[-1] == ["docker", "rm", "-f", "0123456789abcdef"]
+    assert not os.path.exists(host_dir)
+
+
+def test_failed_start_cleans_up():
+    runtime, calls = fake_runtime(run_returncode=125)
+    session = ContainerSession("docker", "airbyte/source-fake:1.0.0", "/tmp")
+    with runtime, pytest.raises(RuntimeError, match="no space left"):
+        session.start()
+    assert session.host_dir is None
+    assert session.container_id is None
+
+
+def test_tap_runs_control_commands_in_the_session():
+    runtime, calls = fake_runtime()
+    with fake_tap({"container_session": True}) as tap, runtime, patch.object(tap, "is_native", return_value=False):
+        with tap._control_dir() as (host_tmpdir, runtime_dir):
+            command = tap._control_command("check", "--config", f"{runtime_dir}/config.json", host_tmpdir=host_tmpdir)
+        session = tap.container_session
+        assert host_tmpdir.startswith(session.host_dir)
+        assert command[:4] == ["docker", "exec", "-i", "0123456789abcdef"]
+        assert command[-1] == f"/tmp/{os.path.basename(host_tmpdir)}/config.json"
+        session.close()
+
+
+def test_session_directory_is_under_the_mount_dir(tmp_path):
+    runtime, calls = fake_runtime()
+    with runtime:
+        session = ContainerSession("docker", "airbyte/source-fake:1.0.0", str(tmp_path)).start()
+        # Shared volumes and docker-in-docker paths the daemon can see are configured as the mount dir
+        assert os.path.dirname(session.host_dir) == str(tmp_path)
+        assert f"{session.host_dir}:{tmp_path}" in calls[-1]
+        session.close()
@@ -0,0 +1,19 @@
+from tap_airbyte.spill import SpillFile
+
+
+def test_segments_are_removed_once_read(tmp_path):
+    spill = SpillFile(tmp_path / "spill", "users/v2", segment_bytes=18)
+    batches = [spill.write([{"id": i}, {"id": i + 1}]) for i in range(0, 8, 2)]
+    # Every batch is 18 bytes, so it fills its segment
+    assert [batch.segment for batch in batches] == [1, 2, 3, 4]
+    (directory,) = (tmp_path / "spill").iterdir()
+    assert spill.read(batches[0]) == [{"id": 0}, {"id": 1}]
+    assert spill.read(batches[1]) == [{"id": 2}, {"id": 3}]
+    assert sorted(path.name for path in directory.iterdir()) == ["3.jsonl", "4.jsonl"]
+    # The segment being written stays until the next one starts
+    spill.read(batches[2])
+    spill.read(batches[3])
+    assert [path.name for path in directory.iterdir()] == ["4.jsonl"]
+    assert (spill.records, spill.bytes) == (0, 0)
+    spill.close()
+    assert not directory.exists()
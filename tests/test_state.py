@@ -0,0 +1,113 @@
+import pytest
+
+from tap_airbyte.state import AirbyteStateStore, StateCheckpointer
+from tests.airbyte_fakes import fake_tap, record, run_sync, stream_state
+
+
+def _stream(name, state, **descriptor):
+    return {
+        "type": "STREAM",
+        "stream": {"stream_descriptor": {"name": name, **descriptor}, "stream_state": state},
+    }
+
+
+def test_stream_states_are_merged_in_place_and_keep_their_order():
+    store = AirbyteStateStore({"airbyte_state": [_stream("a", {"c": 0}), _stream("b", {"c": 0})]})
+    store.update(_stream("b", {"c": 1}))
+    store.update(_stream("c", {"c": 1}))
+    store.update(_stream("a", {"c": 2}))
+    assert store.snapshot() == {
+        "stream_descriptor": {"name": "a"},
+        "stream_state": {"c": 2},
+        "airbyte_state": [_stream("a", {"c": 2}), _stream("b", {"c": 1}), _stream("c", {"c": 1})],
+    }
+
+
+def test_namespaces_are_distinct_streams():
+    store = AirbyteStateStore()
+    store.update(_stream("a", {"c": 1}, namespace="x"))
+    store.update(_stream("a", {"c": 2}, namespace="y"))
+    assert len(store.connector_state()) == 2
+
+
+def test_global_and_legacy_states():
+    store = AirbyteStateStore()
+    store.update(_stream("a", {"c": 1}))
+    store.update({"type": "GLOBAL", "global": {"shared_state": 1}})
+    store.update({"type": "GLOBAL", "global": {"shared_state": 2}})
+    assert store.connector_state() == [
+        _stream("a", {"c": 1}),
+        {"type": "GLOBAL", "global": {"shared_state": 2}},
+    ]
+    store.update({"type": "LEGACY", "legacy": {"cursor": 3}, "data": {"cursor": 3}})
+    assert store.snapshot() == {
+        "cursor": 3,
+        "airbyte_state": [{"type": "LEGACY", "legacy": {"cursor": 3}}],
+    }
+
+
+def test_snapshots_are_not_affected_by_later_updates():
+    store = AirbyteStateStore()
+    store.update(_stream("a", {"c": 1}))
+    before = store.snapshot()
+    store.update(_stream("a", {"c": 2}))
+    assert before["airbyte_state"] == [_stream("a", {"c": 1})]
+    assert "airbyte_state" not in before["airbyte_state"][0]["stream"]
+
+
+def test_legacy_state_without_v2_list_is_passed_through():
+    store = AirbyteStateStore({"cursor": 1})
+    assert store
+    assert store.connector_state() == {"cursor": 1}
+    assert not AirbyteStateStore({})
+
+
+def test_sync_emits_merged_state():
+    state = {"airbyte_state": [_stream("events", {"c": 0})]}
+    lines = [record("users", {"id": 1}), stream_state("users", {"c": 1})]
+    with fake_tap(state=state) as tap:
+        output = run_sync(tap, lines)
+    assert output[-1]["value"]["airbyte_state"] == [
+        _stream("events", {"c": 0}),
+        _stream("users", {"c": 1}),
+    ]
+
+
+def test_records_policy_collapses_checkpoints():
+    lines = []
+    for i in range(10):
+        lines.append(record("users", {"id": i}))
+        lines.append(stream_state("users", {"c": i}))
+    config = {"state_checkpoint_policy": "records", "state_checkpoint_records": 4}
+    with fake_tap(config) as tap:
+        output = run_sync(tap, lines)
+    states = [m["value"]["stream_state"]["c"] for m in output if m["type"] == "STATE"]
+    # Emitted as the 4th record since the last checkpoint arrives, final state after EOF
+    assert states == [2, 6, 9]
+    assert tap.checkpoints.coalesced > 0
+
+
+def test_stream_boundary_policy_emits_when_the_source_moves_on():
+    checkpoints = StateCheckpointer(policy="stream_boundary")
+    assert not checkpoints.on_state(_stream("a", {"c": 1}))
+    assert not checkpoints.on_state(_stream("a", {"c": 2}))
+    assert checkpoints.on_state(_stream("b", {"c": 1}))
+    checkpoints.emitted()
+    assert not checkpoints.on_records(100)
+    assert not checkpoints.on_state(_stream("b", {"c": 2}))
+    assert checkpoints.on_stream_status()
+
+
+def test_interval_policy_waits_for_the_interval():
+    checkpoints = StateCheckpointer(policy="interval", interval=3600)
+    assert not checkpoints.on_state(_stream("a", {"c": 1}))
+    assert not checkpoints.on_records()
+    checkpoints.interval = 0
+    assert checkpoints.on_records()
+
+
+def test_every_message_policy_is_the_default():
+    checkpoints = StateCheckpointer()
+    assert checkpoints.on_state(_stream("a", {"c": 1}))
+    with pytest.raises(ValueError):
+        StateCheckpointer(policy="sometimes")
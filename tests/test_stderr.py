@@ -0,0 +1,48 @@
+import logging
+import os
+import subprocess
+import sys
+
+from tap_airbyte.stderr import StderrDrain
+from tests.airbyte_fakes import fake_tap
+
+
+def test_chatty_stderr_does_not_block_the_process(caplog):
+    # Writes well over a pipe's capacity to stderr before anything to stdout
+    proc = subprocess.Popen(
+        [sys.executable, "-c", "import sys\nfor i in range(20000): print('log line', i, file=sys.stderr)\nprint('done')"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    logger = logging.getLogger("test_stderr")
+    with caplog.at_level(logging.DEBUG, logger="test_stderr"):
+        drain = StderrDrain(proc.stderr, logger, level=logging.DEBUG, tail_bytes=32).start()
+        assert proc.stdout.read() == b"done" + os.linesep.encode()
+        assert proc.wait(timeout=10) == 0
+        drain.join(timeout=10)
+    assert len(caplog.records) == 20000
+    assert caplog.records[-1].getMessage() == "log line 19999"
+    assert drain.tail() == "log line 19998\nlog line 19999\n"
+
+
+def test_tail_keeps_an_oversized_last_line():
+    read, write = os.pipe()
+    os.write(write, b"short\n" + b"x" * 100 + b"\n")
+    os.close(write)
+    with os.fdopen(read, "rb") as stream:
+        drain = StderrDrain(stream, logging.getLogger("test_stderr"), tail_bytes=10).start()
+        drain.join(timeout=10)
+    assert drain.tail() == "x" * 100 + "\n"
+
+
+def test_source_stderr_is_logged_at_debug_and_kept_for_errors(caplog):
+    read, write = os.pipe()
+    os.write(write, b"progress\n")
+    os.close(write)
+    with fake_tap() as tap, os.fdopen(read, "rb") as stream:
+        with caplog.at_level(logging.INFO, logger=tap.logger.name):
+            drain = tap._stderr_drain(stream).start()
+            drain.join(timeout=10)
+    assert drain.level == logging.DEBUG
+    assert not [r for r in caplog.records if r.getMessage() == "progress"]
+    assert drain.tail() == "progress\n"
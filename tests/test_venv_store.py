@@ -0,0 +1,47 @@
+import time
+from threading import Thread
+
+from tap_airbyte.venv_store import COMPLETE_MARKER, VenvStore, interpreter_id
+
+
+def test_key_depends_on_source_version_and_interpreter():
+    key = VenvStore.key("source-fake", "1.0.0")
+    assert key.startswith("source-fake-1.0.0-")
+    assert key != VenvStore.key("source-fake", "1.0.1")
+    assert interpreter_id() != interpreter_id("/nonexistent/python")
+
+
+def test_concurrent_runs_build_once(tmp_path):
+    store = VenvStore(tmp_path)
+    builds = []
+
+    def build(path):
+        builds.append(path)
+        path.mkdir()
+        time.sleep(0.1)
+
+    results = []
+    runs = [Thread(target=lambda: results.append(store.ensure("source-fake-1", build))) for _ in range(4)]
+    for run in runs:
+        run.start()
+    for run in runs:
+        run.join()
+    assert len(builds) == 1
+    assert sorted(created for _, created in results) == [False, False, False, True]
+    assert store.is_complete("source-fake-1")
+
+
+def test_interrupted_build_is_redone(tmp_path):
+    store = VenvStore(tmp_path)
+    leftover = store.path("source-fake-1")
+    leftover.mkdir()
+    (leftover / "partial").touch()
+
+    def build(path):
+        assert not path.exists()
+        path.mkdir()
+
+    path, created = store.ensure("source-fake-1", build)
+    assert created
+    assert (path / COMPLETE_MARKER).exists()
+    assert not (path / "partial").exists()
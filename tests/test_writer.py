@@ -0,0 +1,58 @@
+import io
+import time
+from contextlib import redirect_stdout
+
+import orjson
+import singer_sdk.singerlib as singer
+
+from tap_airbyte.writer import BufferedSingerWriter
+
+
+def _stdout() -> io.TextIOWrapper:
+    return io.TextIOWrapper(io.BytesIO(), encoding="utf-8")
+
+
+def _written(stdout: io.TextIOWrapper) -> list:
+    return [orjson.loads(line) for line in stdout.buffer.getvalue().splitlines()]
+
+
+def test_records_are_held_until_the_buffer_fills():
+    writer = BufferedSingerWriter(buffer_size=256, flush_interval=0)
+    stdout = _stdout()
+    with redirect_stdout(stdout):
+        writer.write_message(singer.RecordMessage(stream="users", record={"id": 1}))
+        assert stdout.buffer.getvalue() == b""
+        for i in range(2, 20):
+            writer.write_message(singer.RecordMessage(stream="users", record={"id": i}))
+        assert stdout.buffer.getvalue() != b""
+        writer.flush()
+    assert [m["record"]["id"] for m in _written(stdout)] == list(range(1, 20))
+
+
+def test_state_flushes_preceding_records_in_order():
+    writer = BufferedSingerWriter(buffer_size=1024 * 1024, flush_interval=0)
+    stdout = _stdout()
+    with redirect_stdout(stdout):
+        writer.write_message(singer.RecordMessage(stream="users", record={"id": 1}))
+        writer.write_message(singer.StateMessage({"bookmark": 1}))
+        assert [m["type"] for m in _written(stdout)] == ["RECORD", "STATE"]
+
+
+def test_messages_larger_than_the_buffer_are_written_directly():
+    writer = BufferedSingerWriter(buffer_size=16, flush_interval=0)
+    stdout = _stdout()
+    with redirect_stdout(stdout):
+        writer.write_message(singer.RecordMessage(stream="users", record={"blob": "x" * 100}))
+        assert _written(stdout)[0]["record"]["blob"] == "x" * 100
+
+
+def test_idle_buffer_is_flushed_after_the_interval():
+    writer = BufferedSingerWriter(buffer_size=1024 * 1024, flush_interval=0.05)
+    stdout = _stdout()
+    with redirect_stdout(stdout):
+        writer.write_message(singer.RecordMessage(stream="users", record={"id": 1}))
+        deadline = time.monotonic() + 5
+        while not stdout.buffer.getvalue() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        writer.close()
+    assert len(_written(stdout)) == 1